@@ -0,0 +1,92 @@
+"""
+Compare nearest-farm lookups: naive haversine scan vs the in-process
+KD-tree, and optionally (--db) a full-scan SQL query vs the indexed
+nearest_farms() query on the configured database.
+
+Run from the repository root:
+    python benchmarks/bench_geo_queries.py --farms 100000 --queries 200
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from sqlalchemy import text
+from geo_queries import (
+    FarmLocationIndex,
+    naive_nearest,
+    nearest_farms,
+    detect_spatial_mode,
+    ADDRESSES_TABLE,
+    _HAVERSINE_SQL,
+)
+
+# Metropolitan France, where the farms are.
+LAT_RANGE = (42.3, 51.1)
+LON_RANGE = (-4.8, 8.2)
+
+def random_points(count, generator):
+    return [(generator.uniform(*LAT_RANGE), generator.uniform(*LON_RANGE)) for _ in range(count)]
+
+def timed(function, queries):
+    start = time.perf_counter()
+    for lat, lon in queries:
+        function(lat, lon)
+    elapsed = time.perf_counter() - start
+    return elapsed / len(queries) * 1000
+
+def bench_in_process(farm_count, query_count, k, generator):
+    farms = [
+        {"farm_id": farm_id, "latitude": lat, "longitude": lon}
+        for farm_id, (lat, lon) in enumerate(random_points(farm_count, generator))
+    ]
+    queries = random_points(query_count, generator)
+
+    start = time.perf_counter()
+    index = FarmLocationIndex(farms)
+    build_seconds = time.perf_counter() - start
+
+    # The naive scan is slow on large inputs, so it runs on fewer queries.
+    naive_ms = timed(lambda lat, lon: naive_nearest(farms, lat, lon, k), queries[:max(1, query_count // 10)])
+    tree_ms = timed(lambda lat, lon: index.nearest(lat, lon, k), queries)
+    print(f"In-process, {farm_count} farms, k={k}:")
+    print(f"  naive haversine scan: {naive_ms:10.3f} ms/query")
+    print(f"  KD-tree:              {tree_ms:10.3f} ms/query (built in {build_seconds:.2f}s), {naive_ms / tree_ms:.0f}x faster")
+
+def bench_database(query_count, k, generator):
+    from db_config import get_engine
+    queries = random_points(query_count, generator)
+    scan = text(f"""
+        SELECT a.farm_id, {_HAVERSINE_SQL} AS distance_m
+        FROM {ADDRESSES_TABLE} a ORDER BY distance_m LIMIT :k
+    """)
+    with get_engine().connect() as conn:
+        mode = detect_spatial_mode(conn)
+        if mode is None:
+            print("No spatial index on the database; run `python src/geo_queries.py --setup` first.")
+            return
+        rows = conn.execute(text(f"SELECT COUNT(*) FROM {ADDRESSES_TABLE}")).scalar()
+        scan_ms = timed(lambda lat, lon: conn.execute(scan, {"lat": lat, "lon": lon, "k": k}).fetchall(), queries)
+        index_ms = timed(lambda lat, lon: nearest_farms(conn, lat, lon, k), queries)
+    print(f"Database ({mode} index), {rows} addresses, k={k}:")
+    print(f"  full-scan haversine query: {scan_ms:8.3f} ms/query")
+    print(f"  nearest_farms():           {index_ms:8.3f} ms/query")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--farms", type=int, default=100000, help="Number of synthetic farm locations.")
+    parser.add_argument("--queries", type=int, default=200, help="Number of random query points.")
+    parser.add_argument("--k", type=int, default=10, help="Number of nearest farms per query.")
+    parser.add_argument("--db", action="store_true", help="Also benchmark the configured database.")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed.")
+    args = parser.parse_args(argv)
+    generator = random.Random(args.seed)
+    bench_in_process(args.farms, args.queries, args.k, generator)
+    if args.db:
+        bench_database(args.queries, args.k, generator)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""
+Generate a synthetic seed tree (table_seeds/, join_table_seeds/ and
+optionally media/) at a scale factor of the repository's dataset, for the
+benchmarks. Scale 1 has FARMS_PER_SCALE farms; every farm gets an address,
+farmers with their weekly workloads, a product hierarchy, animals, crops,
+labels, videos and photos of every kind. Lookup tables (categories,
+labels) are copied from the repository's seeds. Output is deterministic
+for a given --seed.
+
+Run from the repository root:
+    python benchmarks/generate_seeds.py --scale 100 --output /tmp/seeds_x100
+"""
+import io
+import os
+import sys
+import json
+import random
+import shutil
+import argparse
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from media_paths import photo_stem, documentary_stem, herovideo_stem
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+FARMS_PER_SCALE = 10
+# Copied as-is: their size does not grow with the number of farms.
+LOOKUP_SEEDS = (
+    "categories/animal_categories.json",
+    "categories/crop_categories.json",
+    "categories/market_categories.json",
+    "categories/photo_categories.json",
+    "categories/product_categories.json",
+    "categories/season_categories.json",
+    "categories/seller_categories.json",
+    "categories/workload_categories.json",
+    "distinctions/labels.json",
+    "distinctions/unofficial_labels.json",
+)
+SCHEMA_FILE = "schema.dbml"
+
+# Metropolitan France, where the farms are.
+LAT_RANGE = (42.3, 51.1)
+LON_RANGE = (-4.8, 8.2)
+FIRST_NAMES = ("Camille", "Lucie", "Maxime", "Hugo", "Chloé", "Léa", "Jules", "Manon", "Louis", "Inès", "Frédéric", "Anaïs")
+SURNAMES = ("Martin", "Bernard", "Faucon", "Germain", "Dubois", "Moreau", "Laurent", "Garnier", "Roux", "Fournier")
+FARM_WORDS = ("Ferme", "Domaine", "Grange", "Mas", "Jardins", "Clos", "Vergers", "Bergerie")
+PLACES = ("des Chênes", "du Moulin", "de la Source", "de Chartreuse", "du Vallon", "des Tilleuls", "de Belledonne", "du Lac")
+PRODUCTS = ("Oeufs", "Poulet", "Miel", "Spiruline", "Fromage", "Yaourt", "Pain", "Légumes", "Pommes", "Confiture", "Jus", "Farine")
+ANIMALS = ("Poules", "Chèvres", "Vaches", "Abeilles", "Brebis", "Cochons", "Canards")
+CROPS = ("Topinambour", "Blé", "Pommes de terre", "Tomates", "Courges", "Carottes")
+WORKLOAD_CATEGORIES = 2
+SEASONS = 2
+START = date(2025, 1, 1)
+
+# Size of the placeholder (not playable) file written for every video.
+VIDEO_BYTES = 32 * 1024
+
+def _day(generator, span_days=365):
+    return (START + timedelta(days=generator.randrange(span_days))).isoformat()
+
+def _lookup_ids(root, relative_path):
+    with open(os.path.join(root, relative_path), "r", encoding="utf-8") as f:
+        return [record["id"] for record in json.load(f)]
+
+def write_json_array(path, records):
+    """
+    Stream records into a JSON array file; returns the number written.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[\n")
+        for record in records:
+            f.write(",\n" if count else "")
+            f.write(json.dumps(record, ensure_ascii=False))
+            count += 1
+        f.write("\n]\n")
+    return count
+
+def generate_tables(farm_count, generator, lookups):
+    """
+    Build every scaled table in memory, with consistent ids across them.
+    Returns (tables {name: records}, product_edges [(parent, child)]).
+    """
+    tables = {name: [] for name in (
+        "farms", "addresses", "farmers", "products", "animals", "crops", "workloads",
+        "photos", "documentaries", "herovideos", "unofficial_label_instances",
+    )}
+    edges = []
+
+    def add(table, record):
+        record = dict({"id": len(tables[table]) + 1}, **record)
+        tables[table].append(record)
+        return record["id"]
+
+    for farm_index in range(farm_count):
+        farm_id = farm_index + 1
+        documentary_id = add("documentaries", {
+            "farm_id": farm_id, "description": "Portrait de la ferme", "capture_date": _day(generator),
+            "upload_date": _day(generator), "is_main": True,
+        })
+        herovideo_id = add("herovideos", {
+            "farm_id": farm_id, "description": "Vue d'ensemble", "capture_date": _day(generator),
+            "upload_date": _day(generator), "is_main": True,
+        })
+        add("farms", {
+            "name": f"{generator.choice(FARM_WORDS)} {generator.choice(PLACES)} {farm_id}",
+            "company_name": f"GAEC {generator.choice(SURNAMES).upper()}",
+            "description": generator.choice(("Ferme bio", "Élevage plein air", "Maraîchage", "Apiculture")),
+            "own_land": generator.random() < 0.5,
+            "creation_year": generator.randint(1980, 2024),
+            "page_creation_date": _day(generator),
+            "current_documentary_id": documentary_id,
+            "current_herovideo_id": herovideo_id,
+        })
+        add("addresses", {
+            "farm_id": farm_id, "house_number": str(generator.randint(1, 200)), "street": "Route des Champs",
+            "postal_code": f"{generator.randint(1000, 95999):05d}", "city": "Saint-Martin", "country": "France",
+            "latitude": round(generator.uniform(*LAT_RANGE), 6), "longitude": round(generator.uniform(*LON_RANGE), 6),
+        })
+
+        animal_ids = [
+            add("animals", {
+                "farm_id": farm_id, "name": generator.choice(ANIMALS),
+                "animal_category_id": generator.choice(lookups["animal_categories"]),
+                "description": "Élevées en plein air", "quantity": generator.randint(1, 500),
+            })
+            for _ in range(generator.randint(0, 5))
+        ]
+        crop_ids = [
+            add("crops", {
+                "farm_id": farm_id, "name": generator.choice(CROPS),
+                "crop_category_id": generator.choice(lookups["crop_categories"]),
+                "description": "Culture de saison", "quantity": round(generator.uniform(0.01, 50), 4),
+            })
+            for _ in range(generator.randint(0, 3))
+        ]
+        resource_ids = animal_ids + crop_ids or [1]
+
+        farmer_ids = []
+        for _ in range(generator.randint(1, 3)):
+            birth_year = generator.randint(1950, 2000)
+            farmer_id = add("farmers", {
+                "farm_id": farm_id, "name": generator.choice(FIRST_NAMES), "surname": generator.choice(SURNAMES),
+                "description": "Producteur passionné", "status": generator.choice(("owner", "partner", "employee")),
+                "farming_start_year": generator.randint(birth_year + 18, 2024), "birth_year": birth_year,
+            })
+            farmer_ids.append(farmer_id)
+            for season_id in range(1, SEASONS + 1):
+                for work_category_id in range(1, WORKLOAD_CATEGORIES + 1):
+                    for resource_id in generator.sample(resource_ids, min(2, len(resource_ids))):
+                        add("workloads", {
+                            "farmer_id": farmer_id, "work_category_id": work_category_id, "season_id": season_id,
+                            "resource_id": resource_id, "weekly_workload": generator.randint(1, 40),
+                        })
+
+        # A shallow hierarchy: some products are sold as parts of others.
+        product_ids = []
+        for _ in range(generator.randint(4, 8)):
+            product_id = add("products", {
+                "market_category_id": generator.choice(lookups["market_categories"]), "farm_id": farm_id,
+                "product_category_id": generator.choice(lookups["product_categories"]),
+                "short_description": generator.choice(PRODUCTS), "long_description": "Produit de la ferme.",
+            })
+            if product_ids and generator.random() < 0.5:
+                edges.append((product_id, generator.choice(product_ids)))
+            product_ids.append(product_id)
+
+        for label_id in generator.sample(lookups["unofficial_labels"], min(2, len(lookups["unofficial_labels"]))):
+            add("unofficial_label_instances", {"farm_id": farm_id, "unofficial_label_id": label_id, "delivery_date": _day(generator)})
+
+        owners = [("farm", farm_id)] * generator.randint(1, 3) + [("farmer", farmer_id) for farmer_id in farmer_ids]
+        owners += [("product", product_id) for product_id in product_ids]
+        owners += [("animal", animal_id) for animal_id in animal_ids] + [("crop", crop_id) for crop_id in crop_ids]
+        for position, (photoable_type, photoable_id) in enumerate(owners):
+            add("photos", {
+                "photoable_type": photoable_type, "photoable_id": photoable_id, "description": "Photo",
+                "capture_date": _day(generator), "upload_date": _day(generator), "is_main": position == 0,
+            })
+    return tables, edges
+
+def _jpeg_bytes(generator, size=(160, 120)):
+    from PIL import Image
+    image = Image.new("RGB", size, tuple(generator.randrange(256) for _ in range(3)))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=80)
+    return buffer.getvalue()
+
+def generate_media(output, tables, generator):
+    """
+    Write one small JPEG per photos row and one placeholder file per video,
+    at the paths media_paths gives them. Returns (files, bytes).
+    """
+    files = 0
+    total = 0
+    # A handful of distinct images, reused: the upload, not the encoding, is measured.
+    images = [_jpeg_bytes(generator) for _ in range(8)]
+    video = bytes(generator.randrange(256) for _ in range(1024)) * (VIDEO_BYTES // 1024)
+    targets = [(photo_stem(p["photoable_type"], p["photoable_id"], p["id"]) + ".jpg", images[p["id"] % len(images)]) for p in tables["photos"]]
+    targets += [(documentary_stem(d["farm_id"], d["id"]) + ".mp4", video) for d in tables["documentaries"]]
+    targets += [(herovideo_stem(h["farm_id"], h["id"]) + ".mp4", video) for h in tables["herovideos"]]
+    for relative_path, payload in targets:
+        path = os.path.join(output, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(payload)
+        files += 1
+        total += len(payload)
+    return files, total
+
+def generate_dataset(output, scale, seed=0, media=True):
+    """
+    Write a full seed tree under output. Returns a summary dict: rows per
+    table, seed bytes, media files and media bytes.
+    """
+    generator = random.Random(seed)
+    seeds_root = os.path.join(output, "table_seeds")
+    source_root = os.path.join(REPO_ROOT, "table_seeds")
+    os.makedirs(seeds_root, exist_ok=True)
+    shutil.copyfile(os.path.join(source_root, SCHEMA_FILE), os.path.join(seeds_root, SCHEMA_FILE))
+    rows = {}
+    for relative_path in LOOKUP_SEEDS:
+        os.makedirs(os.path.dirname(os.path.join(seeds_root, relative_path)), exist_ok=True)
+        shutil.copyfile(os.path.join(source_root, relative_path), os.path.join(seeds_root, relative_path))
+        rows[os.path.splitext(os.path.basename(relative_path))[0]] = len(_lookup_ids(seeds_root, relative_path))
+    lookups = {
+        name: _lookup_ids(seeds_root, relative_path)
+        for name, relative_path in (
+            ("animal_categories", "categories/animal_categories.json"),
+            ("crop_categories", "categories/crop_categories.json"),
+            ("market_categories", "categories/market_categories.json"),
+            ("product_categories", "categories/product_categories.json"),
+            ("unofficial_labels", "distinctions/unofficial_labels.json"),
+        )
+    }
+
+    tables, edges = generate_tables(max(1, round(scale * FARMS_PER_SCALE)), generator, lookups)
+    for table_name, records in tables.items():
+        rows[table_name] = write_json_array(os.path.join(seeds_root, table_name, f"{table_name}.json"), records)
+
+    join_path = os.path.join(output, "join_table_seeds", "product_subproducts.json")
+    os.makedirs(os.path.dirname(join_path), exist_ok=True)
+    with open(join_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "references": {
+                "column_1_reference_table": "products", "column_2_reference_table": "products",
+                "column_1_reference_key": "id", "column_2_reference_key": "id",
+            },
+            "content": [{"parent_product_id": parent, "subproduct_id": child} for parent, child in edges],
+        }, f)
+    rows["product_subproducts"] = len(edges)
+
+    seed_bytes = sum(
+        os.path.getsize(os.path.join(folder, name))
+        for base in ("table_seeds", "join_table_seeds")
+        for folder, _, names in os.walk(os.path.join(output, base))
+        for name in names if name.endswith(".json")
+    )
+    media_files, media_bytes = generate_media(output, tables, generator) if media else (0, 0)
+    return {"scale": scale, "rows": rows, "seed_bytes": seed_bytes, "media_files": media_files, "media_bytes": media_bytes}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1, help=f"Scale factor ({FARMS_PER_SCALE} farms per unit).")
+    parser.add_argument("--output", required=True, help="Folder to write table_seeds/, join_table_seeds/ and media/ into.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+    parser.add_argument("--no-media", action="store_true", help="Do not generate media files.")
+    args = parser.parse_args(argv)
+    summary = generate_dataset(args.output, args.scale, seed=args.seed, media=not args.no_media)
+    print(f"Generated {sum(summary['rows'].values())} row(s) ({summary['seed_bytes'] / 1e6:.1f} MB of seeds) "
+          f"and {summary['media_files']} media file(s) ({summary['media_bytes'] / 1e6:.1f} MB) in {args.output}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Benchmark the loading pipeline on synthetic datasets at several scale
+factors, against local stand-ins: PostgreSQL and Azurite (see
+benchmarks/docker-compose.yml). Each stage runs in its own interpreter,
+as it would from the command line, and is measured for wall time,
+throughput (rows/s, MB/s) and peak resident memory. Results are written
+as JSON so runs of different commits can be compared with --compare.
+
+Run from the repository root, with the local services up:
+    docker compose -f benchmarks/docker-compose.yml up -d
+    DB_HOST=localhost DB_PORT=5432 DB_NAME=bench DB_USER=bench DB_PASSWORD=bench DB_SSLMODE=disable \\
+    STORAGE_CONNECTION_STRING="UseDevelopmentStorage=true" STORAGE_CONTAINER_NAME=bench \\
+    python benchmarks/run_benchmarks.py --scale 1 --scale 10 --scale 100
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+
+BENCHMARKS_ROOT = os.path.dirname(os.path.abspath(__file__))
+SRC_ROOT = os.path.join(BENCHMARKS_ROOT, "..", "src")
+sys.path.insert(0, SRC_ROOT)
+
+from generate_seeds import generate_dataset
+
+RESULTS_ROOT = os.path.join(BENCHMARKS_ROOT, "results")
+# The reset wipes the database and the container: only local services qualify.
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1")
+DEFAULT_JOBS = 4
+# Relative change beyond which --compare flags a stage.
+REGRESSION_THRESHOLD = 0.10
+
+# Stage -> (module, its command line). Stages run in this order, each in
+# a fresh interpreter whose working directory is the generated dataset.
+STAGES = {
+    "upload_seed_tables": ("upload_seed_tables", ["--yes", "--jobs", "{jobs}"]),
+    "add_foreign_keys": ("add_foreign_keys", ["--jobs", "{jobs}"]),
+    "upload_seed_join_tables": ("upload_seed_join_tables", ["--yes"]),
+    "upload_media_files": ("upload_media_blob", ["--workers", "{jobs}"]),
+}
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARKS_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def check_local_services():
+    """
+    Refuse to run against anything but local services, since every
+    scale starts by wiping the database and the container.
+    """
+    if os.getenv("DB_HOST") not in LOCAL_HOSTS:
+        raise SystemExit(f"DB_HOST must be one of {', '.join(LOCAL_HOSTS)}: the benchmark drops the public schema.")
+    connection_string = os.getenv("STORAGE_CONNECTION_STRING", "")
+    if "UseDevelopmentStorage=true" not in connection_string and "127.0.0.1" not in connection_string and "localhost" not in connection_string:
+        raise SystemExit("STORAGE_CONNECTION_STRING must point at Azurite: the benchmark deletes the uploaded media.")
+
+def reset_services():
+    """
+    Start every scale from an empty database and an empty container.
+    """
+    from azure.core.exceptions import ResourceExistsError
+    from db_config import get_engine, get_container_client
+    from erase_all_tables_db import drop_public_schema
+    from erase_all_files_blob import delete_blobs
+
+    with get_engine().begin() as conn:
+        drop_public_schema(conn)
+    try:
+        get_container_client().create_container()
+    except ResourceExistsError:
+        delete_blobs()
+
+def run_stage(stage, dataset_root, jobs):
+    """
+    Run one stage in a child interpreter and measure it. os.wait4 returns
+    the resource usage of that child alone, hence its own peak RSS.
+    """
+    module, arguments = STAGES[stage]
+    argv = [argument.format(jobs=jobs) for argument in arguments]
+    code = f"import sys; sys.path.insert(0, {os.path.abspath(SRC_ROOT)!r}); import {module}; {module}.main({argv!r})"
+    log_path = os.path.join(dataset_root, f"{stage}.log")
+    start = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        process = subprocess.Popen([sys.executable, "-c", code], cwd=dataset_root, stdout=log, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(process.pid, 0)
+    seconds = time.perf_counter() - start
+    exit_code = os.waitstatus_to_exitcode(status)
+    if exit_code:
+        with open(log_path, "r", encoding="utf-8") as log:
+            print("".join(log.readlines()[-20:]))
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    peak_rss_bytes = usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    return {"seconds": seconds, "exit_code": exit_code, "peak_rss_mb": peak_rss_bytes / 1e6}
+
+def stage_volume(stage, summary):
+    """
+    The rows and bytes a stage processes, from the generator's summary.
+    """
+    table_rows = sum(count for table, count in summary["rows"].items() if table != "product_subproducts")
+    if stage == "upload_seed_tables":
+        return table_rows, summary["seed_bytes"]
+    if stage == "add_foreign_keys":
+        # Validation scans every referencing row.
+        return table_rows, None
+    if stage == "upload_seed_join_tables":
+        return summary["rows"]["product_subproducts"], None
+    return summary["media_files"], summary["media_bytes"]
+
+def bench_scale(scale, stages, jobs, seed, keep):
+    dataset_root = tempfile.mkdtemp(prefix=f"bench_x{scale:g}_")
+    print(f"\n=== Scale {scale:g}: generating the dataset in {dataset_root} ===")
+    summary = generate_dataset(dataset_root, scale, seed=seed, media="upload_media_files" in stages)
+    reset_services()
+    results = []
+    try:
+        for stage in stages:
+            measured = run_stage(stage, dataset_root, jobs)
+            rows, size = stage_volume(stage, summary)
+            result = dict(measured, stage=stage, scale=scale, rows=rows, bytes=size)
+            result["rows_per_second"] = rows / measured["seconds"] if measured["seconds"] > 0 else None
+            result["mb_per_second"] = size / 1e6 / measured["seconds"] if size and measured["seconds"] > 0 else None
+            results.append(result)
+            status = "✅" if not measured["exit_code"] else f"❌ exit {measured['exit_code']}"
+            throughput = f"{result['rows_per_second']:>12,.0f} rows/s" if result["rows_per_second"] else ""
+            if result["mb_per_second"]:
+                throughput += f" {result['mb_per_second']:>8.1f} MB/s"
+            print(f" {status} {stage:<24} {measured['seconds']:>8.2f}s {throughput}  peak RSS {measured['peak_rss_mb']:.0f} MB")
+            if measured["exit_code"]:
+                break
+    finally:
+        if not keep:
+            shutil.rmtree(dataset_root, ignore_errors=True)
+    return results
+
+def compare(results, previous_path, threshold=REGRESSION_THRESHOLD):
+    """
+    Print how each (stage, scale) moved against an earlier results file,
+    flagging slowdowns and memory growth beyond the threshold.
+    Returns the number of regressions.
+    """
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)
+    baseline = {(entry["stage"], entry["scale"]): entry for entry in previous["results"]}
+    regressions = 0
+    print(f"\nCompared with {previous.get('commit') or previous_path}:")
+    for entry in results:
+        before = baseline.get((entry["stage"], entry["scale"]))
+        if not before or before["exit_code"] or entry["exit_code"]:
+            continue
+        time_change = entry["seconds"] / before["seconds"] - 1 if before["seconds"] else 0.0
+        rss_change = entry["peak_rss_mb"] / before["peak_rss_mb"] - 1 if before["peak_rss_mb"] else 0.0
+        flagged = time_change > threshold or rss_change > threshold
+        regressions += flagged
+        print(f" {'⚠️ ' if flagged else '  '} {entry['stage']:<24} x{entry['scale']:<6g} time {time_change:+.1%}  peak RSS {rss_change:+.1%}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", type=float, action="append", help="Scale factor to run (repeatable, 1 to 1000). Default: 1 and 10.")
+    parser.add_argument("--stage", action="append", choices=list(STAGES), help="Stage to run (repeatable). Default: all.")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS, help="Concurrency passed to the stages.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the generator.")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<timestamp>-<commit>.json).")
+    parser.add_argument("--compare", help="Earlier results file to compare with; exits 1 on a regression.")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated datasets and stage logs.")
+    args = parser.parse_args(argv)
+
+    check_local_services()
+    scales = args.scale or [1, 10]
+    stages = [stage for stage in STAGES if stage in (args.stage or STAGES)]
+    results = []
+    for scale in scales:
+        results.extend(bench_scale(scale, stages, args.jobs, args.seed, args.keep))
+
+    commit = git_commit()
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    output = args.output or os.path.join(RESULTS_ROOT, f"{timestamp}-{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "commit": commit,
+            "timestamp": timestamp,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "jobs": args.jobs,
+            "results": results,
+        }, f, indent=2)
+    print(f"\nResults written to {output}")
+    if args.compare and compare(results, args.compare):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,100 +1,169 @@
-import os
 import sys
-from urllib.parse import quote_plus
-from sqlalchemy import create_engine, text
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
-from dotenv import load_dotenv
+from seed_graph import referenced_table
+from catalog import fetch_catalog
+from db_config import get_schema_engine, ConfigurationError
 
-# --- Load environment variables ---
-load_dotenv()  # For local development; in CI, use environment variables directly
+# Number of tables whose constraints are validated concurrently.
+DEFAULT_JOBS = 4
 
-# PostgreSQL credentials
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT")
-DB_NAME = os.getenv("DB_NAME")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
+def constraint_name_for(source_table, column_name):
+    return f"fk_{source_table}_{column_name}"
 
-if not all([DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD]):
-    print("Missing one or more database credentials in environment variables.")
-    sys.exit(1)
-
-# URL-encode username and password
-encoded_user = quote_plus(DB_USER)
-encoded_password = quote_plus(DB_PASSWORD)
-
-# Build connection string (with SSL mode if needed)
-connection_string = (
-    f"postgresql+psycopg2://{encoded_user}:{encoded_password}@{DB_HOST}:{DB_PORT}/{DB_NAME}?sslmode=require"
-)
-
-# Create the SQLAlchemy engine
-engine = create_engine(connection_string)
-
-def get_tables(conn):
-    """
-    Retrieve all table names from the public schema.
+def plan_foreign_keys(catalog):
     """
-    query = text("SELECT table_name FROM information_schema.tables WHERE table_schema = 'public'")
-    result = conn.execute(query)
-    return [row[0] for row in result]
-
-def get_columns(conn, table_name):
-    """
-    Retrieve columns for a given table.
-    Returns a list of column names.
+    Infer the foreign keys to add from the *_id columns of every table.
+    Columns that already have a foreign key are left alone, so the script
+    can be run again safely.
+    Returns a list of (source_table, column_name, target_table).
     """
-    query = text("""
-        SELECT column_name 
-        FROM information_schema.columns 
-        WHERE table_schema = 'public' AND table_name = :table_name
-    """)
-    result = conn.execute(query, {"table_name": table_name})
-    return [row[0] for row in result]
+    all_tables = list(catalog)
+    planned = []
+    for source_table, info in catalog.items():
+        # For each column ending with _id and not exactly 'id'
+        for col in info.columns:
+            if col == "id" or not col.endswith("_id"):
+                continue
+            # Infer target table from column name.
+            # Example: "farm_id" -> target table "farm" (or its plural "farms")
+            target_table = referenced_table(col, all_tables)
+            if not target_table:
+                print(f"Table '{source_table}': column '{col}' suggests target '{col[:-3]}', but that table does not exist.")
+            elif col in info.foreign_keys:
+                print(f"Table '{source_table}': column '{col}' already has foreign key {info.foreign_keys[col]}.")
+            else:
+                print(f"Table '{source_table}': column '{col}' refers to table '{target_table}'.")
+                planned.append((source_table, col, target_table))
+    return planned
 
 def add_foreign_key(conn, source_table, column_name, target_table):
     """
-    Adds a foreign key constraint to source_table for column_name referencing target_table(id).
+    Adds a NOT VALID foreign key constraint to source_table for column_name
+    referencing target_table(id). It is enforced for new rows right away,
+    but existing rows are only checked by validate_table_constraints, which
+    does not block writes.
     Constraint name is generated as fk_<source_table>_<column_name>
+    Returns the constraint name, or None on failure.
     """
-    constraint_name = f"fk_{source_table}_{column_name}"
+    constraint_name = constraint_name_for(source_table, column_name)
     alter_query = text(f"""
-        ALTER TABLE {source_table} 
-        ADD CONSTRAINT {constraint_name} 
+        ALTER TABLE {source_table}
+        ADD CONSTRAINT {constraint_name}
         FOREIGN KEY ({column_name}) REFERENCES {target_table}(id)
         ON UPDATE CASCADE ON DELETE CASCADE
+        NOT VALID
     """)
     try:
-        conn.execute(alter_query)
+        # A savepoint keeps one failure from aborting the other constraints.
+        with conn.begin_nested():
+            conn.execute(alter_query)
         print(f"✅ Added foreign key constraint {constraint_name}: {source_table}.{column_name} -> {target_table}(id)")
+        return constraint_name
     except SQLAlchemyError as e:
         print(f"Error adding foreign key on {source_table}.{column_name}: {e}")
+        return None
 
-def main():
+def validate_table_constraints(engine, table_name, constraint_names):
+    """
+    Validate the NOT VALID constraints of one table in its own transaction.
+    VALIDATE CONSTRAINT only takes a SHARE UPDATE EXCLUSIVE lock, so the
+    table stays readable and writable while its rows are checked.
+    Returns (validated_names, {name: error}, seconds).
+    """
+    start = time.perf_counter()
+    validated = []
+    errors = {}
+    with engine.begin() as conn:
+        for constraint_name in constraint_names:
+            try:
+                with conn.begin_nested():
+                    conn.execute(text(f"ALTER TABLE {table_name} VALIDATE CONSTRAINT {constraint_name}"))
+                validated.append(constraint_name)
+            except SQLAlchemyError as e:
+                errors[constraint_name] = e
+    return validated, errors, time.perf_counter() - start
+
+def validate_constraints(engine, constraints_by_table, jobs=DEFAULT_JOBS):
+    """
+    Validate the constraints of several tables concurrently, one connection per table.
+    Returns the number of constraints that failed validation.
+    """
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        futures = {
+            executor.submit(validate_table_constraints, engine, table_name, sorted(names)): table_name
+            for table_name, names in constraints_by_table.items() if names
+        }
+        for future in as_completed(futures):
+            table_name = futures[future]
+            try:
+                validated, errors, seconds = future.result()
+            except SQLAlchemyError as e:
+                failed += len(constraints_by_table[table_name])
+                print(f"Error validating constraints of '{table_name}': {e}")
+                continue
+            if validated:
+                print(f"✅ Validated {len(validated)} constraint(s) on '{table_name}' in {seconds:.2f}s.")
+            for constraint_name, error in errors.items():
+                failed += 1
+                print(f"Error validating {constraint_name} on '{table_name}' (it stays NOT VALID): {error}")
+    return failed
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Add foreign keys inferred from the *_id columns of every table.")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=DEFAULT_JOBS,
+        help="Number of tables whose constraints are validated concurrently.",
+    )
+    parser.add_argument(
+        "--schema",
+        default="public",
+        help="Schema whose tables are processed (e.g. a shadow schema being loaded).",
+    )
+    return parser.parse_args(argv)
+
+def main(argv=None, engine=None):
+    args = parse_args(argv)
+    engine = engine or get_schema_engine(args.schema, pool_size=args.jobs)
     with engine.connect() as conn:
-        all_tables = get_tables(conn)
-        print("Tables in the public schema:")
-        for t in all_tables:
-            print(" -", t)
-        
-        print("\nProcessing foreign keys based on column names ending with '_id' ...")
-        # Iterate over each table
-        for source_table in all_tables:
-            columns = get_columns(conn, source_table)
-            # For each column ending with _id and not exactly 'id'
-            for col in columns:
-                if col == "id":
-                    continue
-                if col.endswith("_id"):
-                    # Infer target table from column name.
-                    # Example: "farm_id" -> target table "farm"
-                    target_table = col[:-3]  # Remove "_id"
-                    if target_table in all_tables:
-                        print(f"Table '{source_table}': column '{col}' refers to table '{target_table}'.")
-                        add_foreign_key(conn, source_table, col, target_table)
-                    else:
-                        print(f"Table '{source_table}': column '{col}' suggests target '{target_table}', but that table does not exist.")
-    print("\n✅ Foreign key constraints processing complete.")
+        catalog = fetch_catalog(conn, args.schema)
+    print(f"Tables in the {args.schema} schema:")
+    for t in catalog:
+        print(" -", t)
+
+    print("\nProcessing foreign keys based on column names ending with '_id' ...")
+    planned = plan_foreign_keys(catalog)
+
+    # Constraints left NOT VALID by an earlier, interrupted run are validated too.
+    to_validate = {table_name: set(info.unvalidated) for table_name, info in catalog.items()}
+    added = 0
+    start = time.perf_counter()
+    # Adding NOT VALID constraints only needs brief locks, so they all go in one transaction.
+    with engine.begin() as conn:
+        for source_table, col, target_table in planned:
+            constraint_name = add_foreign_key(conn, source_table, col, target_table)
+            if constraint_name:
+                added += 1
+                to_validate[source_table].add(constraint_name)
+    print(f"Added {added} constraint definition(s) in {time.perf_counter() - start:.2f}s.")
+
+    start = time.perf_counter()
+    failed = validate_constraints(engine, to_validate, jobs=args.jobs)
+    print(f"Validation took {time.perf_counter() - start:.2f}s.")
+    if failed:
+        print(f"\n{failed} constraint(s) could not be validated; fix the offending rows and run the script again.")
+    else:
+        print("\n✅ Foreign key constraints processing complete.")
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    except ConfigurationError as e:
+        print(e)
+        sys.exit(1)
@@ -0,0 +1,117 @@
+import io
+import os
+import mmap
+import math
+from concurrent.futures import ThreadPoolExecutor
+from azure.core.exceptions import ResourceNotFoundError
+from azure.storage.blob import BlobBlock
+
+# Files at least this large are uploaded block by block.
+DEFAULT_LARGE_FILE_THRESHOLD = 64 * 1024 * 1024
+# Size of each staged block and number of blocks staged concurrently.
+DEFAULT_BLOCK_SIZE = 8 * 1024 * 1024
+DEFAULT_MAX_CONCURRENCY = 4
+# Azure rejects blobs made of more blocks than this.
+MAX_BLOCKS_PER_BLOB = 50000
+
+class MappedBlockReader(io.RawIOBase):
+    """
+    Seekable read-only file object over a byte range of a memory-mapped
+    file. The HTTP client reads it in small chunks (and rewinds it when a
+    request is retried), so a block is never copied into one Python buffer.
+    """
+
+    def __init__(self, mapped, start, end):
+        super().__init__()
+        self.mapped = mapped
+        self.start = start
+        self.end = end
+        self.position = 0
+
+    def __len__(self):
+        return self.end - self.start
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self.position + offset
+        else:
+            position = len(self) + offset
+        self.position = min(max(position, 0), len(self))
+        return self.position
+
+    def readinto(self, buffer):
+        count = min(len(buffer), len(self) - self.position)
+        if count <= 0:
+            return 0
+        offset = self.start + self.position
+        buffer[:count] = self.mapped[offset:offset + count]
+        self.position += count
+        return count
+
+def block_ids_for(md5, file_size, block_size):
+    """
+    Return the ordered block ids of a file. Ids derive from the file's MD5,
+    so blocks staged by an interrupted upload of the same content are
+    recognised, while a modified file never reuses stale blocks.
+    """
+    block_count = max(1, math.ceil(file_size / block_size))
+    return [f"{md5.hex()}-{index:06d}" for index in range(block_count)]
+
+def get_staged_blocks(blob_client):
+    """
+    Return a dict mapping the ids of uncommitted blocks of a blob to their size.
+    """
+    try:
+        _, uncommitted = blob_client.get_block_list("uncommitted")
+    except ResourceNotFoundError:
+        return {}
+    return {block.id: block.size for block in uncommitted}
+
+def upload_large_file(blob_client, local_file_path, md5, content_settings,
+                      block_size=DEFAULT_BLOCK_SIZE, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+    """
+    Upload a file as staged blocks committed in one block list.
+
+    Blocks are read from a memory map and staged in parallel. Blocks already
+    staged by a previous, interrupted attempt (uncommitted blocks are kept
+    for a week) are not sent again.
+    Returns the number of blocks actually staged by this call.
+    """
+    file_size = os.path.getsize(local_file_path)
+    block_size = max(block_size, math.ceil(file_size / MAX_BLOCKS_PER_BLOB))
+    block_ids = block_ids_for(md5, file_size, block_size)
+    staged = get_staged_blocks(blob_client)
+
+    with open(local_file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        def stage(index):
+            start = index * block_size
+            end = min(start + block_size, file_size)
+            if staged.get(block_ids[index]) == end - start:
+                return False
+            blob_client.stage_block(block_ids[index], MappedBlockReader(mapped, start, end), length=end - start)
+            return True
+
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+            staged_now = sum(executor.map(stage, range(len(block_ids))))
+
+    blob_client.commit_block_list(
+        [BlobBlock(block_id=block_id) for block_id in block_ids],
+        content_settings=content_settings,
+    )
+    resumed = len(block_ids) - staged_now
+    print(
+        f"Committed {len(block_ids)} block(s) of {block_size // (1024 * 1024)} MB for {local_file_path}"
+        + (f" ({resumed} resumed from a previous attempt)." if resumed else ".")
+    )
+    return staged_now
@@ -0,0 +1,246 @@
+import io
+import json
+import time
+from itertools import islice
+import psycopg2
+from psycopg2.extras import execute_values
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from instrumentation import get_logger, metrics
+from resilience import retry, is_transient, connection_lost
+
+# Supported load modes:
+#   - copy:   stream each batch through COPY ... FROM STDIN (fastest)
+#   - values: multi-row INSERT ... VALUES built with psycopg2 execute_values
+#   - row:    one INSERT per record (legacy behaviour, slowest)
+LOAD_MODES = ("copy", "values", "row")
+DEFAULT_LOAD_MODE = "copy"
+DEFAULT_BATCH_SIZE = 5000
+
+log = get_logger("bulk_loader")
+
+def iter_batches(records, batch_size):
+    """
+    Yield lists of at most batch_size records from any iterable.
+    """
+    iterator = iter(records)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def _pg_array_literal(values):
+    """
+    Render a Python list as a PostgreSQL array literal, e.g. [1, 2] -> {1,2}.
+    """
+    elements = []
+    for value in values:
+        if value is None:
+            elements.append("NULL")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            elements.append(str(value))
+        else:
+            escaped = str(value).replace("\\", "\\\\").replace('"', '\\"')
+            elements.append(f'"{escaped}"')
+    return "{" + ",".join(elements) + "}"
+
+def _copy_text_value(value):
+    """
+    Encode a single value for COPY's text format (NULL is written as \\N).
+    """
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        value = "true" if value else "false"
+    elif isinstance(value, (list, tuple)):
+        value = _pg_array_literal(value)
+    elif isinstance(value, dict):
+        value = json.dumps(value, ensure_ascii=False)
+    else:
+        value = str(value)
+    return (
+        value.replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+def encode_copy_rows(columns, records):
+    """
+    Encode records as a COPY text-format buffer, one line per record.
+    Records are dicts; columns gives the order of the values on each line.
+    """
+    buffer = io.StringIO()
+    for record in records:
+        buffer.write("\t".join(_copy_text_value(record.get(col)) for col in columns))
+        buffer.write("\n")
+    buffer.seek(0)
+    return buffer
+
+def _dbapi_cursor(conn):
+    """
+    Return a raw psycopg2 cursor bound to the SQLAlchemy connection, so that
+    COPY and execute_values run inside the same transaction.
+    """
+    return conn.connection.cursor()
+
+def copy_batch(conn, table_name, columns, records):
+    """
+    Load a batch of records with COPY ... FROM STDIN.
+    """
+    col_names = ", ".join(columns)
+    buffer = encode_copy_rows(columns, records)
+    with _dbapi_cursor(conn) as cursor:
+        cursor.copy_expert(f"COPY {table_name} ({col_names}) FROM STDIN", buffer)
+
+def values_batch(conn, table_name, columns, records, page_size=DEFAULT_BATCH_SIZE):
+    """
+    Load a batch of records with multi-row INSERT ... VALUES statements.
+    """
+    col_names = ", ".join(columns)
+    rows = [tuple(record.get(col) for col in columns) for record in records]
+    with _dbapi_cursor(conn) as cursor:
+        execute_values(
+            cursor,
+            f"INSERT INTO {table_name} ({col_names}) VALUES %s",
+            rows,
+            page_size=page_size,
+        )
+
+def insert_record(conn, table_name, record):
+    """
+    Insert a single record inside its own savepoint so a failure does not
+    abort the surrounding transaction. Returns True on success, False if
+    the record is rejected; transient errors (e.g. a dropped connection)
+    are raised, so the caller can retry the whole load.
+    """
+    columns = record.keys()
+    col_names = ", ".join(columns)
+    placeholders = ", ".join(f":{col}" for col in columns)
+    query = text(f"INSERT INTO {table_name} ({col_names}) VALUES ({placeholders})")
+    savepoint = conn.begin_nested()
+    try:
+        conn.execute(query, record)
+        savepoint.commit()
+        return True
+    except SQLAlchemyError as e:
+        if connection_lost(e):
+            raise
+        savepoint.rollback()
+        if is_transient(e):
+            raise
+        log.warning(f"Error inserting record into table '{table_name}': {e}")
+        log.debug(f"Failed record: {record}")
+        return False
+
+def insert_records_individually(conn, table_name, records):
+    """
+    Insert records one by one, isolating the ones that fail.
+    Returns (inserted_count, failed_records).
+    """
+    inserted = 0
+    failed = []
+    for record in records:
+        if insert_record(conn, table_name, record):
+            inserted += 1
+        else:
+            failed.append(record)
+    return inserted, failed
+
+def _load_batch(conn, table_name, columns, records, mode, batch_size):
+    """
+    Load one batch with the bulk mode inside a savepoint. A transient
+    failure that leaves the connection usable (deadlock, lock timeout...)
+    is retried with backoff; a lost connection is raised, since the
+    transaction is lost with it. If the batch is rejected, roll it back and
+    replay it row by row to isolate bad records.
+    Returns (inserted_count, failed_records).
+    """
+    def load_once():
+        savepoint = conn.begin_nested()
+        try:
+            if mode == "copy":
+                copy_batch(conn, table_name, columns, records)
+            else:
+                values_batch(conn, table_name, columns, records, page_size=batch_size)
+            savepoint.commit()
+        except (psycopg2.Error, SQLAlchemyError) as e:
+            if not connection_lost(e):
+                savepoint.rollback()
+            raise
+
+    try:
+        retry(
+            load_once,
+            f"Bulk {mode} batch of {len(records)} row(s) into '{table_name}'",
+            retry_if=lambda e: is_transient(e) and not connection_lost(e),
+        )
+        return len(records), []
+    except (psycopg2.Error, SQLAlchemyError) as e:
+        if is_transient(e):
+            raise
+        metrics.increment("batch_fallbacks")
+        log.warning(f"Bulk {mode} batch of {len(records)} row(s) into '{table_name}' failed: {e}")
+        log.warning("Falling back to row-by-row inserts to isolate failing records...")
+        return insert_records_individually(conn, table_name, records)
+
+def bulk_load(conn, table_name, records, mode=DEFAULT_LOAD_MODE, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Load an iterable of record dicts into table_name using the given mode.
+
+    The column list is taken from the first record. Records whose keys differ
+    from it (or that are not dicts) cannot share a COPY stream and are
+    inserted individually instead.
+
+    Returns a dict with the table name, inserted and failed row counts,
+    elapsed seconds and throughput in rows per second.
+    """
+    if mode not in LOAD_MODES:
+        raise ValueError(f"Unknown load mode '{mode}', expected one of {LOAD_MODES}")
+
+    start = time.perf_counter()
+    inserted = 0
+    failed = []
+    columns = None
+
+    for batch in iter_batches(records, batch_size):
+        uniform = []
+        irregular = []
+        for record in batch:
+            if not isinstance(record, dict):
+                log.debug(f"Skipping invalid record for table '{table_name}': {record}")
+                failed.append(record)
+                continue
+            if columns is None:
+                columns = list(record.keys())
+            if mode != "row" and set(record.keys()) == set(columns):
+                uniform.append(record)
+            else:
+                irregular.append(record)
+
+        if uniform:
+            batch_inserted, batch_failed = _load_batch(conn, table_name, columns, uniform, mode, batch_size)
+            inserted += batch_inserted
+            failed.extend(batch_failed)
+        if irregular:
+            batch_inserted, batch_failed = insert_records_individually(conn, table_name, irregular)
+            inserted += batch_inserted
+            failed.extend(batch_failed)
+
+    elapsed = time.perf_counter() - start
+    rate = inserted / elapsed if elapsed > 0 else 0.0
+    metrics.increment("rows_loaded", inserted)
+    metrics.increment("rows_failed", len(failed))
+    log.info(
+        f"Loaded {inserted} row(s) into '{table_name}' in {elapsed:.2f}s "
+        f"({rate:,.0f} rows/s, mode={mode}, batch size={batch_size})"
+        + (f", {len(failed)} failed." if failed else ".")
+    )
+    return {
+        "table": table_name,
+        "rows": inserted,
+        "failed": len(failed),
+        "seconds": elapsed,
+        "rows_per_second": rate,
+    }
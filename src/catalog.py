@@ -0,0 +1,133 @@
+from collections import namedtuple
+from sqlalchemy import text
+
+# Columns of a table, its single-column foreign keys ({column: constraint
+# name}), the names of its constraints that are still NOT VALID, the column
+# lists of its valid indexes (primary key included) and the names of its
+# invalid indexes, left behind by a failed CREATE INDEX CONCURRENTLY.
+TableInfo = namedtuple(
+    "TableInfo",
+    ["columns", "foreign_keys", "unvalidated", "indexes", "invalid_indexes"],
+    defaults=((), ()),
+)
+
+CATALOG_QUERY = text("""
+    SELECT c.relname,
+           ARRAY(
+               SELECT a.attname FROM pg_attribute a
+               WHERE a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+               ORDER BY a.attnum
+           ) AS columns,
+           ARRAY(
+               SELECT a.attname FROM pg_constraint con
+               JOIN pg_attribute a ON a.attrelid = con.conrelid AND a.attnum = con.conkey[1]
+               WHERE con.conrelid = c.oid AND con.contype = 'f' AND cardinality(con.conkey) = 1
+               ORDER BY con.conname
+           ) AS fk_columns,
+           ARRAY(
+               SELECT con.conname FROM pg_constraint con
+               WHERE con.conrelid = c.oid AND con.contype = 'f' AND cardinality(con.conkey) = 1
+               ORDER BY con.conname
+           ) AS fk_names,
+           ARRAY(
+               SELECT con.conname FROM pg_constraint con
+               WHERE con.conrelid = c.oid AND NOT con.convalidated
+           ) AS unvalidated,
+           ARRAY(
+               SELECT string_agg(a.attname, ',' ORDER BY k.position)
+               FROM pg_index i
+               CROSS JOIN LATERAL unnest(i.indkey::int2[]) WITH ORDINALITY AS k(attnum, position)
+               JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+               WHERE i.indrelid = c.oid AND i.indisvalid
+               GROUP BY i.indexrelid
+           ) AS indexes,
+           ARRAY(
+               SELECT ic.relname FROM pg_index i
+               JOIN pg_class ic ON ic.oid = i.indexrelid
+               WHERE i.indrelid = c.oid AND NOT i.indisvalid
+           ) AS invalid_indexes
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = :schema AND c.relkind IN ('r', 'p')
+    ORDER BY c.relname
+""")
+
+def fetch_catalog(conn, schema="public"):
+    """
+    Read every table of the schema with its columns, foreign keys and
+    indexes in a single pg_catalog query, instead of one information_schema
+    query per table.
+    Returns a dict mapping table name to TableInfo.
+    """
+    catalog = {}
+    rows = conn.execute(CATALOG_QUERY, {"schema": schema})
+    for table_name, columns, fk_columns, fk_names, unvalidated, indexes, invalid_indexes in rows:
+        catalog[table_name] = TableInfo(
+            list(columns),
+            dict(zip(fk_columns, fk_names)),
+            set(unvalidated),
+            [tuple(index.split(",")) for index in indexes],
+            list(invalid_indexes),
+        )
+    return catalog
+
+ROW_ESTIMATES_QUERY = text("""
+    SELECT c.relname, c.reltuples::bigint
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = COALESCE(:schema, current_schema()) AND c.relkind IN ('r', 'p') AND c.relname = ANY(:table_names)
+""")
+
+def fetch_row_estimates(conn, table_names, schema=None):
+    """
+    Read the planner's row estimate (pg_class.reltuples) of several tables
+    in one query, instead of a COUNT(*) scan per table. schema defaults to
+    the connection's current schema, e.g. the shadow schema of a reseed.
+    Returns a dict mapping each existing table to its estimate, or to None
+    when the table has never been vacuumed or analyzed. Missing tables are
+    left out.
+    """
+    rows = conn.execute(ROW_ESTIMATES_QUERY, {"schema": schema, "table_names": list(table_names)})
+    return {table_name: (estimate if estimate >= 0 else None) for table_name, estimate in rows}
+
+# A table's planner row estimate (None if never analyzed), its size on disk
+# (heap and TOAST) and the size of its indexes, in bytes, and its columns
+# as (name, type) pairs.
+TableOverview = namedtuple("TableOverview", ["estimated_rows", "table_bytes", "index_bytes", "columns"])
+
+OVERVIEW_QUERY = text("""
+    SELECT c.relname,
+           c.reltuples::bigint,
+           pg_table_size(c.oid),
+           pg_indexes_size(c.oid),
+           ARRAY(
+               SELECT a.attname FROM pg_attribute a
+               WHERE a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+               ORDER BY a.attnum
+           ) AS column_names,
+           ARRAY(
+               SELECT format_type(a.atttypid, a.atttypmod) FROM pg_attribute a
+               WHERE a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+               ORDER BY a.attnum
+           ) AS column_types
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = :schema AND c.relkind IN ('r', 'p')
+    ORDER BY c.relname
+""")
+
+def fetch_table_overview(conn, schema="public"):
+    """
+    Read every table of the schema with its row estimate, sizes and column
+    types in a single pg_catalog query.
+    Returns a dict mapping table name to TableOverview.
+    """
+    overview = {}
+    for table_name, estimate, table_bytes, index_bytes, names, types in conn.execute(OVERVIEW_QUERY, {"schema": schema}):
+        overview[table_name] = TableOverview(
+            estimate if estimate >= 0 else None,
+            table_bytes,
+            index_bytes,
+            list(zip(names, types)),
+        )
+    return overview
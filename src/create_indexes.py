@@ -0,0 +1,184 @@
+import sys
+import time
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from catalog import fetch_catalog
+from geo_queries import ensure_spatial_index, ADDRESSES_TABLE
+from db_config import get_schema_engine, ConfigurationError
+
+# Number of tables indexed concurrently. Concurrent builds on the same table
+# wait for each other, so the indexes of one table are built one by one.
+DEFAULT_JOBS = 2
+# PostgreSQL truncates identifiers longer than this.
+MAX_IDENTIFIER_LENGTH = 63
+
+def index_name_for(table_name, columns):
+    """
+    idx_<table>_<col1>_<col2>, shortened with a hash suffix when it would
+    exceed PostgreSQL's identifier length.
+    """
+    name = f"idx_{table_name}_{'_'.join(columns)}"
+    if len(name) > MAX_IDENTIFIER_LENGTH:
+        digest = hashlib.sha1(name.encode("utf-8")).hexdigest()[:8]
+        name = f"{name[:MAX_IDENTIFIER_LENGTH - 9]}_{digest}"
+    return name
+
+def polymorphic_pairs(columns):
+    """
+    Find polymorphic references: <name>able_type / <name>able_id column pairs
+    (e.g. photos.photoable_type + photoable_id).
+    """
+    pairs = []
+    for col in columns:
+        if col.endswith("able_type"):
+            id_column = col[:-len("_type")] + "_id"
+            if id_column in columns:
+                pairs.append((col, id_column))
+    return pairs
+
+def is_covered(columns, existing_indexes):
+    """
+    An index is redundant when an existing index (the primary key included)
+    starts with the same columns.
+    """
+    return any(tuple(index[:len(columns)]) == tuple(columns) for index in existing_indexes)
+
+def plan_indexes(catalog):
+    """
+    Derive the indexes to build from the naming conventions: one composite
+    index per polymorphic *able_type / *able_id pair, and one index per
+    other *_id column. Indexes already covered, e.g. by the leading column
+    of a join table's composite primary key, are skipped.
+    Returns a list of (table_name, index_name, columns).
+    """
+    planned = []
+    for table_name, info in catalog.items():
+        wanted = polymorphic_pairs(info.columns)
+        in_pairs = {col for pair in wanted for col in pair}
+        wanted += [(col,) for col in info.columns if col.endswith("_id") and col not in in_pairs]
+        for columns in wanted:
+            if not is_covered(columns, info.indexes):
+                planned.append((table_name, index_name_for(table_name, columns), columns))
+    return planned
+
+def drop_invalid_indexes(conn, catalog, planned):
+    """
+    Drop the invalid indexes a failed concurrent build of a planned index
+    left behind, so they can be rebuilt (IF NOT EXISTS would otherwise keep
+    them). Invalid indexes of other names are left alone: they may be
+    builds still running in another session.
+    """
+    planned_names = {index_name for _, index_name, _ in planned}
+    for table_name, info in catalog.items():
+        for index_name in info.invalid_indexes:
+            if index_name in planned_names:
+                print(f"Dropping invalid index {index_name} on '{table_name}'.")
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}"))
+
+def build_table_indexes(engine, table_name, indexes):
+    """
+    Build the indexes of one table with CREATE INDEX CONCURRENTLY, which
+    does not block writes. It cannot run inside a transaction block, hence
+    the autocommit connection.
+    Returns a list of (index_name, seconds or None, error or None).
+    """
+    results = []
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for index_name, columns in indexes:
+            start = time.perf_counter()
+            try:
+                conn.execute(text(
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} ON {table_name} ({', '.join(columns)})"
+                ))
+                results.append((index_name, time.perf_counter() - start, None))
+            except SQLAlchemyError as e:
+                # A failed concurrent build leaves an invalid index behind.
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}"))
+                results.append((index_name, None, e))
+    return results
+
+def build_indexes(engine, planned, jobs=DEFAULT_JOBS):
+    """
+    Build the planned indexes, several tables at a time, and print the
+    build time of each index.
+    Returns the number of indexes that failed.
+    """
+    by_table = {}
+    for table_name, index_name, columns in planned:
+        by_table.setdefault(table_name, []).append((index_name, columns))
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        futures = {
+            executor.submit(build_table_indexes, engine, table_name, indexes): table_name
+            for table_name, indexes in by_table.items()
+        }
+        for future in as_completed(futures):
+            table_name = futures[future]
+            try:
+                results = future.result()
+            except SQLAlchemyError as e:
+                failed += len(by_table[table_name])
+                print(f"Error indexing table '{table_name}': {e}")
+                continue
+            for index_name, seconds, error in results:
+                if error is None:
+                    print(f"✅ Built index {index_name} on '{table_name}' in {seconds:.2f}s.")
+                else:
+                    failed += 1
+                    print(f"Error building index {index_name} on '{table_name}': {error}")
+    return failed
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Index the *_id and polymorphic *able_type/*able_id columns of every table.")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=DEFAULT_JOBS,
+        help="Number of tables indexed concurrently.",
+    )
+    parser.add_argument(
+        "--schema",
+        default="public",
+        help="Schema whose tables are processed (e.g. a shadow schema being loaded).",
+    )
+    return parser.parse_args(argv)
+
+def main(argv=None, engine=None):
+    args = parse_args(argv)
+    engine = engine or get_schema_engine(args.schema, pool_size=args.jobs)
+    with engine.connect() as conn:
+        catalog = fetch_catalog(conn, args.schema)
+
+    address_columns = catalog[ADDRESSES_TABLE].columns if ADDRESSES_TABLE in catalog else []
+    if "latitude" in address_columns and "longitude" in address_columns:
+        with engine.begin() as conn:
+            ensure_spatial_index(conn)
+
+    planned = plan_indexes(catalog)
+    if not planned:
+        print("✅ Every *_id column is already indexed.")
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        drop_invalid_indexes(conn, catalog, planned)
+    print("The following indexes will be built:")
+    for table_name, index_name, columns in planned:
+        print(f" - {index_name} ON {table_name} ({', '.join(columns)})")
+
+    start = time.perf_counter()
+    failed = build_indexes(engine, planned, jobs=args.jobs)
+    print(f"\nBuilt {len(planned) - failed} index(es) in {time.perf_counter() - start:.2f}s.")
+    if failed:
+        print(f"{failed} index(es) could not be built.")
+    else:
+        print("✅ Index creation complete.")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except ConfigurationError as e:
+        print(e)
+        sys.exit(1)
@@ -0,0 +1,183 @@
+import os
+import threading
+from urllib.parse import quote_plus
+from sqlalchemy import create_engine
+from azure.storage.blob import BlobServiceClient
+from dotenv import load_dotenv
+
+# Connection settings shared by every script. Nothing connects at import
+# time: the engine and the storage client are built on first use and then
+# reused, so a whole pipeline run in one process shares one connection pool.
+
+DB_CREDENTIAL_VARS = ("DB_HOST", "DB_PORT", "DB_NAME", "DB_USER", "DB_PASSWORD")
+STORAGE_CREDENTIAL_VARS = ("STORAGE_ACCOUNT_NAME", "STORAGE_ACCOUNT_KEY")
+
+# Pool defaults, overridable with DB_POOL_SIZE / DB_MAX_OVERFLOW.
+DEFAULT_POOL_SIZE = 5
+DEFAULT_MAX_OVERFLOW = 5
+# Recycle connections before Azure's gateway drops them as idle.
+DEFAULT_POOL_RECYCLE_SECONDS = 1800
+DEFAULT_CONNECT_TIMEOUT_SECONDS = 10
+# Server-side limit per statement, overridable with DB_STATEMENT_TIMEOUT_MS
+# (0 disables it). Generous enough for a bulk COPY of a whole seed table.
+DEFAULT_STATEMENT_TIMEOUT_MS = 10 * 60 * 1000
+# TCP keepalives stop long loads and idle pooled connections from being cut
+# by the load balancer in front of Azure Database for PostgreSQL.
+KEEPALIVE_SETTINGS = {
+    "keepalives": 1,
+    "keepalives_idle": 30,
+    "keepalives_interval": 10,
+    "keepalives_count": 5,
+}
+
+_lock = threading.Lock()
+_engine = None
+# Engines whose connections resolve unqualified names in another schema
+# (e.g. a shadow schema being loaded), keyed by search_path.
+_search_path_engines = {}
+_container_client = None
+
+class ConfigurationError(RuntimeError):
+    """
+    Raised when required connection settings are missing from the environment.
+    """
+
+def _load_env():
+    # For local development; in CI, use environment variables directly.
+    load_dotenv()
+
+def _int_setting(name, default):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+def get_connection_string():
+    """
+    Build the SQLAlchemy URL from the DB_* environment variables.
+    """
+    _load_env()
+    missing = [name for name in DB_CREDENTIAL_VARS if not os.getenv(name)]
+    if missing:
+        raise ConfigurationError(f"Missing database credentials in environment variables: {', '.join(missing)}")
+    # URL-encode username and password in case of special characters
+    encoded_user = quote_plus(os.getenv("DB_USER"))
+    encoded_password = quote_plus(os.getenv("DB_PASSWORD"))
+    sslmode = os.getenv("DB_SSLMODE", "require")
+    return (
+        f"postgresql+psycopg2://{encoded_user}:{encoded_password}"
+        f"@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}?sslmode={sslmode}"
+    )
+
+def _connect_args(search_path=None):
+    connect_args = dict(KEEPALIVE_SETTINGS, connect_timeout=DEFAULT_CONNECT_TIMEOUT_SECONDS)
+    options = []
+    statement_timeout = _int_setting("DB_STATEMENT_TIMEOUT_MS", DEFAULT_STATEMENT_TIMEOUT_MS)
+    if statement_timeout > 0:
+        options.append(f"-c statement_timeout={statement_timeout}")
+    if search_path:
+        options.append("-c search_path=" + ",".join(search_path))
+    if options:
+        connect_args["options"] = " ".join(options)
+    return connect_args
+
+def _create_engine(pool_size, search_path=None):
+    size = max(pool_size or 0, _int_setting("DB_POOL_SIZE", DEFAULT_POOL_SIZE))
+    return create_engine(
+        get_connection_string(),
+        pool_size=size,
+        max_overflow=_int_setting("DB_MAX_OVERFLOW", DEFAULT_MAX_OVERFLOW),
+        pool_pre_ping=True,
+        pool_recycle=DEFAULT_POOL_RECYCLE_SECONDS,
+        connect_args=_connect_args(search_path),
+    )
+
+def get_engine(pool_size=None):
+    """
+    Return the process-wide SQLAlchemy engine, creating it on first use.
+
+    pool_size asks for at least that many pooled connections (e.g. one per
+    parallel loader); the engine is rebuilt only when its pool is smaller.
+    Raises ConfigurationError when credentials are missing.
+    """
+    global _engine
+    with _lock:
+        if _engine is not None and (pool_size is None or _engine.pool.size() >= pool_size):
+            return _engine
+        engine = _create_engine(pool_size)
+        if _engine is not None:
+            # Connections still checked out of the old pool close when returned.
+            _engine.dispose()
+        _engine = engine
+        return _engine
+
+def get_search_path_engine(search_path, pool_size=None):
+    """
+    Return an engine whose connections use the given search_path (a list
+    of schema names), so the scripts' unqualified table names resolve in
+    those schemas instead of public. Cached per search_path like get_engine.
+    """
+    key = tuple(search_path)
+    with _lock:
+        engine = _search_path_engines.get(key)
+        if engine is not None and (pool_size is None or engine.pool.size() >= pool_size):
+            return engine
+        new_engine = _create_engine(pool_size, key)
+        if engine is not None:
+            engine.dispose()
+        _search_path_engines[key] = new_engine
+        return new_engine
+
+def get_schema_engine(schema, pool_size=None):
+    """
+    Return the engine of a script's --schema option: the shared engine for
+    public, else a search_path engine resolving unqualified names in schema
+    first, then in public (where extensions such as PostGIS are installed).
+    """
+    if schema == "public":
+        return get_engine(pool_size)
+    return get_search_path_engine([schema, "public"], pool_size)
+
+def dispose_engine():
+    """
+    Close every pooled connection, e.g. at the end of a pipeline run.
+    """
+    global _engine
+    with _lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
+        for engine in _search_path_engines.values():
+            engine.dispose()
+        _search_path_engines.clear()
+
+def get_storage_connection_string():
+    """
+    Return STORAGE_CONNECTION_STRING when set (e.g. to target Azurite),
+    otherwise build one from the account name and key.
+    """
+    _load_env()
+    connect_str = os.getenv("STORAGE_CONNECTION_STRING")
+    if connect_str:
+        return connect_str
+    missing = [name for name in STORAGE_CREDENTIAL_VARS if not os.getenv(name)]
+    if missing:
+        raise ConfigurationError(f"Missing Azure storage credentials in environment variables: {', '.join(missing)}")
+    return (
+        f"DefaultEndpointsProtocol=https;AccountName={os.getenv('STORAGE_ACCOUNT_NAME')};"
+        f"AccountKey={os.getenv('STORAGE_ACCOUNT_KEY')};EndpointSuffix=core.windows.net"
+    )
+
+def get_container_client():
+    """
+    Return the process-wide client of the STORAGE_CONTAINER_NAME container,
+    creating it on first use. Raises ConfigurationError when settings are missing.
+    """
+    global _container_client
+    with _lock:
+        if _container_client is None:
+            connect_str = get_storage_connection_string()
+            container_name = os.getenv("STORAGE_CONTAINER_NAME")
+            if not container_name:
+                raise ConfigurationError("Missing STORAGE_CONTAINER_NAME in environment variables.")
+            blob_service_client = BlobServiceClient.from_connection_string(connect_str)
+            _container_client = blob_service_client.get_container_client(container_name)
+        return _container_client
@@ -1,36 +1,145 @@
-import os
-from azure.storage.blob import BlobServiceClient
-from dotenv import load_dotenv
-
-# Load environment variables from .env
-load_dotenv()
-
-# Retrieve Azure credentials and container name from environment variables
-account_name = os.getenv("STORAGE_ACCOUNT_NAME")
-account_key = os.getenv("STORAGE_ACCOUNT_KEY")
-container_name = os.getenv("STORAGE_CONTAINER_NAME")
-
-if not account_name or not account_key or not container_name:
-    print("Missing Azure storage credentials in environment variables.")
-    exit(1)
-
-# Build connection string and create a container client
-connect_str = f"DefaultEndpointsProtocol=https;AccountName={account_name};AccountKey={account_key};EndpointSuffix=core.windows.net"
-blob_service_client = BlobServiceClient.from_connection_string(connect_str)
-container_client = blob_service_client.get_container_client(container_name)
-
-# List all blobs in the container
-blobs = list(container_client.list_blobs())
-print("The following blobs will be deleted:")
-for blob in blobs:
-    print(f" - {blob.name}")
-
-# Ask for manual confirmation
-confirm = input("Are you sure you want to delete all these blobs? Type 'yes' to confirm: ")
-if confirm.lower() == "yes":
-    for blob in blobs:
-        print(f"Deleting {blob.name}...")
-        container_client.delete_blob(blob.name)
-    print("✅ All blobs have been deleted.")
-else:
-    print("Operation aborted.")
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from db_config import get_container_client, ConfigurationError
+
+# The Blob Batch API accepts at most 256 sub-requests per batch.
+MAX_BATCH_SIZE = 256
+DEFAULT_WORKERS = 4
+# Number of blob names shown before asking for confirmation.
+PREVIEW_COUNT = 20
+
+def iter_blob_name_batches(prefix=None, batch_size=MAX_BATCH_SIZE):
+    """
+    Stream blob names page by page and yield them in lists of batch_size,
+    without ever holding the full listing in memory.
+    """
+    batch = []
+    for page in get_container_client().list_blobs(name_starts_with=prefix).by_page():
+        for blob in page:
+            batch.append(blob.name)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+def preview_blobs(prefix=None):
+    """
+    Print the first blob names under prefix and return the total count.
+    """
+    count = 0
+    for batch in iter_blob_name_batches(prefix):
+        for name in batch:
+            if count < PREVIEW_COUNT:
+                print(f" - {name}")
+            count += 1
+    if count > PREVIEW_COUNT:
+        print(f"   ... and {count - PREVIEW_COUNT} more")
+    return count
+
+def delete_batch(names):
+    """
+    Delete up to 256 blobs in a single Blob Batch request.
+    Returns (deleted_count, failed_names).
+    """
+    responses = get_container_client().delete_blobs(*names, raise_on_any_failure=False)
+    failed = []
+    for name, response in zip(names, responses):
+        # 404 means the blob is already gone, which is what we want.
+        if response.status_code not in (202, 404):
+            failed.append(name)
+    return len(names) - len(failed), failed
+
+def delete_blobs(prefix=None, batch_size=MAX_BATCH_SIZE, workers=DEFAULT_WORKERS):
+    """
+    Delete every blob under prefix with concurrent batch requests. At most
+    two batches per worker are in flight, so the listing is consumed no
+    faster than blobs are deleted.
+    Returns (deleted_count, failed_names, elapsed_seconds).
+    """
+    start = time.perf_counter()
+    deleted = 0
+    failed = []
+    # Future of each batch request -> the names it deletes.
+    in_flight = {}
+
+    def collect(done):
+        nonlocal deleted
+        for future in done:
+            names = in_flight.pop(future)
+            try:
+                batch_deleted, batch_failed = future.result()
+            except Exception as e:
+                print(f"Error deleting a batch of {len(names)} blob(s): {e}")
+                failed.extend(names)
+                continue
+            deleted += batch_deleted
+            failed.extend(batch_failed)
+            elapsed = time.perf_counter() - start
+            print(f"Deleted {deleted} blob(s) ({deleted / elapsed if elapsed > 0 else 0:,.0f} deletes/s)...")
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for names in iter_blob_name_batches(prefix, batch_size):
+            if len(in_flight) >= 2 * workers:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+            in_flight[executor.submit(delete_batch, names)] = names
+        done, _ = wait(in_flight)
+        collect(done)
+
+    return deleted, failed, time.perf_counter() - start
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Delete blobs from the Azure storage container.")
+    parser.add_argument(
+        "--prefix",
+        default=None,
+        help="Only delete blobs whose name starts with this prefix (e.g. media/farms/farm_3/).",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=MAX_BATCH_SIZE,
+        help=f"Blobs deleted per batch request (at most {MAX_BATCH_SIZE}).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help="Number of batch requests sent concurrently.",
+    )
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    batch_size = min(max(1, args.batch_size), MAX_BATCH_SIZE)
+    scope = f"under '{args.prefix}'" if args.prefix else "in the container"
+
+    print(f"The following blobs {scope} will be deleted:")
+    count = preview_blobs(args.prefix)
+    if count == 0:
+        print("No blobs found.")
+        return
+
+    # Ask for manual confirmation
+    confirm = input(f"Are you sure you want to delete all these {count} blobs? Type 'yes' to confirm: ")
+    if confirm.lower() != "yes":
+        print("Operation aborted.")
+        return
+
+    deleted, failed, elapsed = delete_blobs(args.prefix, batch_size, args.workers)
+    rate = deleted / elapsed if elapsed > 0 else 0.0
+    print(f"Deleted {deleted} blob(s) in {elapsed:.2f}s ({rate:,.0f} deletes/s).")
+    if failed:
+        print(f"{len(failed)} blob(s) could not be deleted, e.g.: {', '.join(failed[:5])}")
+    else:
+        print("✅ All blobs have been deleted.")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except ConfigurationError as e:
+        print(e)
+        sys.exit(1)
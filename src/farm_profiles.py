@@ -0,0 +1,241 @@
+import sys
+import json
+import time
+import select
+import argparse
+import threading
+from collections import OrderedDict
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from db_config import get_engine, ConfigurationError
+
+# One row per farm holding everything a farm page shows, as a single jsonb
+# document, so rendering a page is one indexed lookup.
+PROFILE_VIEW = "farm_profiles"
+# Channel notified after each refresh, so other processes can drop their caches.
+REFRESH_CHANNEL = "farm_profiles_refreshed"
+
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_CACHE_TTL_SECONDS = 300
+
+# Photos are polymorphic: a farm page shows the photos of the farm and of
+# its farmers, products, animals and crops.
+PROFILE_VIEW_SQL = f"""
+    CREATE MATERIALIZED VIEW IF NOT EXISTS {PROFILE_VIEW} AS
+    SELECT f.id AS farm_id,
+           jsonb_build_object(
+               'farm', to_jsonb(f),
+               'address', (
+                   SELECT to_jsonb(a) - 'location' - 'location_point'
+                   FROM addresses a WHERE a.farm_id = f.id ORDER BY a.id LIMIT 1
+               ),
+               'farmers', COALESCE((
+                   SELECT jsonb_agg(to_jsonb(fr) || jsonb_build_object('workloads', COALESCE((
+                       SELECT jsonb_agg(to_jsonb(w) ORDER BY w.id) FROM workloads w WHERE w.farmer_id = fr.id
+                   ), '[]'::jsonb)) ORDER BY fr.id)
+                   FROM farmers fr WHERE fr.farm_id = f.id
+               ), '[]'::jsonb),
+               'products', COALESCE((
+                   SELECT jsonb_agg(to_jsonb(p) || jsonb_build_object('subproduct_ids', COALESCE((
+                       SELECT jsonb_agg(ps.subproduct_id ORDER BY ps.subproduct_id)
+                       FROM product_subproducts ps WHERE ps.parent_product_id = p.id
+                   ), '[]'::jsonb)) ORDER BY p.id)
+                   FROM products p WHERE p.farm_id = f.id
+               ), '[]'::jsonb),
+               'animals', COALESCE((
+                   SELECT jsonb_agg(to_jsonb(an) ORDER BY an.id) FROM animals an WHERE an.farm_id = f.id
+               ), '[]'::jsonb),
+               'crops', COALESCE((
+                   SELECT jsonb_agg(to_jsonb(c) ORDER BY c.id) FROM crops c WHERE c.farm_id = f.id
+               ), '[]'::jsonb),
+               'unofficial_labels', COALESCE((
+                   SELECT jsonb_agg(to_jsonb(ul) || jsonb_build_object('delivery_date', uli.delivery_date) ORDER BY uli.id)
+                   FROM unofficial_label_instances uli
+                   JOIN unofficial_labels ul ON ul.id = uli.unofficial_label_id
+                   WHERE uli.farm_id = f.id
+               ), '[]'::jsonb),
+               'photos', COALESCE((
+                   SELECT jsonb_agg(to_jsonb(ph) ORDER BY ph.is_main DESC, ph.id)
+                   FROM photos ph
+                   WHERE (ph.photoable_type = 'farm' AND ph.photoable_id = f.id)
+                      OR (ph.photoable_type = 'farmer' AND ph.photoable_id IN (SELECT id FROM farmers WHERE farm_id = f.id))
+                      OR (ph.photoable_type = 'product' AND ph.photoable_id IN (SELECT id FROM products WHERE farm_id = f.id))
+                      OR (ph.photoable_type = 'animal' AND ph.photoable_id IN (SELECT id FROM animals WHERE farm_id = f.id))
+                      OR (ph.photoable_type = 'crop' AND ph.photoable_id IN (SELECT id FROM crops WHERE farm_id = f.id))
+               ), '[]'::jsonb)
+           ) AS profile
+    FROM farms f
+"""
+
+class ProfileCache:
+    """
+    Thread-safe in-process LRU cache whose entries also expire after ttl
+    seconds, bounding staleness when another process refreshes the view.
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, ttl=DEFAULT_CACHE_TTL_SECONDS, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Return (True, value) on a fresh hit, (False, None) otherwise.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self.clock() - entry[1] < self.ttl:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[0]
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, self.clock())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """
+        Drop one entry, or every entry when key is None.
+        """
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+
+# Cache shared by every caller in the process.
+profile_cache = ProfileCache()
+
+def view_exists(conn):
+    return conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": PROFILE_VIEW}).scalar()
+
+def ensure_profile_view(conn):
+    """
+    Create and populate the materialized view and the unique index that
+    REFRESH ... CONCURRENTLY requires.
+    """
+    conn.execute(text(PROFILE_VIEW_SQL))
+    conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{PROFILE_VIEW}_farm_id ON {PROFILE_VIEW} (farm_id)"))
+    print(f"✅ Materialized view '{PROFILE_VIEW}' ready.")
+
+def refresh_farm_profiles(engine=None, cache=profile_cache):
+    """
+    Refresh the view after a reseed, if it exists. CONCURRENTLY keeps the
+    old rows readable while the new ones are computed. The local cache is
+    invalidated and other processes are notified through REFRESH_CHANNEL.
+    Returns True if the view was refreshed.
+    """
+    engine = engine or get_engine()
+    start = time.perf_counter()
+    try:
+        with engine.begin() as conn:
+            if not view_exists(conn):
+                return False
+            conn.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {PROFILE_VIEW}"))
+            conn.execute(text(f"NOTIFY {REFRESH_CHANNEL}"))
+    except SQLAlchemyError as e:
+        print(f"Error refreshing '{PROFILE_VIEW}': {e}")
+        return False
+    finally:
+        # Even a failed refresh may follow changed tables: drop what we cached.
+        cache.invalidate()
+    print(f"Refreshed '{PROFILE_VIEW}' in {time.perf_counter() - start:.2f}s.")
+    return True
+
+def get_farm_profiles(farm_ids, engine=None, cache=profile_cache):
+    """
+    Return {farm_id: profile} for the requested farms, fetching the ones
+    missing from the cache in a single indexed query. Unknown farms are omitted.
+    """
+    profiles = {}
+    missing = []
+    for farm_id in farm_ids:
+        hit, profile = cache.get(farm_id)
+        if hit:
+            if profile is not None:
+                profiles[farm_id] = profile
+        else:
+            missing.append(farm_id)
+    if missing:
+        engine = engine or get_engine()
+        with engine.connect() as conn:
+            rows = conn.execute(
+                text(f"SELECT farm_id, profile FROM {PROFILE_VIEW} WHERE farm_id = ANY(:farm_ids)"),
+                {"farm_ids": missing},
+            )
+            fetched = dict(rows.fetchall())
+        for farm_id in missing:
+            # Unknown farms are cached too (as None), so they are not re-queried.
+            cache.put(farm_id, fetched.get(farm_id))
+            if fetched.get(farm_id) is not None:
+                profiles[farm_id] = fetched[farm_id]
+    return profiles
+
+def get_farm_profile(farm_id, engine=None, cache=profile_cache):
+    """
+    The denormalized profile of one farm (farm, address, farmers with their
+    workloads, products with their subproduct ids, animals, crops, labels
+    and photos), or None if the farm does not exist.
+    """
+    return get_farm_profiles([farm_id], engine, cache).get(farm_id)
+
+def watch_refreshes(engine=None, cache=profile_cache, stop_event=None, poll_seconds=5.0):
+    """
+    Invalidate the cache whenever any process refreshes the view. Blocks,
+    so run it in a daemon thread of a long-lived reader process.
+    """
+    engine = engine or get_engine()
+    raw = engine.raw_connection()
+    try:
+        raw.driver_connection.autocommit = True
+        with raw.driver_connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {REFRESH_CHANNEL}")
+        connection = raw.driver_connection
+        while stop_event is None or not stop_event.is_set():
+            if select.select([connection], [], [], poll_seconds) == ([], [], []):
+                continue
+            connection.poll()
+            if connection.notifies:
+                connection.notifies.clear()
+                cache.invalidate()
+    finally:
+        raw.close()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Farm profile materialized view: setup, refresh and lookup.")
+    parser.add_argument("--setup", action="store_true", help=f"Create the '{PROFILE_VIEW}' materialized view.")
+    parser.add_argument("--refresh", action="store_true", help="Refresh the view concurrently.")
+    parser.add_argument("--farm", type=int, action="append", default=[], help="Print the profile of this farm (repeatable).")
+    return parser.parse_args(argv)
+
+def main(argv=None, engine=None):
+    args = parse_args(argv)
+    engine = engine or get_engine()
+    if args.setup:
+        with engine.begin() as conn:
+            ensure_profile_view(conn)
+    if args.refresh:
+        if not refresh_farm_profiles(engine):
+            print(f"The '{PROFILE_VIEW}' view does not exist; run farm_profiles.py --setup first.")
+    if args.farm:
+        profiles = get_farm_profiles(args.farm, engine)
+        for farm_id in args.farm:
+            print(json.dumps(profiles.get(farm_id), ensure_ascii=False, indent=2, default=str))
+
+if __name__ == "__main__":
+    try:
+        main()
+    except ConfigurationError as e:
+        print(e)
+        sys.exit(1)
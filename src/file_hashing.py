@@ -0,0 +1,21 @@
+import hashlib
+
+# Files are hashed in blocks of this many bytes so large media never has
+# to fit in memory.
+HASH_BLOCK_SIZE = 1024 * 1024
+
+def file_digest(file_path, algorithm="sha256", block_size=HASH_BLOCK_SIZE):
+    """
+    Return the hashlib digest object of a file's content, read block by block.
+    """
+    digest = hashlib.new(algorithm)
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest
+
+def file_sha256(file_path):
+    """
+    Return the hex SHA-256 of a file's content.
+    """
+    return file_digest(file_path, "sha256").hexdigest()
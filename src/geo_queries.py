@@ -0,0 +1,369 @@
+import sys
+import math
+import heapq
+import argparse
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from seed_reader import iter_seed_records
+from db_config import get_engine, ConfigurationError
+
+# Farm locations come from the latitude / longitude of their address.
+ADDRESSES_TABLE = "addresses"
+ADDRESSES_SEED_FILE = "table_seeds/addresses/addresses.json"
+
+# Mean Earth radius in meters (PostGIS geography uses the WGS84 spheroid,
+# so its distances differ from these by up to ~0.5%).
+EARTH_RADIUS_M = 6371008.8
+
+# Spatial layers, from best to fallback:
+#   - postgis: a geography(Point) column with a GiST index (exact KNN and ST_DWithin)
+#   - point:   PostgreSQL's built-in point type with a GiST index, used as a
+#              planar pre-filter whose candidates are re-ranked by haversine distance
+SPATIAL_MODES = ("postgis", "point")
+POSTGIS_COLUMN = "location"
+POINT_COLUMN = "location_point"
+# Always installed in public, whatever the search_path: an extension created
+# in a schema that is later dropped (e.g. the shadow schema of a reseed)
+# would take the location column and its index with it.
+EXTENSION_SCHEMA = "public"
+CREATE_POSTGIS_STATEMENT = f"CREATE EXTENSION IF NOT EXISTS postgis SCHEMA {EXTENSION_SCHEMA}"
+
+_HAVERSINE_SQL = f"""
+    2 * {EARTH_RADIUS_M} * asin(sqrt(
+        power(sin(radians(a.latitude - :lat) / 2), 2)
+        + cos(radians(:lat)) * cos(radians(a.latitude)) * power(sin(radians(a.longitude - :lon) / 2), 2)
+    ))
+"""
+
+# Spatial mode detected for each database, so the hot path does not query the catalog.
+_detected_modes = {}
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in meters between two points given in degrees.
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+def ensure_spatial_index(conn):
+    """
+    Add an indexed location column to the addresses table, generated from
+    latitude / longitude so the loaders need not know about it. PostGIS is
+    used when the extension can be enabled; otherwise the built-in point type.
+    Returns the spatial mode in use.
+    """
+    try:
+        with conn.begin_nested():
+            conn.execute(text(CREATE_POSTGIS_STATEMENT))
+        mode = "postgis"
+    except SQLAlchemyError as e:
+        print(f"PostGIS is not available ({str(e).splitlines()[0]}); falling back to the built-in point type.")
+        mode = "point"
+
+    if mode == "postgis":
+        conn.execute(text(f"""
+            ALTER TABLE {ADDRESSES_TABLE} ADD COLUMN IF NOT EXISTS {POSTGIS_COLUMN} geography(Point, 4326)
+            GENERATED ALWAYS AS (
+                ST_SetSRID(ST_MakePoint(longitude::double precision, latitude::double precision), 4326)::geography
+            ) STORED
+        """))
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS idx_{ADDRESSES_TABLE}_{POSTGIS_COLUMN} ON {ADDRESSES_TABLE} USING GIST ({POSTGIS_COLUMN})"
+        ))
+    else:
+        conn.execute(text(f"""
+            ALTER TABLE {ADDRESSES_TABLE} ADD COLUMN IF NOT EXISTS {POINT_COLUMN} point
+            GENERATED ALWAYS AS (point(longitude::double precision, latitude::double precision)) STORED
+        """))
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS idx_{ADDRESSES_TABLE}_{POINT_COLUMN} ON {ADDRESSES_TABLE} USING GIST ({POINT_COLUMN})"
+        ))
+    conn.execute(text(f"ANALYZE {ADDRESSES_TABLE}"))
+    _detected_modes.pop(str(conn.engine.url), None)
+    print(f"✅ Spatial index on '{ADDRESSES_TABLE}' ready ({mode}).")
+    return mode
+
+def detect_spatial_mode(conn):
+    """
+    Return the spatial mode of the database (cached), or None when
+    ensure_spatial_index has not been run.
+    """
+    key = str(conn.engine.url)
+    if key not in _detected_modes:
+        columns = {row[0] for row in conn.execute(
+            text("SELECT column_name FROM information_schema.columns WHERE table_schema = 'public' AND table_name = :table"),
+            {"table": ADDRESSES_TABLE},
+        )}
+        if POSTGIS_COLUMN in columns:
+            _detected_modes[key] = "postgis"
+        elif POINT_COLUMN in columns:
+            _detected_modes[key] = "point"
+        else:
+            return None
+    return _detected_modes[key]
+
+def _rows_to_results(rows):
+    return [
+        {
+            "farm_id": farm_id,
+            "name": name,
+            "latitude": float(latitude),
+            "longitude": float(longitude),
+            "distance_m": float(distance_m),
+        }
+        for farm_id, name, latitude, longitude, distance_m in rows
+    ]
+
+def _bounding_box(lat, lon, radius_m):
+    """
+    Degree box around a point containing every location within radius_m.
+    The widest longitude of the spherical cap is asin(sin(r/R) / cos lat),
+    reached at latitude asin(sin lat / cos(r/R)); r / (R cos lat) is too narrow.
+    """
+    angular = radius_m / EARTH_RADIUS_M
+    dlat = math.degrees(angular)
+    if abs(lat) + dlat >= 90:
+        # The cap contains a pole (or the radius is huge): every longitude.
+        return max(-90.0, lat - dlat), -180.0, min(90.0, lat + dlat), 180.0
+    dlon = math.degrees(math.asin(math.sin(angular) / math.cos(math.radians(lat))))
+    if lon - dlon < -180 or lon + dlon > 180:
+        # Crossing the antimeridian: keep it simple and span every longitude.
+        return lat - dlat, -180.0, lat + dlat, 180.0
+    return lat - dlat, lon - dlon, lat + dlat, lon + dlon
+
+def _farms_within_points(conn, lat, lon, radius_m, limit=None):
+    min_lat, min_lon, max_lat, max_lon = _bounding_box(lat, lon, radius_m)
+    query = text(f"""
+        SELECT * FROM (
+            SELECT a.farm_id, f.name, a.latitude, a.longitude, {_HAVERSINE_SQL} AS distance_m
+            FROM {ADDRESSES_TABLE} a
+            LEFT JOIN farms f ON f.id = a.farm_id
+            WHERE a.{POINT_COLUMN} <@ box(point(:min_lon, :min_lat), point(:max_lon, :max_lat))
+        ) candidates
+        WHERE distance_m <= :radius
+        ORDER BY distance_m
+        {"LIMIT :limit" if limit else ""}
+    """)
+    params = {"lat": lat, "lon": lon, "radius": radius_m, "limit": limit,
+              "min_lat": min_lat, "min_lon": min_lon, "max_lat": max_lat, "max_lon": max_lon}
+    return _rows_to_results(conn.execute(query, params))
+
+def farms_within(conn, lat, lon, radius_m):
+    """
+    Farms whose address is within radius_m meters of (lat, lon), nearest first.
+    """
+    mode = detect_spatial_mode(conn)
+    if mode == "postgis":
+        query = text(f"""
+            SELECT a.farm_id, f.name, a.latitude, a.longitude, ST_Distance(a.{POSTGIS_COLUMN}, q.point) AS distance_m
+            FROM {ADDRESSES_TABLE} a
+            CROSS JOIN (SELECT ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)::geography AS point) q
+            LEFT JOIN farms f ON f.id = a.farm_id
+            WHERE ST_DWithin(a.{POSTGIS_COLUMN}, q.point, :radius)
+            ORDER BY distance_m
+        """)
+        return _rows_to_results(conn.execute(query, {"lat": lat, "lon": lon, "radius": radius_m}))
+    if mode == "point":
+        return _farms_within_points(conn, lat, lon, radius_m)
+    raise RuntimeError(f"No spatial index on '{ADDRESSES_TABLE}'; run geo_queries.py --setup first.")
+
+def nearest_farms(conn, lat, lon, k=10):
+    """
+    The k farms whose address is nearest to (lat, lon), nearest first.
+    """
+    mode = detect_spatial_mode(conn)
+    if mode == "postgis":
+        # <-> on geography is an index-assisted KNN search.
+        query = text(f"""
+            SELECT a.farm_id, f.name, a.latitude, a.longitude, ST_Distance(a.{POSTGIS_COLUMN}, q.point) AS distance_m
+            FROM {ADDRESSES_TABLE} a
+            CROSS JOIN (SELECT ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)::geography AS point) q
+            LEFT JOIN farms f ON f.id = a.farm_id
+            ORDER BY a.{POSTGIS_COLUMN} <-> q.point
+            LIMIT :k
+        """)
+        return _rows_to_results(conn.execute(query, {"lat": lat, "lon": lon, "k": k}))
+    if mode == "point":
+        # Planar KNN in degrees is distorted by latitude, so its k results
+        # only bound the answer: the exact k nearest all lie within the
+        # largest true distance among them, which an indexed box query finds.
+        query = text(f"""
+            SELECT a.farm_id, f.name, a.latitude, a.longitude, {_HAVERSINE_SQL} AS distance_m
+            FROM {ADDRESSES_TABLE} a
+            LEFT JOIN farms f ON f.id = a.farm_id
+            ORDER BY a.{POINT_COLUMN} <-> point(:lon, :lat)
+            LIMIT :k
+        """)
+        candidates = _rows_to_results(conn.execute(query, {"lat": lat, "lon": lon, "k": k}))
+        if len(candidates) < k:
+            return sorted(candidates, key=lambda farm: farm["distance_m"])
+        radius_m = max(farm["distance_m"] for farm in candidates)
+        return _farms_within_points(conn, lat, lon, radius_m, limit=k)
+    raise RuntimeError(f"No spatial index on '{ADDRESSES_TABLE}'; run geo_queries.py --setup first.")
+
+def _unit_vector(lat, lon):
+    phi, lam = math.radians(lat), math.radians(lon)
+    return (math.cos(phi) * math.cos(lam), math.cos(phi) * math.sin(lam), math.sin(phi))
+
+def _chord_to_meters(chord):
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, chord / 2))
+
+def _meters_to_chord(distance_m):
+    return 2 * math.sin(min(math.pi, distance_m / EARTH_RADIUS_M) / 2)
+
+class FarmLocationIndex:
+    """
+    In-process KD-tree over farm locations, for local use without a database.
+
+    Points are stored as 3D unit vectors: the straight-line (chord) distance
+    between them grows with the great-circle distance, so a plain Euclidean
+    KD-tree answers exact nearest / radius queries anywhere on the globe.
+    """
+
+    def __init__(self, farms):
+        # farms: iterable of dicts with farm_id, latitude, longitude (and optionally name)
+        self.farms = [farm for farm in farms if farm.get("latitude") is not None and farm.get("longitude") is not None]
+        self.points = [_unit_vector(float(farm["latitude"]), float(farm["longitude"])) for farm in self.farms]
+        # Node i of the tree: (point index, split axis, left node, right node)
+        self.nodes = []
+        self.root = self._build(list(range(len(self.points))), 0)
+
+    @classmethod
+    def from_seed_file(cls, seed_file=ADDRESSES_SEED_FILE):
+        return cls(iter_seed_records(seed_file))
+
+    def _build(self, indices, depth):
+        if not indices:
+            return -1
+        axis = depth % 3
+        indices.sort(key=lambda index: self.points[index][axis])
+        middle = len(indices) // 2
+        node = len(self.nodes)
+        self.nodes.append(None)
+        left = self._build(indices[:middle], depth + 1)
+        right = self._build(indices[middle + 1:], depth + 1)
+        self.nodes[node] = (indices[middle], axis, left, right)
+        return node
+
+    def _result(self, index, chord_squared):
+        farm = self.farms[index]
+        return {
+            "farm_id": farm.get("farm_id"),
+            "name": farm.get("name"),
+            "latitude": float(farm["latitude"]),
+            "longitude": float(farm["longitude"]),
+            "distance_m": _chord_to_meters(math.sqrt(chord_squared)),
+        }
+
+    def nearest(self, lat, lon, k=10):
+        """
+        The k nearest farms to (lat, lon), nearest first.
+        """
+        if k <= 0:
+            return []
+        target = _unit_vector(lat, lon)
+        # Max-heap (negated distances) of the k best candidates so far.
+        best = []
+        # (node, squared distance from the target to the node's region)
+        stack = [(self.root, 0.0)]
+        while stack:
+            node, bound = stack.pop()
+            if node < 0 or (len(best) == k and bound >= -best[0][0]):
+                continue
+            index, axis, left, right = self.nodes[node]
+            point = self.points[index]
+            distance = sum((p - t) ** 2 for p, t in zip(point, target))
+            if len(best) < k:
+                heapq.heappush(best, (-distance, index))
+            elif distance < -best[0][0]:
+                heapq.heapreplace(best, (-distance, index))
+            diff = target[axis] - point[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            # The far side is pushed first so the near side is explored (and
+            # tightens the k-th best distance) before it; it is skipped when
+            # popped if the splitting plane is farther than that distance.
+            stack.append((far, max(bound, diff * diff)))
+            stack.append((near, bound))
+        return [self._result(index, -negated) for negated, index in sorted(best, reverse=True)]
+
+    def within(self, lat, lon, radius_m):
+        """
+        Farms within radius_m meters of (lat, lon), nearest first.
+        """
+        target = _unit_vector(lat, lon)
+        limit = _meters_to_chord(radius_m) ** 2
+        found = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node < 0:
+                continue
+            index, axis, left, right = self.nodes[node]
+            point = self.points[index]
+            distance = sum((p - t) ** 2 for p, t in zip(point, target))
+            if distance <= limit:
+                found.append((distance, index))
+            diff = target[axis] - point[axis]
+            if diff <= 0 or diff * diff <= limit:
+                stack.append(left)
+            if diff >= 0 or diff * diff <= limit:
+                stack.append(right)
+        return [self._result(index, distance) for distance, index in sorted(found)]
+
+def naive_nearest(farms, lat, lon, k=10):
+    """
+    Reference implementation: haversine distance to every farm, then sort.
+    """
+    ranked = sorted(
+        ({**farm, "distance_m": haversine_m(lat, lon, float(farm["latitude"]), float(farm["longitude"]))} for farm in farms),
+        key=lambda farm: farm["distance_m"],
+    )
+    return ranked[:k]
+
+def naive_within(farms, lat, lon, radius_m):
+    return [farm for farm in naive_nearest(farms, lat, lon, k=len(farms)) if farm["distance_m"] <= radius_m]
+
+def print_results(results):
+    if not results:
+        print("No farm found.")
+    for farm in results:
+        print(f" - farm {farm['farm_id']} {farm.get('name') or ''} ({farm['latitude']:.5f}, {farm['longitude']:.5f}): {farm['distance_m'] / 1000:.2f} km")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Spatial index setup and nearest-farm queries.")
+    parser.add_argument("--setup", action="store_true", help="Add the indexed location column to the addresses table.")
+    parser.add_argument("--lat", type=float, help="Latitude of the search point.")
+    parser.add_argument("--lon", type=float, help="Longitude of the search point.")
+    parser.add_argument("--k", type=int, default=10, help="Number of nearest farms to return.")
+    parser.add_argument("--radius-km", type=float, default=None, help="Return every farm within this radius instead of the k nearest.")
+    parser.add_argument("--local", action="store_true", help="Query the addresses seed file in memory instead of the database.")
+    return parser.parse_args(argv)
+
+def main(argv=None, engine=None):
+    args = parse_args(argv)
+    if args.setup:
+        engine = engine or get_engine()
+        with engine.begin() as conn:
+            ensure_spatial_index(conn)
+    if args.lat is None or args.lon is None:
+        return
+    if args.local:
+        index = FarmLocationIndex.from_seed_file()
+        results = index.within(args.lat, args.lon, args.radius_km * 1000) if args.radius_km is not None else index.nearest(args.lat, args.lon, args.k)
+    else:
+        engine = engine or get_engine()
+        with engine.connect() as conn:
+            if args.radius_km is not None:
+                results = farms_within(conn, args.lat, args.lon, args.radius_km * 1000)
+            else:
+                results = nearest_farms(conn, args.lat, args.lon, args.k)
+    print_results(results)
+
+if __name__ == "__main__":
+    try:
+        main()
+    except ConfigurationError as e:
+        print(e)
+        sys.exit(1)
@@ -0,0 +1,241 @@
+import os
+import re
+import sys
+import shutil
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from PIL import Image, ImageOps, features
+from psycopg2.extras import execute_values
+from sqlalchemy import text
+from file_hashing import file_sha256
+from media_paths import MEDIA_ROOT, PHOTO_FOLDER, photo_stem, path_stem
+from db_config import get_engine, ConfigurationError
+
+# Local tree mirroring media/ that holds generated derivatives, and the
+# blob prefix it is uploaded to.
+LOCAL_DERIVATIVES_ROOT = "media_derivatives"
+REMOTE_DERIVATIVES_ROOT = "derivatives"
+
+# Rendered outputs are cached by source content hash, so unchanged photos
+# are never re-encoded, even after being renamed or moved.
+DERIVATIVE_CACHE_ROOT = os.path.join(".media_cache", "derivatives")
+
+DEFAULT_WIDTHS = (320, 640, 1280)
+DEFAULT_FORMATS = ("webp",)
+DEFAULT_QUALITY = 80
+
+# Derivative names embed a prefix of the source hash, so they can be served
+# with a long, immutable cache lifetime: new content means a new name.
+DERIVATIVE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+SOURCE_IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+DERIVATIVE_NAME_PATTERN = re.compile(r"_w\d+\.[0-9a-f]{8}\.(webp|avif)$")
+
+def supported_formats(formats):
+    """
+    Keep the output formats this Pillow build can encode.
+    """
+    available = []
+    for fmt in formats:
+        if fmt == "avif" and not features.check("avif"):
+            print("AVIF encoding is not available in this Pillow build; skipping AVIF derivatives.")
+            continue
+        available.append(fmt)
+    return available
+
+def iter_source_images(media_root=MEDIA_ROOT):
+    """
+    Yield the photos under media_root that derivatives are generated for.
+    """
+    for root, _, files in os.walk(media_root):
+        if os.path.basename(root) != PHOTO_FOLDER:
+            continue
+        for file in files:
+            if file.lower().endswith(SOURCE_IMAGE_EXTENSIONS):
+                yield os.path.join(root, file)
+
+def render_derivatives(source_path, widths, formats, quality, cache_root):
+    """
+    Render the resized variants of one image into the cache (run in a
+    worker process). Widths larger than the source are not upscaled: they
+    are written at the source width, so every width always exists.
+    Returns (source_path, source_hash, [(width, format, cache_file), ...]).
+    """
+    source_hash = file_sha256(source_path)
+    cache_dir = os.path.join(cache_root, source_hash)
+    wanted = [(width, fmt, os.path.join(cache_dir, f"w{width}.{fmt}")) for width in widths for fmt in formats]
+    missing = [entry for entry in wanted if not os.path.exists(entry[2])]
+    if not missing:
+        return source_path, source_hash, wanted
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with Image.open(source_path) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        for width, fmt, cache_file in missing:
+            variant = image.copy()
+            variant.thumbnail((width, image.height), Image.LANCZOS)
+            # Write then rename, so an interrupted run never leaves a truncated file in the cache.
+            tmp_file = cache_file + ".tmp"
+            variant.save(tmp_file, format=fmt.upper(), quality=quality)
+            os.replace(tmp_file, cache_file)
+    return source_path, source_hash, wanted
+
+def derivative_rel_path(source_rel_path, source_hash, width, fmt):
+    """
+    Name of a derivative relative to the derivatives root, e.g.
+    farms/farm_1/photo/4.jpg -> farms/farm_1/photo/4_w320.1a2b3c4d.webp
+    """
+    stem = os.path.splitext(source_rel_path)[0]
+    return f"{stem}_w{width}.{source_hash[:8]}.{fmt}"
+
+def materialize_cached_file(cache_file, target_path):
+    """
+    Place a cached output at target_path, hard-linking it when possible.
+    """
+    if os.path.exists(target_path):
+        return
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    try:
+        os.link(cache_file, target_path)
+    except OSError:
+        shutil.copy2(cache_file, target_path)
+
+def prune_stale_derivatives(expected_paths, derivatives_root=LOCAL_DERIVATIVES_ROOT, name_pattern=DERIVATIVE_NAME_PATTERN):
+    """
+    Remove generated files matching name_pattern that are not expected any
+    more, i.e. derivatives of sources that changed or disappeared.
+    """
+    removed = 0
+    for root, _, files in os.walk(derivatives_root):
+        for file in files:
+            path = os.path.join(root, file)
+            if name_pattern.search(file) and path not in expected_paths:
+                os.remove(path)
+                removed += 1
+    return removed
+
+def build_image_derivatives(media_root=MEDIA_ROOT, derivatives_root=LOCAL_DERIVATIVES_ROOT,
+                            widths=DEFAULT_WIDTHS, formats=DEFAULT_FORMATS, quality=DEFAULT_QUALITY,
+                            workers=None, cache_root=DERIVATIVE_CACHE_ROOT):
+    """
+    Generate the derivatives of every photo on a process pool and lay them
+    out under derivatives_root, mirroring media_root.
+
+    Returns a dict mapping each source path (relative to the media root's
+    parent, e.g. media/farms/farm_1/photo/4.jpg) to the blob paths of its
+    derivatives.
+    """
+    formats = supported_formats(formats)
+    widths = sorted(set(widths))
+    derivatives = {}
+    expected_paths = set()
+    rendered = failed = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(render_derivatives, source_path, widths, formats, quality, cache_root): source_path
+            for source_path in iter_source_images(media_root)
+        }
+        for future in as_completed(futures):
+            source_path = futures[future]
+            try:
+                _, source_hash, produced = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"Error generating derivatives for {source_path}: {e}")
+                continue
+            rendered += 1
+            source_rel_path = os.path.relpath(source_path, media_root)
+            blob_paths = []
+            for width, fmt, cache_file in produced:
+                rel_path = derivative_rel_path(source_rel_path, source_hash, width, fmt)
+                target_path = os.path.join(derivatives_root, rel_path)
+                materialize_cached_file(cache_file, target_path)
+                expected_paths.add(target_path)
+                blob_paths.append(f"{REMOTE_DERIVATIVES_ROOT}/{rel_path}".replace(os.sep, "/"))
+            source_key = f"{MEDIA_ROOT}/{source_rel_path}".replace(os.sep, "/")
+            derivatives[source_key] = sorted(blob_paths)
+
+    removed = prune_stale_derivatives(expected_paths, derivatives_root)
+    print(
+        f"Prepared derivatives for {rendered} photo(s) in '{derivatives_root}'"
+        + (f", removed {removed} stale file(s)" if removed else "")
+        + (f", {failed} failed." if failed else ".")
+    )
+    return derivatives
+
+def record_photo_derivatives(conn, derivatives):
+    """
+    Store the derivative blob paths of each photo in photos.derivative_paths.
+    A photos row is matched to its source file through the media path
+    convention (media/<type>s/<type>_<owner id>/photo/<photo id>.<ext>).
+    Returns the number of photos updated.
+    """
+    conn.execute(text("ALTER TABLE photos ADD COLUMN IF NOT EXISTS derivative_paths TEXT[]"))
+    by_stem = {path_stem(source): paths for source, paths in derivatives.items()}
+    rows = conn.execute(text("SELECT id, photoable_type, photoable_id FROM photos"))
+    updates = []
+    for photo_id, photoable_type, photoable_id in rows:
+        paths = by_stem.get(photo_stem(photoable_type, photoable_id, photo_id))
+        if paths:
+            updates.append((photo_id, paths))
+    if updates:
+        with conn.connection.cursor() as cursor:
+            execute_values(
+                cursor,
+                "UPDATE photos SET derivative_paths = v.paths FROM (VALUES %s) AS v(id, paths) WHERE photos.id = v.id",
+                updates,
+            )
+    print(f"Recorded derivative paths for {len(updates)} photo(s).")
+    if not updates and by_stem:
+        print(
+            "Warning: no photos row matched a derivative source. Are the photos named "
+            "media/<type>s/<type>_<owner id>/photo/<photo id>.<ext> (see media-folder-structure.md)?"
+        )
+    return len(updates)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate resized WebP derivatives of the photos under media/.")
+    parser.add_argument(
+        "--widths",
+        default=",".join(str(width) for width in DEFAULT_WIDTHS),
+        help="Comma-separated derivative widths in pixels.",
+    )
+    parser.add_argument(
+        "--formats",
+        default=",".join(DEFAULT_FORMATS),
+        help="Comma-separated output formats (webp, avif).",
+    )
+    parser.add_argument("--quality", type=int, default=DEFAULT_QUALITY, help="Encoder quality (0-100).")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: one per core).")
+    parser.add_argument(
+        "--record-in-db",
+        action="store_true",
+        help="Store the derivative paths in photos.derivative_paths.",
+    )
+    return parser.parse_args(argv)
+
+def derivative_options_from_args(args):
+    return {
+        "widths": [int(width) for width in args.widths.split(",") if width],
+        "formats": [fmt.strip().lower() for fmt in args.formats.split(",") if fmt.strip()],
+        "quality": args.quality,
+        "workers": args.workers,
+    }
+
+def main(argv=None):
+    args = parse_args(argv)
+    derivatives = build_image_derivatives(**derivative_options_from_args(args))
+    if args.record_in_db:
+        with get_engine().begin() as conn:
+            record_photo_derivatives(conn, derivatives)
+    print("✅ Image derivatives ready.")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except ConfigurationError as e:
+        print(e)
+        sys.exit(1)
@@ -0,0 +1,220 @@
+import hashlib
+import json
+import time
+from collections import namedtuple
+from psycopg2.extras import execute_values
+from sqlalchemy import text
+from bulk_loader import DEFAULT_BATCH_SIZE, iter_batches
+from file_hashing import file_sha256
+from instrumentation import get_logger, metrics
+
+# Manifest tables kept next to the seeded tables. The file manifest lets an
+# unchanged seed file be skipped without parsing it; the record manifest
+# stores one hash per record so only changed rows are written.
+FILE_MANIFEST_TABLE = "seed_file_manifest"
+RECORD_MANIFEST_TABLE = "seed_record_manifest"
+
+log = get_logger("incremental_sync")
+
+SyncPlan = namedtuple("SyncPlan", ["table_name", "key_columns", "upserts", "hashes", "deletes", "unchanged"])
+
+def ensure_manifest_tables(conn):
+    """
+    Create the manifest tables if they do not exist yet.
+    """
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {FILE_MANIFEST_TABLE} (
+            table_name TEXT PRIMARY KEY,
+            file_hash TEXT NOT NULL,
+            synced_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """))
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {RECORD_MANIFEST_TABLE} (
+            table_name TEXT NOT NULL,
+            record_key TEXT NOT NULL,
+            record_hash TEXT NOT NULL,
+            PRIMARY KEY (table_name, record_key)
+        )
+    """))
+
+def record_hash(record):
+    """
+    Hash a record independently of its key order.
+    """
+    payload = json.dumps(record, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+def record_key(record, key_columns):
+    """
+    Serialize the key of a record (its id, or the composite key of a join
+    record) into the text stored in the manifest.
+    """
+    return json.dumps([record.get(col) for col in key_columns], separators=(",", ":"), default=str)
+
+def get_stored_file_hash(conn, table_name):
+    """
+    Return the hash of the seed file last synced into table_name, or None.
+    """
+    result = conn.execute(
+        text(f"SELECT file_hash FROM {FILE_MANIFEST_TABLE} WHERE table_name = :table_name"),
+        {"table_name": table_name},
+    )
+    return result.scalar()
+
+def get_stored_record_hashes(conn, table_name):
+    """
+    Return a dict mapping each synced record key of table_name to its hash.
+    """
+    result = conn.execute(
+        text(f"SELECT record_key, record_hash FROM {RECORD_MANIFEST_TABLE} WHERE table_name = :table_name"),
+        {"table_name": table_name},
+    )
+    return {row[0]: row[1] for row in result}
+
+def plan_sync(conn, table_name, records, key_columns):
+    """
+    Compare seed records against the manifest of table_name.
+    Only the changed records are kept in memory; unchanged ones are counted.
+    Returns a SyncPlan listing the records to upsert and the keys to delete.
+    """
+    stored = get_stored_record_hashes(conn, table_name)
+    seen = set()
+    upserts = {}
+    hashes = {}
+    unchanged = 0
+    for record in records:
+        if not isinstance(record, dict):
+            log.debug(f"Skipping invalid record for table '{table_name}': {record}")
+            metrics.increment("rows_failed")
+            continue
+        key = record_key(record, key_columns)
+        digest = record_hash(record)
+        seen.add(key)
+        if stored.get(key) == digest:
+            unchanged += 1
+            continue
+        # Keyed by record key: a duplicated key keeps its last record, since
+        # one INSERT ... ON CONFLICT cannot update the same row twice.
+        upserts[key] = record
+        hashes[key] = digest
+    deletes = [key for key in stored if key not in seen]
+    return SyncPlan(table_name, list(key_columns), list(upserts.values()), hashes, deletes, unchanged)
+
+def _upsert_records(cursor, table_name, key_columns, records, batch_size):
+    # Columns are the union of the changed records' keys; a key missing
+    # from a record is written as NULL, exactly as a full reload would.
+    columns = []
+    for record in records:
+        for col in record:
+            if col not in columns:
+                columns.append(col)
+    updates = [col for col in columns if col not in key_columns]
+    if updates:
+        conflict_action = "DO UPDATE SET " + ", ".join(f"{col} = EXCLUDED.{col}" for col in updates)
+    else:
+        conflict_action = "DO NOTHING"
+    query = (
+        f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES %s "
+        f"ON CONFLICT ({', '.join(key_columns)}) {conflict_action}"
+    )
+    for batch in iter_batches(records, batch_size):
+        rows = [tuple(record.get(col) for col in columns) for record in batch]
+        execute_values(cursor, query, rows, page_size=batch_size)
+
+def _delete_keys(cursor, table_name, key_columns, keys, batch_size):
+    key_list = ", ".join(key_columns)
+    query = f"DELETE FROM {table_name} WHERE ({key_list}) IN (VALUES %s)"
+    for batch in iter_batches(keys, batch_size):
+        execute_values(cursor, query, [tuple(json.loads(key)) for key in batch], page_size=batch_size)
+
+def apply_sync(conn, plan, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Apply a SyncPlan: upsert changed records with INSERT ... ON CONFLICT DO
+    UPDATE, delete vanished records and bring the record manifest up to date.
+    """
+    with conn.connection.cursor() as cursor:
+        if plan.upserts:
+            _upsert_records(cursor, plan.table_name, plan.key_columns, plan.upserts, batch_size)
+            for batch in iter_batches(list(plan.hashes.items()), batch_size):
+                execute_values(
+                    cursor,
+                    f"INSERT INTO {RECORD_MANIFEST_TABLE} (table_name, record_key, record_hash) VALUES %s "
+                    "ON CONFLICT (table_name, record_key) DO UPDATE SET record_hash = EXCLUDED.record_hash",
+                    [(plan.table_name, key, digest) for key, digest in batch],
+                    page_size=batch_size,
+                )
+        if plan.deletes:
+            _delete_keys(cursor, plan.table_name, plan.key_columns, plan.deletes, batch_size)
+            for batch in iter_batches(plan.deletes, batch_size):
+                cursor.execute(
+                    f"DELETE FROM {RECORD_MANIFEST_TABLE} WHERE table_name = %s AND record_key = ANY(%s)",
+                    (plan.table_name, batch),
+                )
+
+def clear_manifest(conn, table_name):
+    """
+    Forget the manifest of table_name, e.g. after it was fully reloaded, so
+    the next incremental sync compares against nothing and upserts everything.
+    """
+    if not conn.dialect.has_table(conn, FILE_MANIFEST_TABLE):
+        return
+    conn.execute(text(f"DELETE FROM {FILE_MANIFEST_TABLE} WHERE table_name = :table_name"), {"table_name": table_name})
+    conn.execute(text(f"DELETE FROM {RECORD_MANIFEST_TABLE} WHERE table_name = :table_name"), {"table_name": table_name})
+
+def store_file_hash(conn, table_name, file_hash):
+    """
+    Remember the hash of the seed file that table_name was synced from.
+    """
+    conn.execute(
+        text(f"""
+            INSERT INTO {FILE_MANIFEST_TABLE} (table_name, file_hash, synced_at)
+            VALUES (:table_name, :file_hash, now())
+            ON CONFLICT (table_name) DO UPDATE SET file_hash = EXCLUDED.file_hash, synced_at = EXCLUDED.synced_at
+        """),
+        {"table_name": table_name, "file_hash": file_hash},
+    )
+
+def sync_table(conn, table_name, seed_file, records, key_columns, batch_size=DEFAULT_BATCH_SIZE, before_apply=None):
+    """
+    Incrementally synchronize table_name with its seed file.
+
+    The seed file is skipped outright when its hash matches the manifest.
+    Otherwise every record is hashed and keyed by key_columns; only new or
+    changed records are upserted and only records that vanished from the
+    seed are deleted. On the first sync the manifest is empty, so every
+    record is upserted; rows that never came from a seed are left alone.
+
+    before_apply, if given, is called with the SyncPlan before any write
+    (e.g. to capture state that the sync is about to change).
+
+    Returns a dict of statistics, including the applied plan (or None).
+    """
+    start = time.perf_counter()
+    ensure_manifest_tables(conn)
+    file_hash = file_sha256(seed_file)
+    if get_stored_file_hash(conn, table_name) == file_hash:
+        print(f"Table '{table_name}' is up to date with {seed_file} (unchanged seed file).")
+        return {"table": table_name, "upserted": 0, "deleted": 0, "unchanged": None, "seconds": time.perf_counter() - start, "plan": None}
+
+    plan = plan_sync(conn, table_name, records, key_columns)
+    if before_apply:
+        before_apply(plan)
+    apply_sync(conn, plan, batch_size)
+    store_file_hash(conn, table_name, file_hash)
+    metrics.increment("rows_upserted", len(plan.upserts))
+    metrics.increment("rows_deleted", len(plan.deletes))
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"Synced table '{table_name}' in {elapsed:.2f}s: {len(plan.upserts)} upserted, "
+        f"{len(plan.deletes)} deleted, {plan.unchanged} unchanged."
+    )
+    return {
+        "table": table_name,
+        "upserted": len(plan.upserts),
+        "deleted": len(plan.deletes),
+        "unchanged": plan.unchanged,
+        "seconds": elapsed,
+        "plan": plan,
+    }
@@ -0,0 +1,333 @@
+import os
+import io
+import sys
+import json
+import time
+import pstats
+import logging
+import cProfile
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+# Logging, counters and timed spans shared by the scripts. Per-record and
+# per-file messages are logged at DEBUG, so the default INFO level prints
+# one line per table or stage instead of one per row; set LOG_LEVEL=DEBUG
+# (or --log-level DEBUG) to see them again.
+
+LOGGER_NAME = "producteurice"
+DEFAULT_LOG_LEVEL = "INFO"
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
+SPAN_FORMATS = ("json", "otlp")
+SERVICE_NAME = "producteurice_db"
+# Number of functions / allocation sites listed by --profile.
+PROFILE_TOP = 25
+
+def get_logger(name):
+    """
+    The logger of a module, e.g. get_logger("bulk_loader"). Logging is
+    configured with the defaults on first use, so library calls made
+    outside the scripts still print their INFO messages.
+    """
+    configure_logging()
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+def configure_logging(level=None):
+    """
+    Send the scripts' log records to stdout, like their print() output.
+    level defaults to the LOG_LEVEL environment variable, then INFO; without
+    a level, an existing configuration is kept.
+    At INFO and above, messages are printed as-is; at DEBUG they are
+    prefixed with a timestamp, the thread and the module.
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    if level is None and logger.handlers:
+        # Already configured, e.g. by the pipeline runner calling this script.
+        return logger
+    level = (level or os.getenv("LOG_LEVEL") or DEFAULT_LOG_LEVEL).upper()
+    logger.setLevel(level)
+    logger.propagate = False
+    if level == "DEBUG":
+        formatter = logging.Formatter("%(asctime)s %(threadName)s %(name)s %(levelname)s: %(message)s")
+    else:
+        formatter = logging.Formatter("%(message)s")
+    if not logger.handlers:
+        logger.addHandler(logging.StreamHandler(sys.stdout))
+    for handler in logger.handlers:
+        handler.setFormatter(formatter)
+    return logger
+
+class Span:
+    """
+    One timed operation: a stage, a table load, a file upload.
+    """
+    __slots__ = ("name", "span_id", "parent_id", "attributes", "start_ns", "end_ns", "error", "thread")
+
+    def __init__(self, name, span_id, parent_id, attributes):
+        self.name = name
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+        self.thread = threading.current_thread().name
+
+    @property
+    def seconds(self):
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "thread": self.thread,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "seconds": self.seconds,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+class Metrics:
+    """
+    Thread-safe counters and spans of one run. Spans opened in a thread
+    nest under the span that thread has open.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.spans = []
+            self.trace_id = os.urandom(16).hex()
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """
+        Time the enclosed block as a span; an exception is recorded on the
+        span and re-raised.
+        """
+        stack = self._local.__dict__.setdefault("stack", [])
+        span = Span(name, os.urandom(8).hex(), stack[-1].span_id if stack else None, attributes)
+        stack.append(span)
+        try:
+            yield span
+        except SystemExit as e:
+            if e.code not in (None, 0):
+                span.error = f"exit status {e.code}"
+            raise
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            stack.pop()
+            with self._lock:
+                self.spans.append(span)
+
+    def timings(self):
+        """
+        Total seconds and count of the finished spans, per span name.
+        """
+        totals = {}
+        with self._lock:
+            for span in self.spans:
+                seconds, count = totals.get(span.name, (0.0, 0))
+                totals[span.name] = (seconds + span.seconds, count + 1)
+        return totals
+
+# Process-wide, so a pipeline run in one process collects every stage.
+metrics = Metrics()
+
+def print_metrics(registry=metrics):
+    """
+    Print the counters and the time spent per span name.
+    """
+    timings = registry.timings()
+    if not registry.counters and not timings:
+        return
+    print("\nRun metrics:")
+    for name, value in sorted(registry.counters.items()):
+        print(f" - {name:<24} {value:>14,}")
+    for name, (seconds, count) in sorted(timings.items(), key=lambda item: -item[1][0]):
+        print(f" - {name:<24} {seconds:>13.2f}s over {count} span(s)")
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def _otlp_attributes(attributes):
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+def otlp_documents(registry=metrics):
+    """
+    The spans and the counters as two OTLP/JSON documents, the layout of
+    the OpenTelemetry collector's file exporter (one document per line),
+    so they can be replayed into a collector with its file receiver.
+    """
+    with registry._lock:
+        spans = list(registry.spans)
+        counters = dict(registry.counters)
+    now = str(time.time_ns())
+    resource = {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})}
+    scope = {"name": LOGGER_NAME}
+    traces = {
+        "resourceSpans": [{
+            "resource": resource,
+            "scopeSpans": [{
+                "scope": scope,
+                "spans": [
+                    dict(
+                        {
+                            "traceId": registry.trace_id,
+                            "spanId": span.span_id,
+                            "name": span.name,
+                            "kind": 1,
+                            "startTimeUnixNano": str(span.start_ns),
+                            "endTimeUnixNano": str(span.end_ns),
+                            "attributes": _otlp_attributes(dict(span.attributes, thread=span.thread)),
+                            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+                        },
+                        **({"parentSpanId": span.parent_id} if span.parent_id else {}),
+                    )
+                    for span in spans
+                ],
+            }],
+        }],
+    }
+    counters_document = {
+        "resourceMetrics": [{
+            "resource": resource,
+            "scopeMetrics": [{
+                "scope": scope,
+                "metrics": [
+                    {"name": name, "sum": {
+                        "dataPoints": [{"asInt": str(value), "timeUnixNano": now}],
+                        "aggregationTemporality": 2,
+                        "isMonotonic": True,
+                    }}
+                    for name, value in sorted(counters.items())
+                ],
+            }],
+        }],
+    }
+    return [traces, counters_document]
+
+def export_spans(path, span_format="json", registry=metrics):
+    """
+    Write the spans and counters of the run to path, either as one plain
+    JSON document or as OTLP/JSON lines (span_format "otlp").
+    """
+    if span_format not in SPAN_FORMATS:
+        raise ValueError(f"Unknown span format '{span_format}', expected one of {SPAN_FORMATS}")
+    with open(path, "w", encoding="utf-8") as f:
+        if span_format == "otlp":
+            for document in otlp_documents(registry):
+                f.write(json.dumps(document) + "\n")
+        else:
+            with registry._lock:
+                document = {
+                    "trace_id": registry.trace_id,
+                    "counters": dict(registry.counters),
+                    "spans": [span.as_dict() for span in registry.spans],
+                }
+            json.dump(document, f, indent=2)
+    print(f"Spans written to {path} ({span_format}).")
+
+@contextmanager
+def profiled(prefix):
+    """
+    Profile the enclosed block with cProfile and tracemalloc. Writes
+    <prefix>.prof (open it with pstats or snakeviz) and <prefix>.memory.txt
+    (top allocation sites and peak traced memory), and prints the top
+    functions by cumulative time. Threads started inside the block (the
+    parallel loaders and uploaders) are profiled too.
+    """
+    profiler = cProfile.Profile()
+    thread_profilers = []
+    if sys.version_info < (3, 12):
+        # Before 3.12 a profiler only sees the thread that enabled it: each
+        # new thread enables its own on its first profiling event.
+        def profile_thread(frame, event, arg):
+            thread_profiler = cProfile.Profile()
+            thread_profilers.append(thread_profiler)
+            thread_profiler.enable()
+        threading.setprofile(profile_thread)
+    tracemalloc.start()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        threading.setprofile(None)
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stats = pstats.Stats(profiler, *thread_profilers)
+        stats.dump_stats(f"{prefix}.prof")
+        with open(f"{prefix}.memory.txt", "w", encoding="utf-8") as f:
+            f.write(f"Traced memory: {current / 1e6:.1f} MB at exit, {peak / 1e6:.1f} MB peak\n\n")
+            for stat in snapshot.statistics("lineno")[:PROFILE_TOP]:
+                f.write(f"{stat}\n")
+        output = io.StringIO()
+        stats.stream = output
+        stats.sort_stats("cumulative").print_stats(PROFILE_TOP)
+        print(output.getvalue())
+        print(f"Profile written to {prefix}.prof and {prefix}.memory.txt (peak traced memory {peak / 1e6:.1f} MB).")
+
+def add_instrumentation_arguments(parser):
+    """
+    The --log-level, --spans, --span-format and --profile options shared by the scripts.
+    """
+    parser.add_argument(
+        "--log-level",
+        choices=LOG_LEVELS,
+        type=str.upper,
+        help=f"Logging level (default: the LOG_LEVEL environment variable, then {DEFAULT_LOG_LEVEL}). DEBUG logs every record and file.",
+    )
+    parser.add_argument("--spans", metavar="FILE", help="Write the timed spans and counters of the run to FILE.")
+    parser.add_argument("--span-format", choices=SPAN_FORMATS, default="json", help="Format of --spans: plain JSON or OTLP/JSON.")
+    parser.add_argument(
+        "--profile",
+        metavar="PREFIX",
+        nargs="?",
+        const="profile",
+        help="Profile the run with cProfile and tracemalloc, writing PREFIX.prof and PREFIX.memory.txt (default prefix: profile).",
+    )
+
+@contextmanager
+def instrumented(args, name):
+    """
+    Run a script's main body with the options of add_instrumentation_arguments:
+    configure logging, time it as a span, optionally profile it, then print
+    the run metrics (with --spans, --profile or at DEBUG) and export the
+    spans. A script called from another one (e.g. by the pipeline runner)
+    without these options only adds its span.
+    """
+    logger = configure_logging(args.log_level)
+    try:
+        with metrics.span(name):
+            if args.profile:
+                with profiled(args.profile):
+                    yield
+            else:
+                yield
+    finally:
+        if args.spans or args.profile or logger.isEnabledFor(logging.DEBUG):
+            print_metrics()
+        if args.spans:
+            export_spans(args.spans, args.span_format)
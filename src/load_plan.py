@@ -0,0 +1,263 @@
+import os
+from collections import namedtuple
+from sqlalchemy.exc import SQLAlchemyError
+from bulk_loader import DEFAULT_BATCH_SIZE
+from seed_reader import iter_seed_records, read_join_seed, seed_table_name
+from seed_graph import referenced_table, table_dependencies, topological_layers
+from schema_registry import declared_schema
+from create_indexes import polymorphic_pairs
+from catalog import fetch_row_estimates
+from db_config import get_engine, ConfigurationError
+
+# Fixed per-row overhead of a PostgreSQL heap tuple (header and item pointer).
+TUPLE_OVERHEAD_BYTES = 28
+# Offending values shown per broken reference.
+MAX_REPORTED_VALUES = 5
+
+# What a dry run learns from one seed file: its row count and estimated
+# on-disk size, the keys it defines, the values of its reference columns
+# ({column: set}) and of its polymorphic pairs ({(type, id) column pair: set
+# of (type, id)}), and the problems found while reading it.
+SeedScan = namedtuple(
+    "SeedScan",
+    ["table", "seed_file", "kind", "columns", "rows", "estimated_bytes", "keys", "references", "polymorphic", "errors"],
+)
+
+def _value_bytes(value, column_type=None):
+    if column_type is not None and column_type.width is not None:
+        return column_type.width
+    if isinstance(value, bool):
+        return 1
+    if isinstance(value, int):
+        return 4
+    if isinstance(value, float):
+        return 8
+    if isinstance(value, list):
+        # Array header plus one integer per element.
+        return 24 + 4 * len(value)
+    size = len(str(value).encode("utf-8"))
+    # Short values get a 1-byte varlena header, longer ones 4 bytes.
+    return size + (1 if size < 127 else 4)
+
+def estimate_row_bytes(record, table_schema=None):
+    """
+    Rough on-disk size of a record once loaded: tuple overhead plus each
+    non-null value, aligned as PostgreSQL would when the table is declared.
+    """
+    if table_schema is None:
+        return TUPLE_OVERHEAD_BYTES + sum(_value_bytes(value) for value in record.values() if value is not None)
+    offset = 0
+    for column in table_schema.columns:
+        value = record.get(column.name)
+        if value is None:
+            continue
+        alignment = column.type.alignment
+        offset = (offset + alignment - 1) // alignment * alignment + _value_bytes(value, column.type)
+    return TUPLE_OVERHEAD_BYTES + offset
+
+def scan_table_seed(seed_file, table_names, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Read a table seed once: validate and coerce it against its declared
+    schema, count its rows, estimate its size and collect its ids and the
+    values of its *_id and polymorphic reference columns.
+    """
+    table_name = seed_table_name(seed_file)
+    table_schema = declared_schema(table_name)
+    scan = SeedScan(table_name, seed_file, "table", [], 0, 0, set(), {}, {}, [])
+    rows = 0
+    estimated_bytes = 0
+    duplicates = 0
+    records = iter_seed_records(seed_file)
+    if table_schema:
+        records = table_schema.coerce_records(records, batch_size)
+    try:
+        for record in records:
+            if not isinstance(record, dict):
+                scan.errors.append(f"{table_name}: record {rows} is not an object")
+                continue
+            if not scan.columns:
+                scan.columns.extend(table_schema.by_name if table_schema else record)
+                for column in scan.columns:
+                    if referenced_table(column, table_names):
+                        scan.references[column] = set()
+                for pair in polymorphic_pairs(scan.columns):
+                    scan.polymorphic[pair] = set()
+                    scan.references.pop(pair[1], None)
+            rows += 1
+            estimated_bytes += estimate_row_bytes(record, table_schema)
+            record_id = record.get("id")
+            if record_id in scan.keys:
+                duplicates += 1
+            scan.keys.add(record_id)
+            for column, values in scan.references.items():
+                if record.get(column) is not None:
+                    values.add(record[column])
+            for (type_column, id_column), values in scan.polymorphic.items():
+                if record.get(id_column) is not None:
+                    values.add((record.get(type_column), record[id_column]))
+    except ValueError as e:
+        # SchemaValidationError, or malformed JSON
+        scan.errors.append(f"{table_name}: {e}")
+    if duplicates:
+        scan.errors.append(f"{table_name}: {duplicates} duplicated id(s)")
+    return scan._replace(rows=rows, estimated_bytes=estimated_bytes)
+
+def scan_join_seed(seed_file):
+    """
+    Read a join seed once: count its records, check that their composite
+    keys are unique and collect the values of both referencing columns.
+    """
+    table_name = seed_table_name(seed_file)
+    scan = SeedScan(table_name, seed_file, "join", [], 0, 0, set(), {}, {}, [])
+    rows = 0
+    duplicates = 0
+    try:
+        references, content = read_join_seed(seed_file)
+        targets = {}
+        for record in content:
+            if not isinstance(record, dict):
+                scan.errors.append(f"{table_name}: record {rows} is not an object")
+                continue
+            if not scan.columns:
+                scan.columns.extend(record)
+                for position, column in enumerate(scan.columns[:2], start=1):
+                    if references.get(f"column_{position}_reference_table"):
+                        targets[column] = references[f"column_{position}_reference_table"]
+                        scan.references[column] = set()
+            rows += 1
+            key = tuple(record.get(column) for column in scan.columns)
+            if key in scan.keys:
+                duplicates += 1
+            scan.keys.add(key)
+            for column, values in scan.references.items():
+                if record.get(column) is not None:
+                    values.add(record[column])
+    except ValueError as e:
+        scan.errors.append(f"{table_name}: {e}")
+        targets = {}
+    if duplicates:
+        scan.errors.append(f"{table_name}: {duplicates} duplicated record(s)")
+    # Join tables store integers only: a composite primary key plus nothing else.
+    scan = scan._replace(rows=rows, estimated_bytes=rows * (TUPLE_OVERHEAD_BYTES + 4 * len(scan.columns)))
+    return scan, targets
+
+def _missing(values, keys):
+    missing = sorted(values - keys, key=str)
+    shown = ", ".join(str(value) for value in missing[:MAX_REPORTED_VALUES])
+    return missing, shown + (" ..." if len(missing) > MAX_REPORTED_VALUES else "")
+
+def cross_validate(scans, join_targets=None):
+    """
+    Check every reference against the ids of the seed it points to, with
+    set lookups. join_targets maps a join table to {column: target table}.
+    Returns a list of error messages (references to tables without a seed
+    cannot be checked and are skipped).
+    """
+    join_targets = join_targets or {}
+    ids = {scan.table: scan.keys for scan in scans if scan.kind == "table"}
+    errors = []
+    for scan in scans:
+        for column, values in scan.references.items():
+            target = join_targets.get(scan.table, {}).get(column) or referenced_table(column, ids)
+            if target not in ids:
+                continue
+            missing, shown = _missing(values, ids[target])
+            if missing:
+                errors.append(f"{scan.table}.{column}: {len(missing)} value(s) missing from {target}.id ({shown})")
+        for (type_column, id_column), pairs in scan.polymorphic.items():
+            by_target = {}
+            for type_name, record_id in pairs:
+                by_target.setdefault(type_name, set()).add(record_id)
+            for type_name, values in sorted(by_target.items(), key=lambda item: str(item[0])):
+                target = referenced_table(f"{type_name}_id", ids) if type_name else None
+                if target is None:
+                    errors.append(f"{scan.table}.{type_column}: '{type_name}' does not name a seeded table")
+                    continue
+                missing, shown = _missing(values, ids[target])
+                if missing:
+                    errors.append(
+                        f"{scan.table}.{id_column}: {len(missing)} '{type_name}' value(s) missing from {target}.id ({shown})"
+                    )
+    return errors
+
+def build_load_plan(table_seed_files, join_seed_files, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Scan every seed file once and order the tables as the loaders would:
+    referenced tables first, join tables last.
+    Returns (ordered scans, errors).
+    """
+    table_names = {seed_table_name(seed_file) for seed_file in table_seed_files}
+    scans = [scan_table_seed(seed_file, table_names, batch_size) for seed_file in table_seed_files]
+    join_targets = {}
+    for seed_file in join_seed_files:
+        scan, targets = scan_join_seed(seed_file)
+        scans.append(scan)
+        join_targets[scan.table] = targets
+
+    errors = [error for scan in scans for error in scan.errors]
+    errors += cross_validate(scans, join_targets)
+
+    by_table = {scan.table: scan for scan in scans if scan.kind == "table"}
+    try:
+        layers = topological_layers(table_dependencies({table: scan.columns for table, scan in by_table.items()}))
+        ordered = [by_table[table] for layer in layers for table in layer]
+    except ValueError as e:
+        errors.append(str(e))
+        ordered = sorted(by_table.values(), key=lambda scan: scan.table)
+    ordered += sorted((scan for scan in scans if scan.kind == "join"), key=lambda scan: scan.table)
+    return ordered, errors
+
+def format_bytes(size):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024 or unit == "GiB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+def fetch_existing_rows(table_names, engine=None):
+    """
+    Planner row estimates of the target tables, in one query, or None when
+    no database is configured or reachable (the plan itself is offline).
+    """
+    try:
+        engine = engine or get_engine()
+        with engine.connect() as conn:
+            return fetch_row_estimates(conn, table_names)
+    except ConfigurationError:
+        print("No database configured: existing row counts are not shown.")
+    except SQLAlchemyError as e:
+        print(f"Could not reach the database, existing row counts are not shown: {e}")
+    return None
+
+def print_load_plan(ordered, errors, existing=None):
+    print("\nLoad plan:")
+    for position, scan in enumerate(ordered, start=1):
+        line = (
+            f"{position:>3}. {scan.table:<28} {scan.kind:<5} {scan.rows:>9} row(s)  "
+            f"~{format_bytes(scan.estimated_bytes):>10}  {os.path.relpath(scan.seed_file)}"
+        )
+        if existing is not None:
+            if scan.table not in existing:
+                line += "  (new table)"
+            elif existing[scan.table] is None:
+                line += "  (existing rows: unknown, not analyzed yet)"
+            else:
+                line += f"  (existing rows: ~{existing[scan.table]})"
+        print(line)
+    total_rows = sum(scan.rows for scan in ordered)
+    total_bytes = sum(scan.estimated_bytes for scan in ordered)
+    print(f"Total: {total_rows} row(s), ~{format_bytes(total_bytes)} in {len(ordered)} table(s).")
+    if errors:
+        print(f"\n{len(errors)} problem(s) found:")
+        for error in errors:
+            print(f" - {error}")
+    else:
+        print("\n✅ Every seed matches its schema and every reference resolves.")
+
+def run_plan(table_seed_files, join_seed_files, batch_size=DEFAULT_BATCH_SIZE, engine=None):
+    """
+    The --plan dry run: nothing is written. Returns True if the seeds are valid.
+    """
+    ordered, errors = build_load_plan(table_seed_files, join_seed_files, batch_size)
+    existing = fetch_existing_rows([scan.table for scan in ordered], engine)
+    print_load_plan(ordered, errors, existing)
+    return not errors
@@ -0,0 +1,51 @@
+import posixpath
+
+# Root folder of the media tree, both locally and in the blob container.
+MEDIA_ROOT = "media"
+
+# Sub-folders holding each kind of media inside an entity folder.
+PHOTO_FOLDER = "photo"
+DOCUMENTARY_FOLDER = "documentary"
+HEROVIDEO_FOLDER = "herovideo"
+
+def entity_folder(entity_type, entity_id, root=MEDIA_ROOT):
+    """
+    Folder of one entity's media, e.g. ("farm", 3) -> media/farms/farm_3.
+    """
+    return f"{root}/{entity_type}s/{entity_type}_{entity_id}"
+
+def photo_stem(photoable_type, photoable_id, photo_id, root=MEDIA_ROOT):
+    """
+    Path of a photos row's file without its extension: the photo of id N
+    owned by farmer 1 is media/farmers/farmer_1/photo/N.<jpg|png|webp>.
+    """
+    return f"{entity_folder(photoable_type, photoable_id, root)}/{PHOTO_FOLDER}/{photo_id}"
+
+def documentary_stem(farm_id, documentary_id, root=MEDIA_ROOT):
+    """
+    Path of a documentaries row's video without its extension.
+    """
+    return f"{entity_folder('farm', farm_id, root)}/{DOCUMENTARY_FOLDER}/{documentary_id}"
+
+def herovideo_stem(farm_id, herovideo_id, root=MEDIA_ROOT):
+    """
+    Path of a herovideos row's video without its extension.
+    """
+    return f"{entity_folder('farm', farm_id, root)}/{HEROVIDEO_FOLDER}/{herovideo_id}"
+
+def path_stem(path):
+    """
+    Strip the extension of a media path (media/farms/farm_1/photo/4.jpg ->
+    media/farms/farm_1/photo/4), so rows can be matched whatever the format.
+    """
+    return posixpath.splitext(path)[0]
+
+def media_kind(path):
+    """
+    Return the media sub-folder ("photo", "documentary", "herovideo") a
+    path belongs to, or None for other files such as icons.
+    """
+    parts = path.split("/")
+    if len(parts) >= 2 and parts[-2] in (PHOTO_FOLDER, DOCUMENTARY_FOLDER, HEROVIDEO_FOLDER):
+        return parts[-2]
+    return None
@@ -0,0 +1,200 @@
+import sys
+import time
+import argparse
+from collections import deque
+from psycopg2.extras import execute_values
+from sqlalchemy import text
+from db_config import get_engine, ConfigurationError
+
+# Parent -> subproduct edges, as loaded from join_table_seeds/product_subproducts.json
+EDGES_TABLE = "product_subproducts"
+PARENT_COLUMN = "parent_product_id"
+CHILD_COLUMN = "subproduct_id"
+
+# Precomputed transitive closure of the edges: one row per (ancestor,
+# descendant) pair with the length of the shortest path between them, so a
+# whole subtree or ancestor chain is a single indexed lookup.
+CLOSURE_TABLE = "product_closure"
+
+class HierarchyCycleError(ValueError):
+    """
+    Raised when the product edges contain a cycle.
+    """
+
+def find_cycle(edges):
+    """
+    Return the products of a cycle (e.g. [1, 2, 3, 1]) in the directed
+    graph given by (parent, child) edges, or None if it is acyclic.
+    """
+    children = {}
+    for parent, child in edges:
+        children.setdefault(parent, []).append(child)
+    # 0: unvisited, 1: on the current DFS path, 2: done
+    state = {}
+    for start in children:
+        if state.get(start):
+            continue
+        path = [start]
+        iterators = [iter(children.get(start, ()))]
+        state[start] = 1
+        while iterators:
+            child = next(iterators[-1], None)
+            if child is None:
+                state[path.pop()] = 2
+                iterators.pop()
+            elif state.get(child) == 1:
+                return path[path.index(child):] + [child]
+            elif not state.get(child):
+                state[child] = 1
+                path.append(child)
+                iterators.append(iter(children.get(child, ())))
+    return None
+
+def compute_closure(edges):
+    """
+    Compute the closure of an acyclic edge list: a dict mapping each
+    (ancestor, descendant) pair to its shortest path length (>= 1).
+    Raises HierarchyCycleError on a cycle.
+    """
+    edges = list(edges)
+    cycle = find_cycle(edges)
+    if cycle:
+        raise HierarchyCycleError(f"Product hierarchy contains a cycle: {' -> '.join(str(node) for node in cycle)}")
+    children = {}
+    for parent, child in edges:
+        children.setdefault(parent, set()).add(child)
+    closure = {}
+    for ancestor in children:
+        # Breadth-first search: the first time a node is reached is its shortest depth.
+        queue = deque((child, 1) for child in children[ancestor])
+        while queue:
+            node, depth = queue.popleft()
+            if (ancestor, node) in closure:
+                continue
+            closure[(ancestor, node)] = depth
+            queue.extend((child, depth + 1) for child in children.get(node, ()))
+    return closure
+
+def diff_closure(current, desired):
+    """
+    Compare the stored closure with the desired one.
+    Returns (rows_to_insert, pairs_to_delete, rows_to_update) where rows are
+    (ancestor, descendant, depth) tuples.
+    """
+    inserts = [(a, d, depth) for (a, d), depth in desired.items() if (a, d) not in current]
+    deletes = [pair for pair in current if pair not in desired]
+    updates = [(a, d, depth) for (a, d), depth in desired.items() if (a, d) in current and current[(a, d)] != depth]
+    return inserts, deletes, updates
+
+def ensure_closure_table(conn):
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {CLOSURE_TABLE} (
+            ancestor_id INTEGER NOT NULL,
+            descendant_id INTEGER NOT NULL,
+            depth INTEGER NOT NULL,
+            PRIMARY KEY (ancestor_id, descendant_id)
+        )
+    """))
+    # The primary key serves subtree lookups; this index serves ancestor chains.
+    conn.execute(text(
+        f"CREATE INDEX IF NOT EXISTS idx_{CLOSURE_TABLE}_descendant ON {CLOSURE_TABLE} (descendant_id, depth)"
+    ))
+
+def sync_product_closure(conn):
+    """
+    Bring the closure table in line with the current edges, writing only
+    the pairs that were added, removed or whose depth changed. Run it in the
+    transaction that changed the edges: a cycle raises HierarchyCycleError
+    and rolls the edge change back with it.
+    Returns (inserted, deleted, updated).
+    """
+    start = time.perf_counter()
+    ensure_closure_table(conn)
+    edges = conn.execute(text(f"SELECT {PARENT_COLUMN}, {CHILD_COLUMN} FROM {EDGES_TABLE}")).fetchall()
+    desired = compute_closure(edges)
+    current = {
+        (ancestor, descendant): depth
+        for ancestor, descendant, depth in conn.execute(text(f"SELECT ancestor_id, descendant_id, depth FROM {CLOSURE_TABLE}"))
+    }
+    inserts, deletes, updates = diff_closure(current, desired)
+    with conn.connection.cursor() as cursor:
+        if deletes:
+            execute_values(
+                cursor,
+                f"DELETE FROM {CLOSURE_TABLE} WHERE (ancestor_id, descendant_id) IN (VALUES %s)",
+                deletes,
+            )
+        if inserts:
+            execute_values(cursor, f"INSERT INTO {CLOSURE_TABLE} (ancestor_id, descendant_id, depth) VALUES %s", inserts)
+        if updates:
+            execute_values(
+                cursor,
+                f"""UPDATE {CLOSURE_TABLE} SET depth = v.depth FROM (VALUES %s) AS v(ancestor_id, descendant_id, depth)
+                    WHERE {CLOSURE_TABLE}.ancestor_id = v.ancestor_id AND {CLOSURE_TABLE}.descendant_id = v.descendant_id""",
+                updates,
+            )
+    print(
+        f"Product closure: {len(desired)} pair(s); {len(inserts)} inserted, {len(deletes)} deleted, "
+        f"{len(updates)} updated in {time.perf_counter() - start:.2f}s."
+    )
+    return len(inserts), len(deletes), len(updates)
+
+def get_subtree(conn, product_id):
+    """
+    Every product below product_id, nearest first:
+    a list of dicts with product_id, depth and short_description.
+    """
+    rows = conn.execute(text(f"""
+        SELECT c.descendant_id, c.depth, p.short_description
+        FROM {CLOSURE_TABLE} c
+        LEFT JOIN products p ON p.id = c.descendant_id
+        WHERE c.ancestor_id = :product_id
+        ORDER BY c.depth, c.descendant_id
+    """), {"product_id": product_id})
+    return [{"product_id": pid, "depth": depth, "short_description": description} for pid, depth, description in rows]
+
+def get_ancestors(conn, product_id):
+    """
+    Every product above product_id, from its direct parents up:
+    a list of dicts with product_id, depth and short_description.
+    """
+    rows = conn.execute(text(f"""
+        SELECT c.ancestor_id, c.depth, p.short_description
+        FROM {CLOSURE_TABLE} c
+        LEFT JOIN products p ON p.id = c.ancestor_id
+        WHERE c.descendant_id = :product_id
+        ORDER BY c.depth, c.ancestor_id
+    """), {"product_id": product_id})
+    return [{"product_id": pid, "depth": depth, "short_description": description} for pid, depth, description in rows]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain and query the product/subproduct closure table.")
+    parser.add_argument("--rebuild", action="store_true", help=f"Sync '{CLOSURE_TABLE}' with '{EDGES_TABLE}'.")
+    parser.add_argument("--subtree", type=int, help="Print every subproduct of this product.")
+    parser.add_argument("--ancestors", type=int, help="Print every product containing this product.")
+    return parser.parse_args(argv)
+
+def main(argv=None, engine=None):
+    args = parse_args(argv)
+    engine = engine or get_engine()
+    if args.rebuild:
+        try:
+            with engine.begin() as conn:
+                sync_product_closure(conn)
+        except HierarchyCycleError as e:
+            print(e)
+            sys.exit(1)
+    with engine.connect() as conn:
+        for label, product_id, lookup in (("Subproducts", args.subtree, get_subtree), ("Ancestors", args.ancestors, get_ancestors)):
+            if product_id is None:
+                continue
+            print(f"{label} of product {product_id}:")
+            for row in lookup(conn, product_id):
+                print(f" {'  ' * (row['depth'] - 1)}- {row['product_id']} {row['short_description'] or ''} (depth {row['depth']})")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except ConfigurationError as e:
+        print(e)
+        sys.exit(1)
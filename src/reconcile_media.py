@@ -0,0 +1,233 @@
+import os
+import sys
+import json
+import time
+import argparse
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import text
+from azure.storage.blob import BlobPrefix
+from media_paths import MEDIA_ROOT, photo_stem, documentary_stem, herovideo_stem, path_stem, media_kind
+from catalog import fetch_row_estimates
+from db_config import get_engine, get_container_client, ConfigurationError
+
+# Checks that every photos / documentaries / herovideos row has its file in
+# the container, and that the container holds no media file without a row.
+
+# Local media tree, the source of the expected file sizes.
+LOCAL_MEDIA_ROOT = "media"
+DEFAULT_JOBS = 8
+# Rows fetched per round trip of the server-side cursor.
+DEFAULT_FETCH_SIZE = 10000
+# Entries listed per category by the text report.
+DEFAULT_SHOWN = 20
+# Folders of numbered entity folders (media/farms/farm_<id>/...), whose
+# listing is split by the first digit of the ids.
+ENTITY_FOLDERS = ("animals", "crops", "farms", "farmers", "products")
+
+MediaReference = namedtuple("MediaReference", ["table", "id", "stem"])
+
+# The media tables and, for each, the columns that place a row's file.
+REFERENCE_QUERIES = {
+    "photos": "SELECT 'photos', id, photoable_type, photoable_id FROM photos",
+    "documentaries": "SELECT 'documentaries', id, 'farm', farm_id FROM documentaries",
+    "herovideos": "SELECT 'herovideos', id, 'farm', farm_id FROM herovideos",
+}
+STEM_BUILDERS = {
+    "photos": lambda row_id, owner_type, owner_id: photo_stem(owner_type, owner_id, row_id),
+    "documentaries": lambda row_id, owner_type, owner_id: documentary_stem(owner_id, row_id),
+    "herovideos": lambda row_id, owner_type, owner_id: herovideo_stem(owner_id, row_id),
+}
+
+def iter_references(conn, tables, fetch_size=DEFAULT_FETCH_SIZE):
+    """
+    Stream the expected media paths (without extension) of every row of
+    the given media tables, in one UNION ALL query read through a
+    server-side cursor. Rows without an owner are yielded with a None stem.
+    """
+    query = text(" UNION ALL ".join(REFERENCE_QUERIES[table] for table in tables))
+    result = conn.execution_options(stream_results=True, yield_per=fetch_size).execute(query)
+    for table, row_id, owner_type, owner_id in result:
+        stem = STEM_BUILDERS[table](row_id, owner_type, owner_id) if owner_type and owner_id is not None else None
+        yield MediaReference(table, row_id, stem)
+
+def listing_shards(container, root=MEDIA_ROOT):
+    """
+    Split the listing of the media tree into prefixes that can be listed
+    concurrently: each folder of ENTITY_FOLDERS (media/farms/) is split by
+    the first digit of the entity ids (media/farms/farm_1,
+    media/farms/farm_2...), other folders (media/icons/) are listed whole.
+    Returns (shard prefixes, {name: size} of the blobs directly under root).
+    """
+    shards = []
+    top_level = {}
+    for item in container.walk_blobs(name_starts_with=f"{root}/", delimiter="/"):
+        if not isinstance(item, BlobPrefix):
+            top_level[item.name] = item.size
+            continue
+        folder = item.name.rstrip("/").split("/")[-1]
+        if folder in ENTITY_FOLDERS:
+            shards.extend(f"{item.name}{folder[:-1]}_{digit}" for digit in "0123456789")
+        else:
+            shards.append(item.name)
+    return shards, top_level
+
+def list_shard(container, prefix):
+    return {blob.name: blob.size for blob in container.list_blobs(name_starts_with=prefix)}
+
+def local_file_sizes(local_root=LOCAL_MEDIA_ROOT, remote_root=MEDIA_ROOT):
+    """
+    {blob path: size} of the local media tree, or {} when there is none.
+    """
+    sizes = {}
+    for root, _, files in os.walk(local_root):
+        for file in files:
+            local_file_path = os.path.join(root, file)
+            rel_path = os.path.relpath(local_file_path, local_root).replace(os.sep, "/")
+            sizes[f"{remote_root}/{rel_path}"] = os.path.getsize(local_file_path)
+    return sizes
+
+def reconcile(references, blob_sizes, local_sizes=None):
+    """
+    Diff the media rows against the blob listing in memory.
+    blob_sizes maps blob names to sizes; local_sizes, when given, maps blob
+    names to the size of the local file they were uploaded from.
+    Returns a dict of lists:
+      - missing: rows whose file is not in the container (or that have no owner),
+      - orphaned: photo / documentary / hero video blobs that no row references,
+      - size_mismatched: referenced blobs that are empty or whose size differs
+        from the local file,
+    and the number of rows and of media blobs compared, and of rows that
+    matched a blob.
+    """
+    by_stem = {}
+    for name, size in blob_sizes.items():
+        if media_kind(name):
+            by_stem.setdefault(path_stem(name), []).append(name)
+    media_blobs = sum(len(names) for names in by_stem.values())
+
+    missing = []
+    size_mismatched = []
+    rows = 0
+    matched = 0
+    for reference in references:
+        rows += 1
+        names = by_stem.pop(reference.stem, None) if reference.stem else None
+        if not names:
+            missing.append({"table": reference.table, "id": reference.id, "expected": reference.stem})
+            continue
+        matched += 1
+        for name in names:
+            size = blob_sizes[name]
+            expected = (local_sizes or {}).get(name)
+            if size == 0 or (expected is not None and expected != size):
+                size_mismatched.append({"blob": name, "size": size, "expected_size": expected, "table": reference.table, "id": reference.id})
+
+    orphaned = sorted(name for names in by_stem.values() for name in names)
+    return {
+        "rows": rows,
+        "media_blobs": media_blobs,
+        "matched": matched,
+        "missing": missing,
+        "orphaned": orphaned,
+        "size_mismatched": size_mismatched,
+    }
+
+def layout_mismatch(report):
+    """
+    True when there are rows and media blobs but not one of them matches:
+    the container does not follow the media path convention
+    (media-folder-structure.md), so a row-by-row diff would be meaningless.
+    """
+    return report["rows"] > 0 and report["media_blobs"] > 0 and report["matched"] == 0
+
+def run_reconciliation(engine, container, jobs=DEFAULT_JOBS, fetch_size=DEFAULT_FETCH_SIZE, local_sizes=None):
+    """
+    List the container (one listing per shard, on jobs threads) while the
+    media rows stream from the database, then reconcile the two.
+    """
+    start = time.perf_counter()
+    shards, blob_sizes = listing_shards(container)
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        listings = [executor.submit(list_shard, container, prefix) for prefix in shards]
+        # The rows are buffered (a table, an id and a path each) while the
+        # listings complete, since the diff needs the whole blob index.
+        with engine.connect() as conn:
+            existing = fetch_row_estimates(conn, REFERENCE_QUERIES)
+            tables = [table for table in REFERENCE_QUERIES if table in existing]
+            references = list(iter_references(conn, tables, fetch_size)) if tables else []
+        for listing in listings:
+            blob_sizes.update(listing.result())
+    report = reconcile(references, blob_sizes, local_sizes)
+    report["tables"] = tables
+    report["objects"] = len(blob_sizes)
+    report["seconds"] = time.perf_counter() - start
+    return report
+
+def print_report(report, shown=DEFAULT_SHOWN):
+    print(
+        f"Compared {report['rows']} media row(s) of {', '.join(report['tables']) or 'no table'} with "
+        f"{report['media_blobs']} media blob(s) ({report['objects']} object(s) listed) in {report['seconds']:.2f}s."
+    )
+    if layout_mismatch(report):
+        print(
+            "\n⚠️  Not one media row matches a blob: the container does not seem to follow the media path "
+            "convention of media-folder-structure.md (e.g. media/farms/farm_1/photo/4.jpg for photo 4 of farm 1). "
+            "Missing and orphaned files are not listed."
+        )
+        return
+    sections = (
+        ("missing", "row(s) without their file", lambda entry: f"{entry['table']} #{entry['id']}: {entry['expected'] or 'no owner'}.*"),
+        ("orphaned", "blob(s) without a row", lambda name: name),
+        ("size_mismatched", "blob(s) with a wrong size", lambda entry: (
+            f"{entry['blob']}: {entry['size']} byte(s)"
+            + (f", {entry['expected_size']} locally" if entry["expected_size"] is not None else "")
+        )),
+    )
+    for key, label, describe in sections:
+        entries = report[key]
+        if not entries:
+            continue
+        print(f"\n{len(entries)} {label}:")
+        for entry in entries[:shown]:
+            print(f" - {describe(entry)}")
+        if len(entries) > shown:
+            print(f"   ... and {len(entries) - shown} more")
+    if not (report["missing"] or report["orphaned"] or report["size_mismatched"]):
+        print("✅ Every media row has its file and every media file has its row.")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Check that the media rows of the database and the media blobs of the container match.")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS, help="Number of blob listings run concurrently.")
+    parser.add_argument("--fetch-size", type=int, default=DEFAULT_FETCH_SIZE, help="Rows fetched per round trip of the server-side cursor.")
+    parser.add_argument(
+        "--no-local",
+        action="store_true",
+        help=f"Do not compare blob sizes with the local '{LOCAL_MEDIA_ROOT}' folder (only empty blobs are then reported).",
+    )
+    parser.add_argument("--show", type=int, default=DEFAULT_SHOWN, help="Entries listed per category.")
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON.")
+    return parser.parse_args(argv)
+
+def main(argv=None, engine=None):
+    args = parse_args(argv)
+    engine = engine or get_engine()
+    container = get_container_client()
+    local_sizes = None if args.no_local else local_file_sizes()
+    report = run_reconciliation(engine, container, args.jobs, args.fetch_size, local_sizes)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, args.show)
+    if layout_mismatch(report):
+        # Only a warning: the files may be fine, just named another way.
+        return
+    if report["missing"] or report["orphaned"] or report["size_mismatched"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    try:
+        main()
+    except ConfigurationError as e:
+        print(e)
+        sys.exit(1)
@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import random
+import threading
+import psycopg2
+from sqlalchemy.exc import DBAPIError
+from azure.core.exceptions import ServiceRequestError, ServiceResponseError, HttpResponseError
+from instrumentation import get_logger, metrics
+
+# Retries of transient failures (dropped connections, failovers, throttling)
+# with jittered exponential backoff, and the local journal that lets an
+# interrupted load resume with the tables it had not committed yet.
+
+DEFAULT_ATTEMPTS = 5
+DEFAULT_BASE_DELAY_SECONDS = 0.5
+DEFAULT_MAX_DELAY_SECONDS = 30.0
+
+# SQLSTATE classes worth retrying: connection exception, insufficient
+# resources (e.g. too many connections) and operator intervention (server
+# shutdown or restart, as during an Azure failover or maintenance).
+TRANSIENT_SQLSTATE_CLASSES = ("08", "53", "57")
+# Conflicts that a new attempt of the same statements resolves.
+TRANSIENT_SQLSTATES = {
+    "40001",  # serialization_failure
+    "40P01",  # deadlock_detected
+    "55P03",  # lock_not_available
+}
+# A statement cancelled by statement_timeout (57014, query_canceled) hit a
+# deliberate limit and would only time out again. lock_timeout raises
+# 55P03 (lock_not_available) instead, which is retried above.
+PERMANENT_SQLSTATES = {"57014"}
+TRANSIENT_HTTP_STATUSES = {408, 429, 500, 502, 503, 504}
+
+# Journal of the tables committed by an interrupted load (one JSON object per line).
+SEED_LOAD_JOURNAL_PATH = ".seed_load_journal.jsonl"
+
+log = get_logger("resilience")
+
+def _sqlstate(error):
+    return getattr(error, "pgcode", None)
+
+def connection_lost(error):
+    """
+    True when the error means the database connection is gone, so the
+    transaction is lost with it and only a new one can be retried.
+    """
+    if isinstance(error, DBAPIError):
+        if error.connection_invalidated:
+            return True
+        error = error.orig
+    if not isinstance(error, psycopg2.Error):
+        return False
+    sqlstate = _sqlstate(error)
+    if sqlstate is None:
+        # Closed sockets and SSL errors come without a SQLSTATE.
+        return isinstance(error, (psycopg2.OperationalError, psycopg2.InterfaceError))
+    return sqlstate.startswith("08") or sqlstate in ("57P01", "57P02", "57P03")
+
+def is_transient(error):
+    """
+    Classify an error as transient (the same work may succeed if retried)
+    or permanent (bad data, bad SQL, missing credentials...).
+    """
+    if isinstance(error, (ServiceRequestError, ServiceResponseError)):
+        # The request never reached Blob Storage, or its response was cut.
+        return True
+    if isinstance(error, HttpResponseError):
+        return error.status_code in TRANSIENT_HTTP_STATUSES
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    if connection_lost(error):
+        return True
+    if isinstance(error, DBAPIError):
+        error = error.orig
+    sqlstate = _sqlstate(error)
+    if sqlstate is None or sqlstate in PERMANENT_SQLSTATES:
+        return False
+    return sqlstate in TRANSIENT_SQLSTATES or sqlstate[:2] in TRANSIENT_SQLSTATE_CLASSES
+
+def backoff_delay(attempt, base_delay=DEFAULT_BASE_DELAY_SECONDS, max_delay=DEFAULT_MAX_DELAY_SECONDS, generator=random):
+    """
+    Delay before retry number attempt (0-based): "full jitter", a uniform
+    draw below an exponentially growing cap, so parallel workers that
+    failed together do not retry in lockstep.
+    """
+    return generator.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+def retry(operation, description, attempts=DEFAULT_ATTEMPTS, base_delay=DEFAULT_BASE_DELAY_SECONDS,
+          max_delay=DEFAULT_MAX_DELAY_SECONDS, retry_if=is_transient, sleep=time.sleep):
+    """
+    Call operation() until it succeeds, retrying errors for which
+    retry_if(error) is true with a jittered exponential backoff, at most
+    attempts times in all. Other errors, and the last one, are raised.
+    """
+    for attempt in range(attempts):
+        try:
+            return operation()
+        except Exception as e:
+            if attempt + 1 >= attempts or not retry_if(e):
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            metrics.increment("retries")
+            log.warning(f"{description} failed ({type(e).__name__}: {e}); retry {attempt + 1}/{attempts - 1} in {delay:.1f}s.")
+            sleep(delay)
+
+class CheckpointJournal:
+    """
+    Append-only local journal of completed work items (e.g. committed
+    tables), each with a fingerprint of its input (e.g. the seed file
+    hash). A rerun skips the items done with an unchanged input. Safe to
+    share between threads.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        if not os.path.exists(path):
+            return
+        lines = 0
+        line = "\n"
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                lines += 1
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A run killed mid-write leaves a truncated last line.
+                    continue
+                self.entries[entry["key"]] = entry
+        # Appending after a truncated line would glue the next entry to it.
+        if lines > len(self.entries) or not line.endswith("\n"):
+            self._rewrite()
+
+    def _rewrite(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def is_done(self, key, fingerprint):
+        entry = self.entries.get(key)
+        return bool(entry and entry["fingerprint"] == fingerprint)
+
+    def record(self, key, fingerprint, **details):
+        entry = dict(details, key=key, fingerprint=fingerprint)
+        with self.lock:
+            self.entries[key] = entry
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def clear(self):
+        """
+        Forget every item, e.g. once the whole run has completed.
+        """
+        with self.lock:
+            self.entries = {}
+            if os.path.exists(self.path):
+                os.remove(self.path)
@@ -0,0 +1,165 @@
+import sys
+import time
+import argparse
+import upload_seed_tables
+import add_foreign_keys
+import upload_seed_join_tables
+import create_indexes
+import farm_profiles
+import upload_media_blob
+from seed_graph import run_in_dependency_order, topological_layers
+from db_config import get_engine, get_container_client, ConfigurationError
+from instrumentation import metrics, add_instrumentation_arguments, instrumented
+
+# The initialization steps of script-execution-order.md as a dependency
+# graph: stage -> (the script's main, the stages it waits for). The media
+# upload touches only blob storage, so it depends on nothing and can run
+# alongside the database stages.
+STAGES = {
+    "seed_tables": (upload_seed_tables.main, set()),
+    "foreign_keys": (add_foreign_keys.main, {"seed_tables"}),
+    "join_tables": (upload_seed_join_tables.main, {"foreign_keys"}),
+    "indexes": (create_indexes.main, {"join_tables"}),
+    "profiles": (farm_profiles.main, {"join_tables"}),
+    "media": (upload_media_blob.main, set()),
+}
+DATABASE_STAGES = ("seed_tables", "foreign_keys", "join_tables", "indexes", "profiles")
+DEFAULT_JOBS = 4
+
+def stage_arguments(args):
+    """
+    The command line each stage's main() is called with.
+    """
+    jobs = ["--jobs", str(args.jobs)]
+    load = ["--yes"] + (["--incremental"] if args.incremental else [])
+    return {
+        "seed_tables": load + jobs,
+        "foreign_keys": jobs,
+        "join_tables": load,
+        "indexes": jobs,
+        "profiles": ["--setup"],
+        "media": ["--derivatives"] if args.derivatives else [],
+    }
+
+def select_stages(args):
+    """
+    The dependency graph of the stages to run. Skipped stages are removed
+    and their dependents wait for what the skipped stage waited for. With
+    --sequential, every stage also waits for the one before it, so nothing
+    overlaps.
+    """
+    wanted = [name for name in STAGES if name not in args.skip and (name != "media" or args.media)]
+    dependencies = {}
+    for name in wanted:
+        parents = set()
+        pending = list(STAGES[name][1])
+        while pending:
+            parent = pending.pop()
+            if parent in wanted:
+                parents.add(parent)
+            else:
+                pending.extend(STAGES[parent][1])
+        dependencies[name] = parents
+    if args.sequential:
+        order = [name for layer in topological_layers(dependencies) for name in layer]
+        for previous, name in zip(order, order[1:]):
+            dependencies[name].add(previous)
+    return dependencies
+
+def run_stage(name, argv, engine):
+    """
+    Run one stage in this process, on the shared engine.
+    Returns its duration; a non-zero sys.exit() of the stage is an error.
+    """
+    main, _ = STAGES[name]
+    print(f"\n=== {name} ===")
+    start = time.perf_counter()
+    try:
+        with metrics.span("stage", stage=name):
+            if name == "media":
+                main(argv)
+            else:
+                main(argv, engine=engine)
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            raise RuntimeError(f"stage '{name}' exited with status {e.code}")
+    seconds = time.perf_counter() - start
+    print(f"=== {name} finished in {seconds:.2f}s ===")
+    return seconds
+
+def print_timings(dependencies, results, errors, skipped, elapsed):
+    print("\nPipeline summary:")
+    for name in dependencies:
+        if name in results:
+            print(f" ✅ {name:<14} {results[name]:>8.2f}s")
+        elif name in errors:
+            print(f" ❌ {name:<14} failed: {errors[name]}")
+        elif name in skipped:
+            print(f" -  {name:<14} skipped (a stage it depends on failed)")
+    sequential = sum(results.values())
+    print(f"Wall time {elapsed:.2f}s; the stages took {sequential:.2f}s in total.")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Initialize the database (and optionally upload the media) in one process.")
+    parser.add_argument("--yes", action="store_true", help="Do not ask for confirmation before reinitializing the tables.")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS, help="Concurrency passed to the loaders, validation and indexing.")
+    parser.add_argument("--incremental", action="store_true", help="Sync the tables incrementally instead of reloading them.")
+    parser.add_argument("--media", action="store_true", help="Also upload the media files, alongside the database stages.")
+    parser.add_argument("--derivatives", action="store_true", help="With --media, also generate and upload photo derivatives.")
+    parser.add_argument(
+        "--skip",
+        action="append",
+        default=[],
+        choices=list(STAGES),
+        help="Do not run this stage (repeatable).",
+    )
+    parser.add_argument("--sequential", action="store_true", help="Run one stage at a time instead of overlapping independent stages.")
+    add_instrumentation_arguments(parser)
+    return parser.parse_args(argv)
+
+def run(args):
+    dependencies = select_stages(args)
+    if not dependencies:
+        print("Every stage was skipped.")
+        return
+    print("The following stages will run:")
+    for name, parents in dependencies.items():
+        print(f" - {name}" + (f" (after {', '.join(sorted(parents))})" if parents else ""))
+
+    # Fail on missing settings before anything runs.
+    engine = None
+    if any(name in DATABASE_STAGES for name in dependencies):
+        # The concurrent stages share one pool: the widest stage plus one.
+        engine = get_engine(pool_size=args.jobs + 1)
+    if "media" in dependencies:
+        get_container_client()
+
+    # One confirmation for the whole run instead of one per script and per join seed.
+    if not args.yes and any(name in ("seed_tables", "join_tables") for name in dependencies):
+        confirm = input("\nWARNING: This will DELETE or overwrite the seeded data of every table. Type 'yes' to confirm: ")
+        if confirm.lower() != "yes":
+            print("Operation aborted.")
+            sys.exit(0)
+
+    arguments = stage_arguments(args)
+    results, errors, skipped, elapsed = run_in_dependency_order(
+        dependencies,
+        lambda name: run_stage(name, arguments[name], engine),
+        jobs=len(dependencies),
+    )
+    print_timings(dependencies, results, errors, skipped, elapsed)
+    if errors or skipped:
+        sys.exit(1)
+    print("\n✅ Pipeline complete.")
+
+def main(argv=None):
+    args = parse_args(argv)
+    with instrumented(args, "run_pipeline"):
+        run(args)
+
+if __name__ == "__main__":
+    try:
+        main()
+    except ConfigurationError as e:
+        print(e)
+        sys.exit(1)
@@ -0,0 +1,307 @@
+import re
+from collections import namedtuple
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from bulk_loader import iter_batches, DEFAULT_BATCH_SIZE
+
+# Declared schema of the seed tables, in DBML (the dbdiagram.io language
+# dbdiagramio.txt is written in). Tables missing from it fall back to
+# first-record type inference.
+SCHEMA_FILE = "table_seeds/schema.dbml"
+
+# A column type: its SQL definition, its storage width in bytes (None for
+# variable-length types), its alignment in bytes and the function that
+# validates and coerces a seed value to it.
+ColumnType = namedtuple("ColumnType", ["sql", "width", "alignment", "coerce"])
+Column = namedtuple("Column", ["name", "type", "primary_key", "not_null"])
+
+class SchemaValidationError(ValueError):
+    """
+    Raised when seed records do not match the declared schema.
+    """
+
+# Shown in a SchemaValidationError before the remaining errors are counted.
+MAX_REPORTED_ERRORS = 5
+
+_MISSING = object()
+
+def _reject(value, expected):
+    raise ValueError(f"{value!r} is not a valid {expected}")
+
+def _integer_coercer(sql, low, high):
+    def coerce(value):
+        if isinstance(value, bool):
+            _reject(value, sql)
+        if isinstance(value, float):
+            if not value.is_integer():
+                _reject(value, sql)
+            value = int(value)
+        elif isinstance(value, str):
+            value = int(value.strip())
+        elif not isinstance(value, int):
+            _reject(value, sql)
+        if not low <= value <= high:
+            raise ValueError(f"{value} is out of range for {sql}")
+        return value
+    return coerce
+
+_TRUE = {"true", "t", "yes", "y", "1"}
+_FALSE = {"false", "f", "no", "n", "0"}
+
+def coerce_boolean(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str):
+        lowered = value.strip().lower()
+        if lowered in _TRUE:
+            return True
+        if lowered in _FALSE:
+            return False
+    _reject(value, "BOOLEAN")
+
+def coerce_date(value):
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        return date.fromisoformat(value.strip())
+    _reject(value, "DATE")
+
+def coerce_timestamp(value):
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        return datetime.fromisoformat(value.strip())
+    _reject(value, "TIMESTAMP")
+
+def coerce_float(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        _reject(value, "DOUBLE PRECISION")
+    return float(value)
+
+def _numeric_coercer(precision, scale):
+    def coerce(value):
+        if isinstance(value, bool) or not isinstance(value, (int, float, str, Decimal)):
+            _reject(value, "NUMERIC")
+        try:
+            number = Decimal(str(value).strip())
+        except InvalidOperation:
+            _reject(value, "NUMERIC")
+        if precision is not None and abs(number) >= Decimal(10) ** (precision - (scale or 0)):
+            raise ValueError(f"{value} does not fit in NUMERIC({precision},{scale or 0})")
+        return number
+    return coerce
+
+def coerce_text(value):
+    if isinstance(value, (dict, list)):
+        _reject(value, "TEXT")
+    return value if isinstance(value, str) else str(value)
+
+def coerce_integer_list(value):
+    if not isinstance(value, list):
+        _reject(value, "INTEGER[]")
+    return [None if item is None else _integer_coercer("INTEGER", -2**31, 2**31 - 1)(item) for item in value]
+
+def coerce_point(value):
+    """
+    Accept [longitude, latitude], {"longitude": .., "latitude": ..} or WKT,
+    and return EWKT that PostGIS casts to geography.
+    """
+    if isinstance(value, str) and value.strip().upper().startswith(("POINT", "SRID=")):
+        return value.strip() if value.strip().upper().startswith("SRID=") else f"SRID=4326;{value.strip()}"
+    if isinstance(value, dict):
+        value = [value.get("longitude"), value.get("latitude")]
+    if isinstance(value, (list, tuple)) and len(value) == 2:
+        longitude, latitude = (coerce_float(part) for part in value)
+        if -180 <= longitude <= 180 and -90 <= latitude <= 90:
+            return f"SRID=4326;POINT({longitude} {latitude})"
+    _reject(value, "POINT")
+
+INTEGER_TYPE = ColumnType("INTEGER", 4, 4, _integer_coercer("INTEGER", -2**31, 2**31 - 1))
+TEXT_TYPE = ColumnType("TEXT", None, 4, coerce_text)
+
+# DBML type names (lower case) mapped to PostgreSQL column types.
+COLUMN_TYPES = {
+    "smallint": ColumnType("SMALLINT", 2, 2, _integer_coercer("SMALLINT", -2**15, 2**15 - 1)),
+    "integer": INTEGER_TYPE,
+    "int": INTEGER_TYPE,
+    "bigint": ColumnType("BIGINT", 8, 8, _integer_coercer("BIGINT", -2**63, 2**63 - 1)),
+    "boolean": ColumnType("BOOLEAN", 1, 1, coerce_boolean),
+    "bool": ColumnType("BOOLEAN", 1, 1, coerce_boolean),
+    "date": ColumnType("DATE", 4, 4, coerce_date),
+    "timestamp": ColumnType("TIMESTAMP", 8, 8, coerce_timestamp),
+    "float": ColumnType("DOUBLE PRECISION", 8, 8, coerce_float),
+    "double": ColumnType("DOUBLE PRECISION", 8, 8, coerce_float),
+    "text": TEXT_TYPE,
+    "string": TEXT_TYPE,
+    "varchar": TEXT_TYPE,
+    "list": ColumnType("INTEGER[]", None, 4, coerce_integer_list),
+    "point": ColumnType("geography(Point, 4326)", None, 8, coerce_point),
+}
+
+def column_type(type_name):
+    """
+    Resolve a DBML type name, e.g. "date", "varchar(255)" or "decimal(9,6)".
+    """
+    match = re.fullmatch(r"(\w+)\s*(?:\(\s*(\d+)\s*(?:,\s*(\d+)\s*)?\))?", type_name.strip().lower())
+    if not match:
+        raise ValueError(f"Unsupported column type: {type_name}")
+    base, precision, scale = match.groups()
+    if base in ("decimal", "numeric"):
+        precision = int(precision) if precision else None
+        scale = int(scale) if scale else 0
+        sql = f"NUMERIC({precision},{scale})" if precision else "NUMERIC"
+        return ColumnType(sql, None, 4, _numeric_coercer(precision, scale))
+    if base not in COLUMN_TYPES:
+        raise ValueError(f"Unsupported column type: {type_name}")
+    return COLUMN_TYPES[base]
+
+_TABLE_START = re.compile(r"^Table\s+\"?(\w+)\"?(?:\s+as\s+\w+)?\s*(?:\[[^\]]*\])?\s*\{\s*$", re.IGNORECASE)
+_COLUMN_LINE = re.compile(r"^\"?(\w+)\"?\s+(\"[^\"]+\"|\w+(?:\s*\([^)]*\))?)\s*(?:\[([^\]]*)\])?\s*$")
+
+def parse_dbml(source):
+    """
+    Parse the Table blocks of a DBML document.
+    Returns a dict mapping table name to its list of Columns, in declared order.
+    Ref, Enum, Note and indexes blocks are ignored.
+    """
+    tables = {}
+    current = None
+    nested_depth = 0
+    for line_number, raw_line in enumerate(source.splitlines(), start=1):
+        line = raw_line.split("//", 1)[0].strip()
+        if not line:
+            continue
+        if current is None:
+            match = _TABLE_START.match(line)
+            if match:
+                current = tables.setdefault(match.group(1), [])
+            continue
+        if nested_depth:
+            nested_depth += line.count("{") - line.count("}")
+            continue
+        if line.startswith("}"):
+            current = None
+            continue
+        if line.endswith("{"):
+            # indexes { ... } or Note { ... }
+            nested_depth = 1
+            continue
+        match = _COLUMN_LINE.match(line)
+        if not match:
+            if line.lower().startswith("note"):
+                continue
+            raise ValueError(f"Line {line_number}: cannot parse column definition: {raw_line.strip()}")
+        name, type_name, settings = match.groups()
+        settings = [setting.strip().lower() for setting in (settings or "").split(",")]
+        current.append(Column(
+            name,
+            column_type(type_name.strip('"')),
+            "pk" in settings or "primary key" in settings,
+            "not null" in settings,
+        ))
+    return tables
+
+def padding_order(columns):
+    """
+    Order columns to minimize alignment padding in PostgreSQL rows:
+    fixed-width columns by decreasing alignment, then variable-length
+    columns. The sort is stable, so declared order is kept within a group.
+    """
+    return sorted(columns, key=lambda column: (column.type.width is None, -column.type.alignment))
+
+class TableSchema:
+    """
+    Declared schema of one table.
+    """
+
+    def __init__(self, name, columns):
+        self.name = name
+        self.columns = padding_order(columns)
+        self.by_name = {column.name: column for column in columns}
+
+    def column_definitions(self):
+        """
+        Column name -> SQL definition, in storage order (as create_table expects).
+        """
+        definitions = {}
+        for column in self.columns:
+            definition = column.type.sql
+            if column.primary_key:
+                definition += " PRIMARY KEY"
+            elif column.not_null:
+                definition += " NOT NULL"
+            definitions[column.name] = definition
+        return definitions
+
+    def coerce_batch(self, records, first_index=0):
+        """
+        Validate and coerce a batch of records in place, one column at a
+        time: each column's values are pulled out, converted with a single
+        map() of the column's coercer, and written back.
+        Raises SchemaValidationError listing the offending values.
+        """
+        errors = []
+        for index, record in enumerate(records, start=first_index):
+            unknown = [key for key in record if key not in self.by_name]
+            if unknown:
+                errors.append(f"record {index}: undeclared column(s) {', '.join(unknown)}")
+
+        for column in self.columns:
+            values = [record.get(column.name, _MISSING) for record in records]
+            coerce = column.type.coerce
+            is_text = column.type is TEXT_TYPE
+
+            def convert(value):
+                if value is _MISSING or value is None or (value == "" and not is_text):
+                    if column.not_null or column.primary_key:
+                        return ValueError("value is required")
+                    return _MISSING if value is _MISSING else None
+                try:
+                    return coerce(value)
+                except (ValueError, TypeError) as e:
+                    return e if isinstance(e, ValueError) else ValueError(str(e))
+
+            for index, (record, converted) in enumerate(zip(records, map(convert, values)), start=first_index):
+                if isinstance(converted, ValueError):
+                    errors.append(f"record {index}, column '{column.name}': {converted}")
+                elif converted is not _MISSING:
+                    record[column.name] = converted
+
+        if errors:
+            more = f" (and {len(errors) - MAX_REPORTED_ERRORS} more)" if len(errors) > MAX_REPORTED_ERRORS else ""
+            raise SchemaValidationError(
+                f"{len(errors)} value(s) in '{self.name}' do not match the declared schema: "
+                + "; ".join(errors[:MAX_REPORTED_ERRORS]) + more
+            )
+        return records
+
+    def coerce_records(self, records, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Lazily validate and coerce a stream of records, batch by batch.
+        """
+        position = 0
+        for batch in iter_batches(records, batch_size):
+            yield from self.coerce_batch(batch, position)
+            position += len(batch)
+
+@lru_cache(maxsize=None)
+def load_registry(path=SCHEMA_FILE):
+    """
+    Parse the schema file once. Returns a dict mapping table name to
+    TableSchema (empty when the file does not exist).
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            source = f.read()
+    except FileNotFoundError:
+        return {}
+    return {name: TableSchema(name, columns) for name, columns in parse_dbml(source).items()}
+
+def declared_schema(table_name, path=SCHEMA_FILE):
+    """
+    Return the TableSchema declared for table_name, or None.
+    """
+    return load_registry(path).get(table_name)
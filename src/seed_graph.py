@@ -0,0 +1,112 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+def referenced_table(column, table_names):
+    """
+    Infer the table a column refers to from its name, or None.
+
+    A column ending with "_id" (other than "id" itself) refers to the table
+    named after its prefix, e.g. "farm_id" -> "farm". Seed tables are named
+    in the plural, so the plural forms are tried as well:
+    "farm_id" -> "farms", "product_category_id" -> "product_categories".
+    """
+    if column == "id" or not column.endswith("_id"):
+        return None
+    base = column[:-3]
+    candidates = [base, base + "s", base + "es"]
+    if base.endswith("y"):
+        candidates.append(base[:-1] + "ies")
+    for candidate in candidates:
+        if candidate in table_names:
+            return candidate
+    return None
+
+def table_dependencies(table_columns):
+    """
+    Build the dependency graph of a set of tables from their *_id columns.
+
+    table_columns maps each table name to its column names. Returns a dict
+    mapping each table to the set of tables it references (self references
+    are ignored, since they do not constrain the load order).
+    """
+    table_names = set(table_columns)
+    dependencies = {}
+    for table, columns in table_columns.items():
+        parents = set()
+        for column in columns:
+            target = referenced_table(column, table_names)
+            if target and target != table:
+                parents.add(target)
+        dependencies[table] = parents
+    return dependencies
+
+def topological_layers(dependencies):
+    """
+    Group tables into layers where every table only depends on tables of
+    earlier layers. Tables within a layer are independent of each other.
+    Raises ValueError if the graph contains a cycle.
+    """
+    remaining = {table: set(parents) & set(dependencies) for table, parents in dependencies.items()}
+    layers = []
+    while remaining:
+        ready = sorted(table for table, parents in remaining.items() if not parents)
+        if not ready:
+            raise ValueError(f"Dependency cycle between tables: {', '.join(sorted(remaining))}")
+        layers.append(ready)
+        for table in ready:
+            del remaining[table]
+        for parents in remaining.values():
+            parents.difference_update(ready)
+    return layers
+
+def run_in_dependency_order(dependencies, task, jobs=1):
+    """
+    Run task(name) for every node of the dependency graph on a pool of at
+    most `jobs` threads. A node starts as soon as all the nodes it depends
+    on have finished successfully; nodes whose dependencies failed are
+    skipped.
+
+    Returns (results, errors, skipped, elapsed) where results maps each
+    finished node to its return value, errors maps failed nodes to their
+    exception, skipped lists nodes that never ran and elapsed is the wall
+    time in seconds.
+    """
+    # Validate the graph up front so a cycle fails before any work starts.
+    topological_layers(dependencies)
+
+    pending = {node: set(parents) & set(dependencies) for node, parents in dependencies.items()}
+    results = {}
+    errors = {}
+    skipped = []
+    running = {}
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        while pending or running:
+            ready = sorted(node for node, parents in pending.items() if not parents)
+            for node in ready:
+                del pending[node]
+                running[executor.submit(task, node)] = node
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                node = running.pop(future)
+                try:
+                    results[node] = future.result()
+                except Exception as e:
+                    errors[node] = e
+                    continue
+                for parents in pending.values():
+                    parents.discard(node)
+
+            # Anything depending on a failed node can never run.
+            blocked = [node for node, parents in pending.items() if parents & (set(errors) | set(skipped))]
+            while blocked:
+                for node in blocked:
+                    del pending[node]
+                    skipped.append(node)
+                blocked = [node for node, parents in pending.items() if parents & (set(errors) | set(skipped))]
+
+    return results, errors, skipped, time.perf_counter() - start
@@ -0,0 +1,241 @@
+import json
+import os
+from itertools import chain
+
+# Seed files are read in chunks of this many characters, so memory use is
+# bounded by the largest single record rather than by the file size.
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# Extensions recognised as seed files. Newline-delimited JSON holds one
+# record per line and can be appended to without rewriting the file.
+JSON_EXTENSIONS = (".json",)
+NDJSON_EXTENSIONS = (".jsonl", ".ndjson")
+SEED_EXTENSIONS = JSON_EXTENSIONS + NDJSON_EXTENSIONS
+
+_WHITESPACE = " \t\n\r"
+
+def is_seed_file(file_name):
+    """
+    Return True if the file name has one of the supported seed extensions.
+    """
+    return file_name.lower().endswith(SEED_EXTENSIONS)
+
+def is_ndjson_file(file_name):
+    """
+    Return True if the file holds newline-delimited JSON.
+    """
+    return file_name.lower().endswith(NDJSON_EXTENSIONS)
+
+def peek_first(records):
+    """
+    Return (first_record, iterator) where the iterator still yields the first
+    record. first_record is None when the iterable is empty.
+    """
+    iterator = iter(records)
+    for first in iterator:
+        return first, chain([first], iterator)
+    return None, iter(())
+
+class StreamingJSONReader:
+    """
+    Minimal incremental JSON reader over a text file object.
+
+    It walks the structural characters of the outer array/object itself and
+    delegates every inner value to json.JSONDecoder.raw_decode, pulling more
+    text from the file whenever a value is cut off by the end of the buffer.
+    """
+
+    def __init__(self, fileobj, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.fileobj = fileobj
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size=None):
+        """
+        Read more text into the buffer, discarding what has been consumed.
+        Returns False once the end of the file has been reached.
+        """
+        if self.eof:
+            return False
+        chunk = self.fileobj.read(size or self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """
+        Skip whitespace and return the next character without consuming it
+        ('' at end of file).
+        """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, chars):
+        """
+        Consume the next non-whitespace character, which must be one of chars.
+        """
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"Expected one of {chars!r} at offset {self.pos}, found {char!r}")
+        self.pos += 1
+        return char
+
+    def read_value(self):
+        """
+        Decode and return the next complete JSON value.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A value ending exactly at the buffer edge may be truncated
+                # (e.g. the number 12 out of 123), so read on before accepting it.
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Grow reads with the pending value so huge records stay linear.
+            self._fill(max(self.chunk_size, len(self.buffer) - self.pos))
+
+    def iter_array(self):
+        """
+        Yield the items of the array starting at the current position.
+        """
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.read_value()
+            if self.expect(",]") == "]":
+                return
+
+    def iter_object_members(self, stream_key=None):
+        """
+        Yield (key, value) pairs of the object starting at the current
+        position. The array stored under stream_key is not materialized:
+        its value is yielded as a generator that must be consumed before
+        iteration continues.
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.read_value()
+            self.expect(":")
+            if key == stream_key and self.peek() == "[":
+                items = self.iter_array()
+                yield key, items
+                # Drain whatever the caller left unread.
+                for _ in items:
+                    pass
+            else:
+                yield key, self.read_value()
+            if self.expect(",}") == "}":
+                return
+
+def _iter_ndjson(seed_file):
+    with open(seed_file, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{seed_file}:{line_number}: {e}") from e
+
+def iter_seed_records(seed_file, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield the records of a table seed file one at a time.
+
+    A .json file may hold an array of records or a single record object;
+    a .jsonl/.ndjson file holds one record per line.
+    """
+    if is_ndjson_file(seed_file):
+        yield from _iter_ndjson(seed_file)
+        return
+
+    with open(seed_file, "r", encoding="utf-8") as f:
+        reader = StreamingJSONReader(f, chunk_size)
+        first_char = reader.peek()
+        if first_char == "[":
+            yield from reader.iter_array()
+        elif first_char:
+            yield reader.read_value()
+
+def read_join_seed(seed_file, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Open a join seed file and return (references, content_records).
+
+    references is the parsed "references" object and content_records an
+    iterator over the "content" array that is only read as it is consumed.
+    In newline-delimited form, the first line holds {"references": {...}}
+    and every following line is a content record.
+    """
+    if is_ndjson_file(seed_file):
+        records = _iter_ndjson(seed_file)
+        header = next(records, None) or {}
+        return header.get("references", {}), records
+
+    # Single pass in the documented layout (references before content).
+    members = _iter_join_members(seed_file, chunk_size)
+    references = {}
+    seen_references = False
+    for key, value in members:
+        if key == "references":
+            references = value
+            seen_references = True
+        elif key == "content":
+            if seen_references:
+                return references, chain(value, _drain(members))
+            # content precedes references: skim the file for the references
+            # without keeping the content, then reopen it for streaming.
+            for _ in value:
+                pass
+            for later_key, later_value in members:
+                if later_key == "references":
+                    references = later_value
+            return references, _iter_join_content(seed_file, chunk_size)
+    return references, iter(())
+
+def _iter_join_members(seed_file, chunk_size):
+    with open(seed_file, "r", encoding="utf-8") as f:
+        reader = StreamingJSONReader(f, chunk_size)
+        yield from reader.iter_object_members(stream_key="content")
+
+def _iter_join_content(seed_file, chunk_size):
+    for key, value in _iter_join_members(seed_file, chunk_size):
+        if key == "content":
+            yield from value
+            return
+
+def _drain(iterator):
+    """
+    Consume the rest of an iterator without yielding anything, so the file
+    behind it is read to the end and closed.
+    """
+    for _ in iterator:
+        pass
+    yield from ()
+
+def seed_table_name(seed_file):
+    """
+    Derive the target table name from a seed file path
+    (e.g. 'table_seeds/farms/farms.json' -> 'farms').
+    """
+    return os.path.splitext(os.path.basename(seed_file))[0]
@@ -0,0 +1,240 @@
+import os
+import sys
+import time
+import argparse
+from sqlalchemy import text
+import upload_seed_tables
+import upload_seed_join_tables
+import add_foreign_keys
+import create_indexes
+import farm_profiles
+from incremental_sync import FILE_MANIFEST_TABLE, RECORD_MANIFEST_TABLE
+from seed_reader import iter_seed_records, read_join_seed, peek_first
+from db_config import get_engine, get_search_path_engine, ConfigurationError
+
+LIVE_SCHEMA = "public"
+# The new dataset is built here while readers keep using the live tables.
+SHADOW_SCHEMA = "reseed_shadow"
+# The replaced tables are moved here by the swap, so the swap can be undone.
+PREVIOUS_SCHEMA = "reseed_previous"
+# The swap gives up instead of queueing behind long-running readers
+# (queued ACCESS EXCLUSIVE requests would block every new reader).
+DEFAULT_LOCK_TIMEOUT = "5s"
+DEFAULT_JOBS = 4
+
+RELATIONS_QUERY = text("""
+    SELECT c.relname, c.relkind
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = :schema AND c.relkind IN ('r', 'p', 'm')
+    ORDER BY c.relname
+""")
+
+def list_relations(conn, schema):
+    """
+    The tables and materialized views of a schema: {name: relkind}.
+    """
+    return dict(conn.execute(RELATIONS_QUERY, {"schema": schema}).fetchall())
+
+def _alter_statement(relkind, schema, name, target_schema):
+    kind = "MATERIALIZED VIEW" if relkind == "m" else "TABLE"
+    return f'ALTER {kind} "{schema}"."{name}" SET SCHEMA "{target_schema}"'
+
+def plan_swap(incoming, live, source=SHADOW_SCHEMA, target=LIVE_SCHEMA, retired=PREVIOUS_SCHEMA):
+    """
+    The statements that replace the live relations with the incoming ones.
+    incoming and live map relation names to relkinds. Live relations that
+    are replaced, and the manifests of the incremental sync (which describe
+    the replaced tables), are moved to the retired schema first. Live
+    relations that are not replaced stay where they are.
+    """
+    statements = []
+    for name, relkind in sorted(live.items()):
+        if name in incoming or name in (FILE_MANIFEST_TABLE, RECORD_MANIFEST_TABLE):
+            statements.append(_alter_statement(relkind, target, name, retired))
+    for name, relkind in sorted(incoming.items()):
+        statements.append(_alter_statement(relkind, source, name, target))
+    return statements
+
+def create_shadow_schema(engine):
+    with engine.begin() as conn:
+        conn.execute(text(f'DROP SCHEMA IF EXISTS "{SHADOW_SCHEMA}" CASCADE'))
+        conn.execute(text(f'CREATE SCHEMA "{SHADOW_SCHEMA}"'))
+
+def analyze_schema(engine, schema):
+    """
+    Collect planner statistics for every table of the schema, so queries
+    are planned well from the first read after the swap.
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name in list_relations(conn, schema):
+            conn.execute(text(f'ANALYZE "{schema}"."{name}"'))
+
+def shadow_problems(seeded, relations, populated):
+    """
+    Why the shadow schema must not go live, as a list of messages (empty
+    when it can). seeded maps each seeded table and join table to whether
+    its seed file has records, relations holds the relations of the shadow
+    schema and populated the tables that have at least one row.
+    """
+    problems = []
+    for name, has_records in sorted(seeded.items()):
+        if name not in relations:
+            # Swapping would leave the old live copy next to the new tables.
+            problems.append(f"table '{name}' is missing")
+        elif has_records and name not in populated:
+            problems.append(f"table '{name}' is empty although its seed file has records")
+    return problems
+
+def seeded_tables():
+    """
+    {table name: whether its seed file has records} for every table and
+    join table seed file.
+    """
+    seeded = {}
+    for seed_file in upload_seed_tables.get_seed_files():
+        first_record, _ = peek_first(iter_seed_records(seed_file))
+        seeded[os.path.splitext(os.path.basename(seed_file))[0]] = first_record is not None
+    for seed_file in upload_seed_join_tables.get_join_seed_files():
+        first_record, _ = peek_first(read_join_seed(seed_file)[1])
+        seeded[os.path.splitext(os.path.basename(seed_file))[0]] = first_record is not None
+    return seeded
+
+def verify_shadow(engine, schema=SHADOW_SCHEMA):
+    """
+    Check that every seeded table exists in the shadow schema and holds
+    rows before it is swapped in. Returns the problems found.
+    """
+    seeded = seeded_tables()
+    with engine.connect() as conn:
+        relations = list_relations(conn, schema)
+        present = sorted(name for name in seeded if name in relations)
+        populated = set()
+        if present:
+            query = " UNION ALL ".join(
+                f"SELECT '{name}' WHERE EXISTS (SELECT 1 FROM \"{schema}\".\"{name}\")" for name in present
+            )
+            populated = {row[0] for row in conn.execute(text(query))}
+    return shadow_problems(seeded, relations, populated)
+
+def swap_schemas(engine, source=SHADOW_SCHEMA, target=LIVE_SCHEMA, retired=PREVIOUS_SCHEMA, lock_timeout=DEFAULT_LOCK_TIMEOUT):
+    """
+    Move the relations of source into target, and the target relations
+    they replace into retired, in one transaction: readers see either the
+    old dataset or the new one, never a partial one. Only catalog entries
+    change, so the exclusive locks are held for milliseconds.
+    Returns the number of relations swapped in.
+    """
+    with engine.begin() as conn:
+        conn.execute(text(f'DROP SCHEMA IF EXISTS "{retired}" CASCADE'))
+        conn.execute(text(f'CREATE SCHEMA "{retired}"'))
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(text("SELECT set_config('lock_timeout', :lock_timeout, true)"), {"lock_timeout": lock_timeout})
+        incoming = list_relations(conn, source)
+        if not incoming:
+            raise RuntimeError(f"Schema '{source}' has no tables to swap in.")
+        for statement in plan_swap(incoming, list_relations(conn, target), source, target, retired):
+            conn.execute(text(statement))
+    print(f"Swapped {len(incoming)} relation(s) from '{source}' into '{target}' in {time.perf_counter() - start:.3f}s.")
+    return len(incoming)
+
+def build_shadow(args):
+    """
+    Load the whole dataset into the shadow schema: bulk load the tables and
+    join tables, then add foreign keys, indexes and the farm profile view,
+    then ANALYZE. Nothing in the live schema is touched.
+    """
+    # While loading, only the shadow schema is visible: a table that is not
+    # created yet must not resolve to its live counterpart.
+    load_engine = get_search_path_engine([SHADOW_SCHEMA], pool_size=args.jobs)
+    # Once every table exists in the shadow schema, the live schema is
+    # appended for the types and functions of extensions installed there
+    # (e.g. PostGIS geography for the spatial index).
+    build_engine = get_search_path_engine([SHADOW_SCHEMA, LIVE_SCHEMA], pool_size=args.jobs)
+    jobs = ["--jobs", str(args.jobs)]
+    stages = (
+        ("seed tables", lambda: upload_seed_tables.main(["--yes"] + jobs, engine=load_engine)),
+        ("join tables", lambda: upload_seed_join_tables.main(["--yes"], engine=load_engine)),
+        ("foreign keys", lambda: add_foreign_keys.main(jobs + ["--schema", SHADOW_SCHEMA], engine=build_engine)),
+        ("indexes", lambda: create_indexes.main(jobs + ["--schema", SHADOW_SCHEMA], engine=build_engine)),
+        ("farm profiles", lambda: farm_profiles.main(["--setup"], engine=build_engine)),
+        ("analyze", lambda: analyze_schema(build_engine, SHADOW_SCHEMA)),
+    )
+    timings = []
+    for name, stage in stages:
+        print(f"\n=== Shadow build: {name} ===")
+        start = time.perf_counter()
+        try:
+            stage()
+        except SystemExit as e:
+            # The loaders exit non-zero when a table or join file was not loaded.
+            if e.code not in (None, 0):
+                print(f"\n❌ Shadow build failed at '{name}'; nothing was swapped in and the live tables are unchanged.")
+                raise
+        timings.append((name, time.perf_counter() - start))
+    print("\nShadow build timings:")
+    for name, seconds in timings:
+        print(f" - {name:<14} {seconds:>8.2f}s")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description=f"Reseed into the '{SHADOW_SCHEMA}' schema, then swap it with '{LIVE_SCHEMA}' in one short transaction."
+    )
+    parser.add_argument("--yes", action="store_true", help="Do not ask for confirmation before the swap.")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS, help="Concurrency of the loaders, validation and indexing.")
+    parser.add_argument("--build-only", action="store_true", help="Build the shadow schema but do not swap it in.")
+    parser.add_argument("--swap-only", action="store_true", help="Swap in a shadow schema built earlier with --build-only.")
+    parser.add_argument("--keep-previous", action="store_true", help=f"Keep the replaced tables in '{PREVIOUS_SCHEMA}' after the swap.")
+    parser.add_argument(
+        "--rollback",
+        action="store_true",
+        help=f"Swap the tables kept in '{PREVIOUS_SCHEMA}' back into '{LIVE_SCHEMA}' (after a run with --keep-previous).",
+    )
+    parser.add_argument("--lock-timeout", default=DEFAULT_LOCK_TIMEOUT, help="Give up the swap if its locks are not granted within this delay.")
+    return parser.parse_args(argv)
+
+def main(argv=None, engine=None):
+    args = parse_args(argv)
+    engine = engine or get_engine()
+
+    if args.rollback:
+        swap_schemas(engine, source=PREVIOUS_SCHEMA, target=LIVE_SCHEMA, retired=SHADOW_SCHEMA, lock_timeout=args.lock_timeout)
+        print(f"✅ Previous dataset restored; the rolled back tables are in '{SHADOW_SCHEMA}'.")
+        return
+
+    if not args.swap_only:
+        create_shadow_schema(engine)
+        build_shadow(args)
+    problems = verify_shadow(engine)
+    if problems:
+        print(f"\n❌ The '{SHADOW_SCHEMA}' schema is incomplete; the live tables were left unchanged:")
+        for problem in problems:
+            print(f" - {problem}")
+        sys.exit(1)
+    if args.build_only:
+        print(f"\n✅ Shadow dataset ready in '{SHADOW_SCHEMA}'; swap it in with --swap-only.")
+        return
+
+    if not args.yes:
+        confirm = input(f"\nSwap the tables of '{SHADOW_SCHEMA}' into '{LIVE_SCHEMA}'? Type 'yes' to confirm: ")
+        if confirm.lower() != "yes":
+            print(f"Swap aborted; the new dataset stays in '{SHADOW_SCHEMA}'.")
+            return
+    swap_schemas(engine, lock_timeout=args.lock_timeout)
+    with engine.begin() as conn:
+        conn.execute(text(f'DROP SCHEMA IF EXISTS "{SHADOW_SCHEMA}" CASCADE'))
+        if not args.keep_previous:
+            conn.execute(text(f'DROP SCHEMA IF EXISTS "{PREVIOUS_SCHEMA}" CASCADE'))
+    # Readers in other processes cache profiles of the replaced view.
+    with engine.begin() as conn:
+        conn.execute(text(f"NOTIFY {farm_profiles.REFRESH_CHANNEL}"))
+    farm_profiles.profile_cache.invalidate()
+    print("\n✅ Reseed complete: the new dataset is live.")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except ConfigurationError as e:
+        print(e)
+        sys.exit(1)
@@ -1,121 +1,137 @@
-import os
 import sys
-from urllib.parse import quote_plus
-from sqlalchemy import create_engine, text
+import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
-from dotenv import load_dotenv
+from catalog import fetch_table_overview
+from load_plan import format_bytes
+from db_config import get_engine, ConfigurationError
 
-# Load environment variables from .env (for local development; in CI use environment variables)
-load_dotenv()
+DEFAULT_SAMPLE_ROWS = 5
+DEFAULT_JOBS = 4
+# TABLESAMPLE SYSTEM picks whole pages, so the sampled fraction aims at this
+# many times the wanted rows; a sample that still comes up short falls back
+# to the first rows of the table.
+SAMPLE_OVERSHOOT = 20
 
-# PostgreSQL credentials
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT")
-DB_NAME = os.getenv("DB_NAME")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-
-if not all([DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD]):
-    print("Missing one or more database credentials in environment variables.")
-    sys.exit(1)
-
-# URL-encode username and password (to handle special characters)
-encoded_user = quote_plus(DB_USER)
-encoded_password = quote_plus(DB_PASSWORD)
-
-# Build SQLAlchemy connection string (with SSL mode if needed)
-connection_string = (
-    f"postgresql+psycopg2://{encoded_user}:{encoded_password}@{DB_HOST}:{DB_PORT}/{DB_NAME}?sslmode=require"
-)
+def sample_percent(estimated_rows, limit):
+    """
+    The TABLESAMPLE SYSTEM percentage that should yield about
+    limit * SAMPLE_OVERSHOOT rows, or None when sampling would read (nearly)
+    the whole table anyway, or the table was never analyzed.
+    """
+    if not estimated_rows:
+        return None
+    percent = 100.0 * limit * SAMPLE_OVERSHOOT / estimated_rows
+    return percent if percent < 100 else None
 
-# Create the SQLAlchemy engine
-engine = create_engine(connection_string)
+def _qualified(schema, table_name):
+    return f'"{schema}"."{table_name}"'
 
-def get_tables(conn):
+def sample_table(conn, schema, table_name, estimated_rows, limit=DEFAULT_SAMPLE_ROWS):
     """
-    Retrieve all table names from the public schema.
+    Retrieve a few rows spread over the table with TABLESAMPLE SYSTEM,
+    which reads only the sampled pages, or the first rows of small tables.
+    Returns a list of dicts.
     """
-    query = text("SELECT table_name FROM information_schema.tables WHERE table_schema = 'public'")
-    try:
-        result = conn.execute(query)
-        return [row[0] for row in result]
-    except SQLAlchemyError as e:
-        print("Error retrieving table list:", e)
-        return []
+    percent = sample_percent(estimated_rows, limit)
+    rows = []
+    if percent is not None:
+        query = text(f"SELECT * FROM {_qualified(schema, table_name)} TABLESAMPLE SYSTEM (:percent) LIMIT {int(limit)}")
+        rows = conn.execute(query, {"percent": percent}).mappings().fetchall()
+    if len(rows) < limit:
+        rows = conn.execute(text(f"SELECT * FROM {_qualified(schema, table_name)} LIMIT {int(limit)}")).mappings().fetchall()
+    return [dict(row) for row in rows]
 
-def get_row_count(conn, table_name):
+def exact_row_count(conn, schema, table_name):
     """
-    Retrieve the number of rows in a given table.
+    Count the rows of a table with a full scan (only with --exact).
     """
-    query = text(f"SELECT COUNT(*) FROM {table_name}")
-    try:
-        result = conn.execute(query)
-        return result.scalar()
-    except SQLAlchemyError as e:
-        print(f"Error retrieving row count for table '{table_name}':", e)
-        return None
+    return conn.execute(text(f"SELECT COUNT(*) FROM {_qualified(schema, table_name)}")).scalar()
 
-def get_columns_info(conn, table_name):
+def inspect_table(engine, schema, table_name, overview, limit, exact):
     """
-    Retrieve column information (name and data type) for a given table from information_schema.
+    Sample (and optionally count) one table on its own pooled connection.
     """
-    query = text("""
-        SELECT column_name, data_type, character_maximum_length
-        FROM information_schema.columns 
-        WHERE table_schema = 'public' AND table_name = :table_name
-        ORDER BY ordinal_position
-    """)
+    report = {
+        "table": table_name,
+        "estimated_rows": overview.estimated_rows,
+        "table_bytes": overview.table_bytes,
+        "index_bytes": overview.index_bytes,
+        "columns": [{"name": name, "type": data_type} for name, data_type in overview.columns],
+    }
     try:
-        result = conn.execute(query, {"table_name": table_name})
-        columns = []
-        for row in result:
-            col_name, data_type, char_max_length = row
-            if char_max_length:
-                data_type += f"({char_max_length})"
-            columns.append((col_name, data_type))
-        return columns
+        with engine.connect() as conn:
+            if exact:
+                report["exact_rows"] = exact_row_count(conn, schema, table_name)
+            report["sample"] = sample_table(conn, schema, table_name, overview.estimated_rows, limit)
     except SQLAlchemyError as e:
-        print(f"Error retrieving columns for table '{table_name}':", e)
-        return None
+        report["error"] = str(e).splitlines()[0]
+    return report
 
-def sample_table(conn, table_name, limit=5):
+def inspect_schema(engine, schema="public", limit=DEFAULT_SAMPLE_ROWS, jobs=DEFAULT_JOBS, exact=False):
     """
-    Retrieve a small sample of rows from the given table.
+    Describe every table of the schema: one catalog query for the names,
+    row estimates, sizes and column types, then the samples (and exact
+    counts) fetched concurrently on jobs connections.
+    Returns a list of per-table dicts, in table name order.
     """
-    query = text(f"SELECT * FROM {table_name} LIMIT {limit}")
-    try:
-        result = conn.execute(query)
-        return result.fetchall()
-    except SQLAlchemyError as e:
-        print(f"Error querying table '{table_name}':", e)
-        return None
-
-def main():
     with engine.connect() as conn:
-        tables = get_tables(conn)
-        if not tables:
-            print("No tables found in the public schema.")
-            sys.exit(0)
-        print("Tables found in the database:")
-        for table in tables:
-            print(f"\nTable: {table}")
-            count = get_row_count(conn, table)
-            if count is not None:
-                print(f"  Row count: {count}")
-            columns_info = get_columns_info(conn, table)
-            if columns_info:
-                print("  Columns:")
-                for col_name, data_type in columns_info:
-                    print(f"    - {col_name}: {data_type}")
-            sample = sample_table(conn, table, limit=5)
-            if sample is None:
-                print("  (Error retrieving sample data)")
-            elif not sample:
-                print("  (No data)")
-            else:
-                print("  Sample rows:")
-                for row in sample:
-                    print("    ", row)
+        overview = fetch_table_overview(conn, schema)
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        return list(executor.map(
+            lambda table_name: inspect_table(engine, schema, table_name, overview[table_name], limit, exact),
+            overview,
+        ))
+
+def print_report(reports, schema):
+    print(f"Tables found in the '{schema}' schema:")
+    for report in reports:
+        print(f"\nTable: {report['table']}")
+        estimate = report["estimated_rows"]
+        line = f"  Rows: about {estimate:,}" if estimate is not None else "  Rows: not estimated yet (never analyzed)"
+        if "exact_rows" in report:
+            line += f" ({report['exact_rows']:,} exactly)"
+        print(line)
+        print(f"  Size: {format_bytes(report['table_bytes'])}, indexes {format_bytes(report['index_bytes'])}")
+        print("  Columns:")
+        for column in report["columns"]:
+            print(f"    - {column['name']}: {column['type']}")
+        if "error" in report:
+            print(f"  (Error retrieving sample data: {report['error']})")
+        elif not report["sample"]:
+            print("  (No data)")
+        else:
+            print("  Sample rows:")
+            for row in report["sample"]:
+                print("    ", tuple(row.values()))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Describe the tables of the database with a few sample rows each.")
+    parser.add_argument("--schema", default="public", help="Schema to inspect.")
+    parser.add_argument("--limit", type=int, default=DEFAULT_SAMPLE_ROWS, help="Sample rows shown per table.")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS, help="Number of tables sampled concurrently.")
+    parser.add_argument("--exact", action="store_true", help="Also count the rows of every table exactly (a full scan per table).")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON (e.g. for a dashboard).")
+    return parser.parse_args(argv)
+
+def main(argv=None, engine=None):
+    args = parse_args(argv)
+    engine = engine or get_engine(pool_size=args.jobs)
+    reports = inspect_schema(engine, args.schema, args.limit, args.jobs, args.exact)
+    if args.json:
+        # Dates, decimals and UUIDs of the samples are written as strings.
+        print(json.dumps({"schema": args.schema, "tables": reports}, indent=2, default=str, ensure_ascii=False))
+        return
+    if not reports:
+        print(f"No tables found in the '{args.schema}' schema.")
+        sys.exit(0)
+    print_report(reports, args.schema)
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    except ConfigurationError as e:
+        print(e)
+        sys.exit(1)
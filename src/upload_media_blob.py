@@ -1,29 +1,45 @@
 import os
+import sys
+import json
+import time
+import argparse
 import mimetypes
-from azure.storage.blob import BlobServiceClient, ContentSettings
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
-
-# Retrieve Azure credentials and container name from environment variables
-account_name = os.getenv("STORAGE_ACCOUNT_NAME")
-account_key = os.getenv("STORAGE_ACCOUNT_KEY")
-container_name = os.getenv("STORAGE_CONTAINER_NAME")
-
-if not account_name or not account_key or not container_name:
-    print("Missing Azure storage credentials in environment variables.")
-    exit(1)
-
-# Build connection string and create a BlobServiceClient
-connect_str = f"DefaultEndpointsProtocol=https;AccountName={account_name};AccountKey={account_key};EndpointSuffix=core.windows.net"
-blob_service_client = BlobServiceClient.from_connection_string(connect_str)
-container_client = blob_service_client.get_container_client(container_name)
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from azure.storage.blob import ContentSettings
+from file_hashing import file_digest
+from db_config import get_container_client, ConfigurationError
+from instrumentation import get_logger, metrics, add_instrumentation_arguments, instrumented
+from resilience import retry
+from image_derivatives import (
+    build_image_derivatives,
+    LOCAL_DERIVATIVES_ROOT,
+    REMOTE_DERIVATIVES_ROOT,
+    DERIVATIVE_CACHE_CONTROL,
+    DEFAULT_WIDTHS,
+)
+from video_renditions import build_video_renditions, DEFAULT_CONCURRENCY
+from block_upload import (
+    upload_large_file,
+    DEFAULT_LARGE_FILE_THRESHOLD,
+    DEFAULT_BLOCK_SIZE,
+    DEFAULT_MAX_CONCURRENCY,
+)
 
 # Local media root and remote base folder (here we want to mirror the structure under 'media/')
 LOCAL_MEDIA_ROOT = "media"
 REMOTE_MEDIA_ROOT = "media"  # Upload preserving the local folder structure
 
+# Number of files uploaded concurrently
+DEFAULT_WORKERS = 8
+
+# Local journal of uploaded files (one JSON object per line). It caches each
+# file's MD5 by size and modification time, so an interrupted run resumes
+# without re-hashing or re-sending what was already uploaded.
+UPLOAD_MANIFEST_PATH = ".media_upload_manifest.jsonl"
+
+log = get_logger("upload_media_blob")
+
 # Optional: A mapping of file extensions to content types (if not set by mimetypes)
 CONTENT_TYPE_MAP = {
     ".jpg": "image/jpeg",
@@ -39,27 +55,323 @@ def get_content_type(file_path):
     # Use our mapping first, then fallback to mimetypes
     return CONTENT_TYPE_MAP.get(ext, mimetypes.guess_type(file_path)[0] or "application/octet-stream")
 
-def upload_media_files():
-    for root, dirs, files in os.walk(LOCAL_MEDIA_ROOT):
+def iter_local_files(local_root, remote_root):
+    """
+    Yield (local_file_path, blob_path) for every file under local_root.
+    """
+    for root, dirs, files in os.walk(local_root):
         for file in files:
             local_file_path = os.path.join(root, file)
             # Compute the relative path from the media root and use it for the blob path
-            rel_path = os.path.relpath(local_file_path, LOCAL_MEDIA_ROOT)
+            rel_path = os.path.relpath(local_file_path, local_root)
             # Normalize path separator to forward slashes for blob storage
-            blob_path = os.path.join(REMOTE_MEDIA_ROOT, rel_path).replace(os.sep, "/")
+            blob_path = os.path.join(remote_root, rel_path).replace(os.sep, "/")
+            yield local_file_path, blob_path
+
+def list_remote_blobs(prefix):
+    """
+    List every blob under prefix in a single paged listing.
+    Returns a dict mapping blob name to (size, content_md5 bytes or None).
+    """
+    remote = {}
+    for blob in get_container_client().list_blobs(name_starts_with=prefix):
+        md5 = blob.content_settings.content_md5 if blob.content_settings else None
+        remote[blob.name] = (blob.size, bytes(md5) if md5 else None)
+    return remote
+
+class UploadManifest:
+    """
+    Append-only local journal of uploaded files, safe to share between threads.
+    Compacted on load to one line per file, so it does not grow with every run.
+    """
+
+    def __init__(self, path=UPLOAD_MANIFEST_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        if not os.path.exists(path):
+            return
+        lines = 0
+        line = "\n"
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                lines += 1
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A run killed mid-write leaves a truncated last line.
+                    continue
+                self.entries[entry["blob_path"]] = entry
+        # Appending after an unterminated line would corrupt the next entry.
+        if lines > len(self.entries) or not line.endswith("\n"):
+            self.compact()
+
+    def compact(self):
+        """
+        Rewrite the journal with the latest entry of each file, dropping
+        superseded and truncated lines.
+        """
+        tmp_path = self.path + ".tmp"
+        with self.lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for entry in self.entries.values():
+                    f.write(json.dumps(entry) + "\n")
+            os.replace(tmp_path, self.path)
+
+    def cached_md5(self, blob_path, stat):
+        """
+        Return the MD5 recorded for blob_path if the local file has not
+        changed since (same size and modification time), else None.
+        """
+        entry = self.entries.get(blob_path)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return bytes.fromhex(entry["md5"])
+        return None
+
+    def is_uploaded(self, blob_path, md5):
+        entry = self.entries.get(blob_path)
+        return bool(entry and entry.get("uploaded") and entry["md5"] == md5.hex())
+
+    def record(self, blob_path, stat, md5, uploaded):
+        entry = {
+            "blob_path": blob_path,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "md5": md5.hex(),
+            "uploaded": uploaded,
+        }
+        with self.lock:
+            self.entries[blob_path] = entry
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+def get_content_settings(file_path, cache_control=None):
+    return ContentSettings(content_type=get_content_type(file_path), cache_control=cache_control)
+
+def upload_blob_file(local_file_path, blob_path, md5, content_settings=None, large_file_options=None):
+    """
+    Upload one file, storing its MD5 so later runs can skip it unchanged.
+    Files above the large-file threshold (hero videos, documentaries) are
+    staged as parallel blocks instead of a single request.
+    """
+    options = large_file_options or {}
+    settings = content_settings or get_content_settings(local_file_path)
+    settings.content_md5 = bytearray(md5)
+    if os.path.getsize(local_file_path) >= options.get("threshold", DEFAULT_LARGE_FILE_THRESHOLD):
+        upload_large_file(
+            get_container_client().get_blob_client(blob_path),
+            local_file_path,
+            md5,
+            settings,
+            block_size=options.get("block_size", DEFAULT_BLOCK_SIZE),
+            max_concurrency=options.get("max_concurrency", DEFAULT_MAX_CONCURRENCY),
+        )
+        return
+    with open(local_file_path, "rb") as data:
+        get_container_client().upload_blob(
+            name=blob_path,
+            data=data,
+            overwrite=True,
+            content_settings=settings
+        )
+
+def sync_file(local_file_path, blob_path, remote, manifest, content_settings=None, large_file_options=None):
+    """
+    Upload a file unless the container already holds identical content.
+    Returns (uploaded, size_in_bytes).
+    """
+    stat = os.stat(local_file_path)
+    md5 = manifest.cached_md5(blob_path, stat) or file_digest(local_file_path, "md5").digest()
+
+    remote_size, remote_md5 = remote.get(blob_path, (None, None))
+    unchanged = remote_md5 == md5 if remote_md5 else (
+        # Blobs committed without an MD5 are trusted if this machine uploaded them.
+        remote_size == stat.st_size and manifest.is_uploaded(blob_path, md5)
+    )
+    if unchanged:
+        if manifest.cached_md5(blob_path, stat) is None:
+            manifest.record(blob_path, stat, md5, uploaded=True)
+        return False, stat.st_size
+
+    # On top of the SDK's per-request retries, a file whose upload still
+    # fails transiently (throttling, a dropped connection) is sent again.
+    retry(
+        lambda: upload_blob_file(local_file_path, blob_path, md5, content_settings, large_file_options),
+        f"Uploading {local_file_path} to {blob_path}",
+    )
+    manifest.record(blob_path, stat, md5, uploaded=True)
+    return True, stat.st_size
+
+def upload_tree(local_root, remote_root, workers=DEFAULT_WORKERS, manifest_path=UPLOAD_MANIFEST_PATH,
+                large_file_options=None, cache_control=None):
+    """
+    Mirror local_root into the container under remote_root using a pool of
+    worker threads, skipping files whose content already matches.
+    large_file_options may set "threshold", "block_size" and
+    "max_concurrency" for the block upload of large files; cache_control
+    sets the Cache-Control header of every uploaded blob.
+    Returns a dict with counts, bytes and throughput.
+    """
+    start = time.perf_counter()
+    remote = list_remote_blobs(remote_root.rstrip("/") + "/")
+    manifest = UploadManifest(manifest_path)
+
+    uploaded = skipped = failed = 0
+    uploaded_bytes = 0
+    with metrics.span("upload_tree", root=remote_root), ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {}
+        for local_file_path, blob_path in iter_local_files(local_root, remote_root):
+            content_settings = get_content_settings(local_file_path, cache_control)
+            future = executor.submit(sync_file, local_file_path, blob_path, remote, manifest, content_settings, large_file_options)
+            futures[future] = (local_file_path, blob_path)
+        for future in as_completed(futures):
+            local_file_path, blob_path = futures[future]
+            try:
+                was_uploaded, size = future.result()
+            except Exception as e:
+                failed += 1
+                log.error(f"Error uploading {local_file_path} to {blob_path}: {e}")
+                continue
+            if was_uploaded:
+                uploaded += 1
+                uploaded_bytes += size
+                log.debug(f"Uploaded {local_file_path} to {blob_path}")
+            else:
+                skipped += 1
+
+    metrics.increment("files_uploaded", uploaded)
+    metrics.increment("files_skipped", skipped)
+    metrics.increment("files_failed", failed)
+    metrics.increment("bytes_uploaded", uploaded_bytes)
+
+    elapsed = time.perf_counter() - start
+    mb_per_second = uploaded_bytes / (1024 * 1024) / elapsed if elapsed > 0 else 0.0
+    print(
+        f"{uploaded} file(s) uploaded ({uploaded_bytes / (1024 * 1024):.1f} MB) in {elapsed:.2f}s "
+        f"({mb_per_second:.2f} MB/s), {skipped} unchanged file(s) skipped"
+        + (f", {failed} failed." if failed else ".")
+    )
+    return {
+        "uploaded": uploaded,
+        "skipped": skipped,
+        "failed": failed,
+        "bytes": uploaded_bytes,
+        "seconds": elapsed,
+        "mb_per_second": mb_per_second,
+    }
+
+def upload_media_files(workers=DEFAULT_WORKERS, large_file_options=None):
+    stats = upload_tree(LOCAL_MEDIA_ROOT, REMOTE_MEDIA_ROOT, workers=workers, large_file_options=large_file_options)
+    if stats["failed"]:
+        print(f"Upload finished with {stats['failed']} failure(s); rerun to resume.")
+    else:
+        print("✅ Upload complete.")
+    return stats
+
+def prepare_derivatives(derivative_options=None, rendition_options=None):
+    """
+    Media preprocessing stage, run before the upload: resized photo
+    derivatives and/or web video renditions with posters, each skipped
+    when its options are None.
+    """
+    if rendition_options is not None:
+        build_video_renditions(**rendition_options)
+    if derivative_options is not None:
+        build_image_derivatives(**derivative_options)
+
+def upload_derivatives(workers=DEFAULT_WORKERS, large_file_options=None):
+    """
+    Upload the prepared derivatives under their own prefix with long-lived
+    cache headers.
+    """
+    return upload_tree(
+        LOCAL_DERIVATIVES_ROOT,
+        REMOTE_DERIVATIVES_ROOT,
+        workers=workers,
+        large_file_options=large_file_options,
+        cache_control=DERIVATIVE_CACHE_CONTROL,
+    )
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Upload the local media folder to Azure Blob Storage.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help="Number of files uploaded concurrently.",
+    )
+    parser.add_argument(
+        "--large-file-threshold-mb",
+        type=int,
+        default=DEFAULT_LARGE_FILE_THRESHOLD // (1024 * 1024),
+        help="Files of at least this size (MB) are uploaded as parallel staged blocks.",
+    )
+    parser.add_argument(
+        "--block-size-mb",
+        type=int,
+        default=DEFAULT_BLOCK_SIZE // (1024 * 1024),
+        help="Size of each staged block (MB) for large files.",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=DEFAULT_MAX_CONCURRENCY,
+        help="Number of blocks of one large file staged concurrently.",
+    )
+    parser.add_argument(
+        "--derivatives",
+        action="store_true",
+        help="Also generate resized WebP derivatives of the photos and upload them under 'derivatives/'.",
+    )
+    parser.add_argument(
+        "--derivative-widths",
+        default=",".join(str(width) for width in DEFAULT_WIDTHS),
+        help="Comma-separated derivative widths in pixels.",
+    )
+    parser.add_argument(
+        "--transcode",
+        action="store_true",
+        help="Also transcode hero videos and documentaries to web renditions with posters (requires ffmpeg) and upload them under 'derivatives/'.",
+    )
+    parser.add_argument(
+        "--transcode-concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help="Number of ffmpeg jobs run at once.",
+    )
+    add_instrumentation_arguments(parser)
+    return parser.parse_args(argv)
 
-            content_type = get_content_type(local_file_path)
-            print(f"Uploading {local_file_path} to {blob_path} with content type '{content_type}'...")
+def large_file_options_from_args(args):
+    return {
+        "threshold": args.large_file_threshold_mb * 1024 * 1024,
+        "block_size": args.block_size_mb * 1024 * 1024,
+        "max_concurrency": args.max_concurrency,
+    }
 
-            with open(local_file_path, "rb") as data:
-                container_client.upload_blob(
-                    name=blob_path,
-                    data=data,
-                    overwrite=True,
-                    content_settings=ContentSettings(content_type=content_type)
-                )
+def run(args):
+    # Fail on missing credentials before any derivative is rendered.
+    get_container_client()
+    large_file_options = large_file_options_from_args(args)
+    derivative_options = None
+    rendition_options = None
+    if args.derivatives:
+        derivative_options = {"widths": [int(width) for width in args.derivative_widths.split(",") if width]}
+    if args.transcode:
+        rendition_options = {"concurrency": args.transcode_concurrency}
+    prepare_derivatives(derivative_options, rendition_options)
+    upload_media_files(workers=args.workers, large_file_options=large_file_options)
+    if args.derivatives or args.transcode:
+        upload_derivatives(workers=args.workers, large_file_options=large_file_options)
 
-    print("✅ Upload complete.")
+def main(argv=None):
+    args = parse_args(argv)
+    with instrumented(args, "upload_media_blob"):
+        run(args)
 
 if __name__ == "__main__":
-    upload_media_files()
+    try:
+        main()
+    except ConfigurationError as e:
+        print(e)
+        sys.exit(1)
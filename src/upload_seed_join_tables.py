@@ -1,48 +1,31 @@
 import os
 import sys
-import json
-from urllib.parse import quote_plus
-from sqlalchemy import create_engine, text
+import argparse
+from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
-from dotenv import load_dotenv
-
-# --- Load environment variables ---
-load_dotenv()  # For local development; in CI, use environment variables directly
-
-# PostgreSQL credentials
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT")
-DB_NAME = os.getenv("DB_NAME")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-
-if not all([DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD]):
-    print("Missing one or more database credentials in environment variables.")
-    sys.exit(1)
-
-# URL-encode username and password
-encoded_user = quote_plus(DB_USER)
-encoded_password = quote_plus(DB_PASSWORD)
-
-# Build SQLAlchemy connection string (with SSL mode if needed)
-connection_string = (
-    f"postgresql+psycopg2://{encoded_user}:{encoded_password}@{DB_HOST}:{DB_PORT}/{DB_NAME}?sslmode=require"
-)
-
-# Create the SQLAlchemy engine
-engine = create_engine(connection_string)
+from bulk_loader import bulk_load, LOAD_MODES, DEFAULT_LOAD_MODE, DEFAULT_BATCH_SIZE
+from incremental_sync import sync_table, clear_manifest
+from seed_reader import read_join_seed, is_seed_file, peek_first
+from catalog import fetch_row_estimates
+from db_config import get_engine, ConfigurationError
+from instrumentation import get_logger, metrics, add_instrumentation_arguments, instrumented
+from resilience import retry
+from farm_profiles import refresh_farm_profiles
+from product_hierarchy import sync_product_closure, EDGES_TABLE as PRODUCT_EDGES_TABLE
 
 # Folder containing join table seed files
 JOIN_SEEDS_ROOT = "join_table_seeds"
 
+log = get_logger("upload_seed_join_tables")
+
 def get_join_seed_files():
     """
-    Recursively gather all JSON join table seed files in the JOIN_SEEDS_ROOT.
+    Recursively gather all JSON / NDJSON join table seed files in the JOIN_SEEDS_ROOT.
     """
     seed_files = []
     for root, _, files in os.walk(JOIN_SEEDS_ROOT):
         for file in files:
-            if file.endswith(".json"):
+            if is_seed_file(file):
                 seed_files.append(os.path.join(root, file))
     return seed_files
 
@@ -52,22 +35,17 @@ def table_exists(conn, table_name):
     """
     return conn.dialect.has_table(conn, table_name)
 
-def infer_join_table_schema(join_seed):
+def infer_join_table_schema(references, first_record):
     """
-    Given a parsed join seed JSON (dictionary), infer the join table schema.
-    Assumes that the "content" key is a list with at least one element.
+    Given the "references" object of a join seed and the first record of its
+    "content" array, infer the join table schema.
     Returns:
        - columns: a list of column names (from the first row in "content")
        - schema_sql: a string with the column definitions (all as INTEGER)
        - fk_constraints: a list of SQL fragments for foreign key constraints,
          built using the "references" object.
     """
-    content = join_seed.get("content", [])
-    if not content:
-        return None, None, None
-
     # Use the first record to get the column names.
-    first_record = content[0]
     if not isinstance(first_record, dict):
         return None, None, None
     columns = list(first_record.keys())
@@ -76,7 +54,7 @@ def infer_join_table_schema(join_seed):
     schema_sql = ", ".join(f"{col} INTEGER" for col in columns)
     
     # Build foreign key constraints from the "references" dictionary.
-    refs = join_seed.get("references", {})
+    refs = references or {}
     fk_constraints = []
     # Expecting keys: "column_1_reference_table", "column_2_reference_table",
     # "column_1_reference_key", "column_2_reference_key"
@@ -87,7 +65,7 @@ def infer_join_table_schema(join_seed):
         ref_key1 = refs.get("column_1_reference_key")
         ref_table2 = refs.get("column_2_reference_table")
         ref_key2 = refs.get("column_2_reference_key")
-        print(f"Debug: For join table, inferred references: {ref_table1}({ref_key1}), {ref_table2}({ref_key2})")
+        log.debug(f"For join table, inferred references: {ref_table1}({ref_key1}), {ref_table2}({ref_key2})")
         if ref_table1 and ref_key1:
             fk_constraints.append(f"FOREIGN KEY ({col1}) REFERENCES {ref_table1}({ref_key1}) ON DELETE CASCADE")
         if ref_table2 and ref_key2:
@@ -113,119 +91,159 @@ def create_join_table(conn, table_name, schema_sql, fk_constraints, columns):
     except SQLAlchemyError as e:
         print(f"Error creating join table '{table_name}': {e}")
 
-def print_current_join_table_info(conn, table_name):
+def print_current_join_table_info(table_name, existing_rows):
     """
-    Print information about an existing join table: row count.
+    Print information about an existing join table: its estimated row count
+    (existing_rows maps existing tables to pg_class estimates).
     """
-    if table_exists(conn, table_name):
-        try:
-            result = conn.execute(text(f"SELECT COUNT(*) FROM {table_name}"))
-            count = result.scalar()
-            print(f"Join table '{table_name}' exists and currently contains {count} row(s).")
-        except SQLAlchemyError as e:
-            print(f"Error fetching row count for join table '{table_name}': {e}")
-    else:
+    if table_name not in existing_rows:
         print(f"Join table '{table_name}' does not exist.")
+    elif existing_rows[table_name] is None:
+        print(f"Join table '{table_name}' exists (row count not estimated yet).")
+    else:
+        print(f"Join table '{table_name}' exists and currently contains about {existing_rows[table_name]} row(s).")
 
-def process_join_seed_file(seed_file):
+def process_join_seed_file(engine, seed_file, mode=DEFAULT_LOAD_MODE, batch_size=DEFAULT_BATCH_SIZE, incremental=False, assume_yes=False):
     """
     Process a single join table seed file:
-      - Parse JSON
+      - Stream the JSON (only the references and first record are read up front)
       - Determine join table name (from filename)
-      - Print current content info
       - If table does not exist, create it using inferred schema from the JSON file
-      - Delete existing data (after consent)
-      - Insert the rows from "content"
+      - Delete existing data (after consent, unless assume_yes)
+      - Insert the rows from "content" in batches
+    In incremental mode, nothing is deleted up front: join records are keyed
+    by their composite key and only new records are inserted and vanished
+    ones deleted.
+    Loading the product edges also syncs the product closure table in the
+    same transaction, so an edge change that introduces a cycle is rolled back.
+    A transient failure (e.g. a dropped connection) rolls the transaction
+    back and it is retried, streaming the seed file again; other failures
+    (an unreadable or malformed file, a database error) are raised.
     """
     table_name = os.path.splitext(os.path.basename(seed_file))[0]
     print(f"\nProcessing join seed file for table '{table_name}' from {seed_file} ...")
     
-    # Load the JSON
-    try:
-        with open(seed_file, "r", encoding="utf-8") as f:
-            join_seed = json.load(f)
-    except Exception as e:
-        print(f"Error reading JSON from {seed_file}: {e}")
-        return
-    
-    # Print current join table info
-    with engine.connect() as conn:
-        print_current_join_table_info(conn, table_name)
+    # Open the JSON as a stream
+    references, content = read_join_seed(seed_file)
+    first_record, _ = peek_first(content)
     
     # Infer join table schema from the JSON content
-    columns, schema_sql, fk_constraints = infer_join_table_schema(join_seed)
+    columns, schema_sql, fk_constraints = infer_join_table_schema(references, first_record)
     if not columns:
-        print(f"Could not infer schema for join table from {seed_file}. Skipping.")
-        return
+        raise ValueError(f"Could not infer schema for join table from {seed_file}")
     
     # Ask for confirmation before deleting existing content and/or creating table
-    confirm = input(f"\nWARNING: This will DELETE all existing data in join table '{table_name}' (and create it if it doesn't exist). Type 'yes' to confirm: ")
+    if assume_yes:
+        confirm = "yes"
+    elif incremental:
+        confirm = input(f"\nWARNING: This will INSERT new records and DELETE records removed from the seed in join table '{table_name}' (and create it if it doesn't exist). Type 'yes' to confirm: ")
+    else:
+        confirm = input(f"\nWARNING: This will DELETE all existing data in join table '{table_name}' (and create it if it doesn't exist). Type 'yes' to confirm: ")
     if confirm.lower() != "yes":
         print("Operation aborted for this join seed file.")
         return
     
     # Process join table in its own transaction
-    with engine.begin() as conn:
-        # Create the join table if it doesn't exist
-        if not table_exists(conn, table_name):
-            create_join_table(conn, table_name, schema_sql, fk_constraints, columns)
-        
-        # Delete existing data from the join table
-        try:
-            result = conn.execute(text(f"DELETE FROM {table_name}"))
-            deleted_count = result.rowcount
-            if deleted_count == 0:
-                print(f"Info: Join table '{table_name}' was already empty.")
+    def load_once(content):
+        with engine.begin() as conn:
+            # Create the join table if it doesn't exist
+            if not table_exists(conn, table_name):
+                create_join_table(conn, table_name, schema_sql, fk_constraints, columns)
+            
+            if incremental:
+                # The composite primary key of the join table is the record key.
+                sync_table(conn, table_name, seed_file, content, columns, batch_size=batch_size)
             else:
-                print(f"Deleted {deleted_count} row(s) from join table '{table_name}'.")
-        except SQLAlchemyError as e:
-            print(f"Error deleting data from join table '{table_name}': {e}")
-            return
-        
-        # Insert new join records
-        content = join_seed.get("content", [])
-        if not isinstance(content, list):
-            print(f"Join seed file {seed_file} has invalid 'content' format. Skipping.")
-            return
-        
-        for record in content:
-            if not isinstance(record, dict):
-                print(f"Skipping invalid join record in {seed_file}: {record}")
-                continue
-            # Build insert query dynamically (assume all keys in record are join columns)
-            cols = ", ".join(record.keys())
-            placeholders = ", ".join(f":{col}" for col in record.keys())
-            query = text(f"INSERT INTO {table_name} ({cols}) VALUES ({placeholders})")
-            print(f"Inserting into '{table_name}': {record}")
-            print(f"Using query: INSERT INTO {table_name} ({cols}) VALUES ({placeholders})")
-            try:
-                # Pass the record as a dictionary directly (do not use unpacking)
-                conn.execute(query, record)
-            except SQLAlchemyError as e:
-                print(f"Error inserting join record into '{table_name}': {e}")
-                print(f"Failed join record: {record}")
-
-def main():
+                # Delete existing data from the join table
+                result = conn.execute(text(f"DELETE FROM {table_name}"))
+                deleted_count = result.rowcount
+                if deleted_count == 0:
+                    print(f"Info: Join table '{table_name}' was already empty.")
+                else:
+                    print(f"Deleted {deleted_count} row(s) from join table '{table_name}'.")
+                # The manifest no longer describes the table's content.
+                clear_manifest(conn, table_name)
+
+                # Insert new join records; a malformed file raises here and the
+                # surrounding transaction is rolled back.
+                bulk_load(conn, table_name, content, mode=mode, batch_size=batch_size)
+
+            if table_name == PRODUCT_EDGES_TABLE:
+                sync_product_closure(conn)
+
+    # An attempt consumes the stream, so each attempt reads the file again.
+    retry(lambda: load_once(read_join_seed(seed_file)[1]), f"Loading join table '{table_name}'")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Create and populate join tables from the JSON files in join_table_seeds.")
+    parser.add_argument(
+        "--mode",
+        choices=LOAD_MODES,
+        default=DEFAULT_LOAD_MODE,
+        help="How rows are sent to PostgreSQL: COPY FROM STDIN, batched multi-row INSERTs, or one INSERT per row.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="Number of records sent per COPY/INSERT batch.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only insert join records that are new since the last sync and delete the ones removed from the seeds.",
+    )
+    parser.add_argument(
+        "--yes",
+        action="store_true",
+        help="Do not ask for confirmation before reinitializing each join table.",
+    )
+    add_instrumentation_arguments(parser)
+    return parser.parse_args(argv)
+
+def run(args, engine=None):
+    engine = engine or get_engine()
     join_seed_files = get_join_seed_files()
     if not join_seed_files:
         print("No join seed files found in the folder:", JOIN_SEEDS_ROOT)
         sys.exit(0)
     
     print("The following join tables will be reinitialized with seed data:")
-    for seed_file in join_seed_files:
-        table_name = os.path.splitext(os.path.basename(seed_file))[0]
-        with engine.connect() as conn:
-            print(" -", table_name)
-            print_current_join_table_info(conn, table_name)
+    table_names = [os.path.splitext(os.path.basename(seed_file))[0] for seed_file in join_seed_files]
+    with engine.connect() as conn:
+        existing_rows = fetch_row_estimates(conn, table_names)
+    for table_name in table_names:
+        print(" -", table_name)
+        print_current_join_table_info(table_name, existing_rows)
     
     # Process each join seed file individually
+    failed = []
     for seed_file in join_seed_files:
         try:
-            process_join_seed_file(seed_file)
+            with metrics.span("load_join_table", seed_file=seed_file):
+                process_join_seed_file(
+                    engine, seed_file, mode=args.mode, batch_size=args.batch_size, incremental=args.incremental, assume_yes=args.yes
+                )
         except Exception as e:
+            metrics.increment("errors")
+            failed.append(seed_file)
             print(f"Error processing join seed file {seed_file}: {e}\nRolling back and continuing with the next file.")
     
+    if failed:
+        # A non-zero exit keeps the steps that build on these tables from running.
+        print(f"\n❌ {len(failed)} join seed file(s) were not loaded: {', '.join(failed)}.")
+        sys.exit(1)
+    refresh_farm_profiles(engine)
     print("\n✅ Join table seed data loaded successfully into the remote database.")
 
+def main(argv=None, engine=None):
+    args = parse_args(argv)
+    with instrumented(args, "upload_seed_join_tables"):
+        run(args, engine)
+
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    except ConfigurationError as e:
+        print(e)
+        sys.exit(1)
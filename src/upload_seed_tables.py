@@ -1,48 +1,36 @@
 import os
 import sys
-import json
-from urllib.parse import quote_plus
-from sqlalchemy import create_engine, text
+import time
+import argparse
+import psycopg2
+from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
-from dotenv import load_dotenv
-
-# --- Load environment variables ---
-load_dotenv()  # For local development; in CI, use environment variables directly
-
-# PostgreSQL credentials
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT")
-DB_NAME = os.getenv("DB_NAME")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-
-if not all([DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD]):
-    print("Missing one or more database credentials in environment variables.")
-    sys.exit(1)
-
-# URL-encode username and password in case of special characters
-encoded_user = quote_plus(DB_USER)
-encoded_password = quote_plus(DB_PASSWORD)
-
-# Build SQLAlchemy connection string (with SSL mode required by Azure)
-connection_string = (
-    f"postgresql+psycopg2://{encoded_user}:{encoded_password}@{DB_HOST}:{DB_PORT}/{DB_NAME}?sslmode=require"
-)
-
-# Create the SQLAlchemy engine
-engine = create_engine(connection_string)
+from bulk_loader import bulk_load, LOAD_MODES, DEFAULT_LOAD_MODE, DEFAULT_BATCH_SIZE
+from seed_reader import iter_seed_records, is_seed_file, peek_first
+from incremental_sync import sync_table, clear_manifest, ensure_manifest_tables
+from seed_graph import table_dependencies, topological_layers, run_in_dependency_order
+from schema_registry import declared_schema
+from catalog import fetch_row_estimates
+from load_plan import run_plan
+from upload_seed_join_tables import get_join_seed_files
+from farm_profiles import refresh_farm_profiles
+from workload_rollups import refresh_workload_rollups, refresh_farm_totals, affected_farmers, WORKLOADS_TABLE, FARMERS_TABLE
+from db_config import get_engine, ConfigurationError
+from instrumentation import metrics, add_instrumentation_arguments, instrumented
+from resilience import retry, is_transient, CheckpointJournal, SEED_LOAD_JOURNAL_PATH
+from file_hashing import file_sha256
 
 # Folder containing seed files
 SEEDS_ROOT = "table_seeds"
 
 def get_seed_files():
     """
-    Recursively gather all JSON seed files in the SEEDS_ROOT.
+    Recursively gather all JSON / NDJSON seed files in the SEEDS_ROOT.
     """
     seed_files = []
     for root, _, files in os.walk(SEEDS_ROOT):
         for file in files:
-            if file.endswith(".json"):
+            if is_seed_file(file):
                 seed_files.append(os.path.join(root, file))
     return seed_files
 
@@ -84,26 +72,11 @@ def infer_sql_type(key, value):
         else:
             return "TEXT"
 
-def infer_table_schema(seed_file):
+def infer_record_schema(record):
     """
-    Reads the first record from the seed file and infers a schema.
+    Infer a schema from a single representative record.
     Returns a dict mapping column names to SQL type definitions.
     """
-    try:
-        with open(seed_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    except Exception as e:
-        print(f"Error reading JSON from {seed_file}: {e}")
-        return {}
-    
-    # Get a representative record
-    if isinstance(data, list) and data:
-        record = data[0]
-    elif isinstance(data, dict):
-        record = data
-    else:
-        return {}
-    
     if not isinstance(record, dict):
         return {}
     
@@ -112,21 +85,41 @@ def infer_table_schema(seed_file):
         schema[key] = infer_sql_type(key, value)
     return schema
 
-def print_current_table_info(conn, table_name, seed_file):
+def infer_table_schema(seed_file):
     """
-    Print whether the table exists; if it does, print its row count.
-    If it doesn't, print the inferred schema from the seed file.
+    Reads the first record from the seed file and infers a schema.
+    Only the first record is parsed; the rest of the file is not read.
+    Returns a dict mapping column names to SQL type definitions.
+    Used for tables that are not declared in the schema registry.
     """
-    if table_exists(conn, table_name):
-        try:
-            result = conn.execute(text(f"SELECT COUNT(*) FROM {table_name}"))
-            count = result.scalar()
-            print(f"Table '{table_name}' exists and currently contains {count} row(s).")
-        except SQLAlchemyError as e:
-            print(f"Error fetching row count for table '{table_name}': {e}")
+    try:
+        record, _ = peek_first(iter_seed_records(seed_file))
+    except Exception as e:
+        print(f"Error reading JSON from {seed_file}: {e}")
+        return {}
+    return infer_record_schema(record)
+
+def print_current_table_info(table_name, seed_file, existing_rows):
+    """
+    Print whether the table exists; if it does, print its estimated row
+    count (existing_rows maps existing tables to pg_class estimates, see
+    catalog.fetch_row_estimates). If it doesn't, print the schema it will
+    be created with.
+    """
+    if table_name in existing_rows:
+        count = existing_rows[table_name]
+        if count is None:
+            print(f"Table '{table_name}' exists (row count not estimated yet).")
+        else:
+            print(f"Table '{table_name}' exists and currently contains about {count} row(s).")
     else:
         print(f"Table '{table_name}' does not exist.")
-        inferred_schema = infer_table_schema(seed_file)
+        table_schema = declared_schema(table_name)
+        if table_schema:
+            inferred_schema = table_schema.column_definitions()
+        else:
+            print(f"  Table '{table_name}' is not declared in the schema registry; its types are inferred from the first record.")
+            inferred_schema = infer_table_schema(seed_file)
         if inferred_schema:
             cols = ", ".join(f"{col} {col_type}" for col, col_type in inferred_schema.items())
             print(f"  It will be created with the following schema: {cols}")
@@ -146,102 +139,344 @@ def create_table(conn, table_name, schema):
     except SQLAlchemyError as e:
         print(f"Error creating table '{table_name}': {e}")
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Create and populate tables from the JSON files in table_seeds.")
+    parser.add_argument(
+        "--mode",
+        choices=LOAD_MODES,
+        default=DEFAULT_LOAD_MODE,
+        help="How rows are sent to PostgreSQL: COPY FROM STDIN, batched multi-row INSERTs, or one INSERT per row.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="Number of records sent per COPY/INSERT batch.",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of tables loaded concurrently, each in its own transaction (1 = single transaction, sequential).",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only upsert records that changed since the last sync and delete the ones removed from the seeds, instead of deleting and reloading every table.",
+    )
+    parser.add_argument(
+        "--yes",
+        action="store_true",
+        help="Do not ask for confirmation before reinitializing the tables.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help=f"Commit each table on its own and skip the tables an interrupted run already committed (journaled in {SEED_LOAD_JOURNAL_PATH}) whose seed file is unchanged.",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Dry run: validate every table and join seed offline and print the ordered load plan, without writing anything.",
+    )
+    add_instrumentation_arguments(parser)
+    return parser.parse_args(argv)
+
+def print_load_summary(stats):
+    """
+    Print per-table throughput collected by bulk_load().
+    """
+    if not stats:
+        return
+    print("\nLoad summary:")
+    for entry in stats:
+        line = f" - {entry['table']}: {entry['rows']} row(s) in {entry['seconds']:.2f}s ({entry['rows_per_second']:,.0f} rows/s)"
+        if entry.get("deleted"):
+            line += f", {entry['deleted']} deleted"
+        if entry["failed"]:
+            line += f", {entry['failed']} failed"
+        print(line)
+    total_rows = sum(entry["rows"] for entry in stats)
+    total_seconds = sum(entry["seconds"] for entry in stats)
+    rate = total_rows / total_seconds if total_seconds > 0 else 0.0
+    print(f"Total: {total_rows} row(s) in {total_seconds:.2f}s ({rate:,.0f} rows/s)")
+
+def load_seed_table(conn, table_name, seed_file, mode=DEFAULT_LOAD_MODE, batch_size=DEFAULT_BATCH_SIZE, incremental=False):
+    """
+    Reinitialize one table from its seed file on the given connection:
+    create it if needed, then either delete its rows and bulk load the seed
+    records, or (incremental) upsert only the records that changed since the
+    last sync and delete the ones that vanished.
+    The work happens inside a savepoint, so a failure leaves the table as it was.
+    Loading workloads (or farmers) also refreshes the workload rollups in
+    the same savepoint: only the affected farmers' rollups after an
+    incremental sync, all of them after a full reload.
+    Returns the load statistics, or None if the table was skipped.
+    """
+    start = time.perf_counter()
+    
+    # Stream the seed file: the first record drives schema inference and
+    # the same iterator then feeds the loader, so the file is parsed once.
+    try:
+        first_record, records = peek_first(iter_seed_records(seed_file))
+    except Exception as e:
+        print(f"Error reading JSON from {seed_file}: {e}")
+        return None
+    
+    # Declared tables get exact column types, and their records are
+    # validated and coerced (e.g. "false" -> False) batch by batch as they
+    # stream to the loader; a mismatch raises a ValueError handled below.
+    table_schema = declared_schema(table_name)
+    if table_schema:
+        records = table_schema.coerce_records(records, batch_size)
+    
+    # Check if the table exists; if not, create it using the declared or inferred schema.
+    if not table_exists(conn, table_name):
+        schema = table_schema.column_definitions() if table_schema else infer_record_schema(first_record)
+        if not schema:
+            print(f"Could not infer schema for table '{table_name}' from {seed_file}. Skipping.")
+            return None
+        create_table(conn, table_name, schema)
+    
+    print(f"\nProcessing seed file for table '{table_name}'...")
+    
+    # Each table is loaded in its own savepoint so that a seed file
+    # turning out to be malformed halfway through leaves the table untouched.
+    savepoint = conn.begin_nested()
+    
+    if incremental:
+        # Capture the farmers of the rows about to change while the old rows are still there.
+        farmer_ids = set()
+        before_apply = None
+        if table_name == WORKLOADS_TABLE:
+            before_apply = lambda plan: farmer_ids.update(affected_farmers(conn, plan))
+        try:
+            sync_stats = sync_table(conn, table_name, seed_file, records, ["id"], batch_size=batch_size, before_apply=before_apply)
+            if farmer_ids:
+                refresh_workload_rollups(conn, farmer_ids)
+            elif table_name == FARMERS_TABLE and sync_stats["plan"]:
+                refresh_farm_totals(conn)
+        except (ValueError, SQLAlchemyError, psycopg2.Error) as e:
+            if is_transient(e):
+                # Retried by the caller in a new transaction.
+                raise
+            savepoint.rollback()
+            print(f"Error syncing table '{table_name}' from {seed_file}: {e}")
+            print(f"Table '{table_name}' was left unchanged.")
+            return None
+        savepoint.commit()
+        elapsed = time.perf_counter() - start
+        return {
+            "table": table_name,
+            "rows": sync_stats["upserted"],
+            "deleted": sync_stats["deleted"],
+            "failed": 0,
+            "seconds": sync_stats["seconds"],
+            "rows_per_second": sync_stats["upserted"] / sync_stats["seconds"] if sync_stats["seconds"] > 0 else 0.0,
+            "table_seconds": elapsed,
+        }
+    
+    # Delete existing data (if any)
+    try:
+        result = conn.execute(text(f"DELETE FROM {table_name}"))
+        deleted_count = result.rowcount
+        if deleted_count == 0:
+            print(f"Info: Table '{table_name}' was already empty.")
+        else:
+            print(f"Deleted {deleted_count} row(s) from table '{table_name}'.")
+        # The manifest no longer describes the table's content.
+        clear_manifest(conn, table_name)
+    except SQLAlchemyError as e:
+        if is_transient(e):
+            raise
+        savepoint.rollback()
+        print(f"Error deleting data from table '{table_name}': {e}")
+        return None
+    
+    # Insert seed data into the table
+    try:
+        stats = bulk_load(conn, table_name, records, mode=mode, batch_size=batch_size)
+        if table_name == WORKLOADS_TABLE:
+            refresh_workload_rollups(conn)
+        elif table_name == FARMERS_TABLE:
+            refresh_farm_totals(conn)
+    except (ValueError, SQLAlchemyError, psycopg2.Error) as e:
+        if is_transient(e):
+            # Retried by the caller in a new transaction.
+            raise
+        savepoint.rollback()
+        if isinstance(e, ValueError):
+            print(f"Invalid seed data in {seed_file}: {e}")
+        else:
+            print(f"Error loading table '{table_name}' from {seed_file}: {e}")
+        print(f"Table '{table_name}' was left unchanged.")
+        return None
+    savepoint.commit()
+    
+    stats["table_seconds"] = time.perf_counter() - start
+    return stats
+
+def get_seed_dependencies(seed_files_by_table):
+    """
+    Build the table dependency graph from the declared columns of each
+    table (or the columns of its seed file's first record), using the *_id
+    naming convention (see seed_graph.referenced_table).
+    """
+    table_columns = {}
+    for table_name, seed_file in seed_files_by_table.items():
+        table_schema = declared_schema(table_name)
+        if table_schema:
+            table_columns[table_name] = list(table_schema.by_name)
+            continue
+        try:
+            first_record, _ = peek_first(iter_seed_records(seed_file))
+        except Exception as e:
+            print(f"Error reading JSON from {seed_file}: {e}")
+            first_record = None
+        table_columns[table_name] = list(first_record.keys()) if isinstance(first_record, dict) else []
+    return table_dependencies(table_columns)
+
+def load_tables_sequentially(engine, seed_files_by_table, load_order, args):
+    """
+    Load every table one after another inside a single transaction. A
+    transient failure (e.g. a dropped connection) rolls everything back,
+    and the whole load is retried.
+    Returns (stats, failed), failed listing the tables left unchanged.
+    """
+    def load_all():
+        stats = []
+        failed = []
+        with engine.begin() as conn:
+            for table_name in load_order:
+                with metrics.span("load_table", table=table_name):
+                    table_stats = load_seed_table(conn, table_name, seed_files_by_table[table_name], args.mode, args.batch_size, args.incremental)
+                if table_stats:
+                    stats.append(table_stats)
+                else:
+                    failed.append(table_name)
+        return stats, failed
+    
+    return retry(load_all, "Loading the tables in one transaction")
+
+def load_tables_in_parallel(engine, seed_files_by_table, dependencies, args, journal):
+    """
+    Load tables concurrently on a pool of args.jobs connections. A table
+    starts once every table it references has been committed, and each
+    table is committed atomically in its own transaction, retried on a
+    transient failure. Committed tables are recorded in the journal, and
+    tables it already holds with an unchanged seed file are skipped.
+    Returns (stats, failed), failed listing the tables that failed or were
+    skipped because a table they reference failed.
+    """
+    def load_in_own_transaction(table_name):
+        seed_file = seed_files_by_table[table_name]
+        fingerprint = file_sha256(seed_file)
+        if journal.is_done(table_name, fingerprint):
+            print(f"Table '{table_name}' was already loaded by the interrupted run; skipping it.")
+            return None
+        
+        def load_once():
+            with metrics.span("load_table", table=table_name), engine.begin() as conn:
+                return load_seed_table(conn, table_name, seed_file, args.mode, args.batch_size, args.incremental)
+        
+        table_stats = retry(load_once, f"Loading table '{table_name}'")
+        if not table_stats:
+            # Raised so that the tables referencing it are not loaded either.
+            raise RuntimeError("the table was left unchanged")
+        journal.record(table_name, fingerprint, rows=table_stats["rows"])
+        return table_stats
+    
+    results, errors, skipped, elapsed = run_in_dependency_order(dependencies, load_in_own_transaction, jobs=args.jobs)
+    
+    metrics.increment("errors", len(errors))
+    for table_name, error in sorted(errors.items()):
+        print(f"Error loading table '{table_name}': {error}")
+    for table_name in skipped:
+        print(f"Skipped table '{table_name}' because a table it references failed to load.")
+    
+    stats = [table_stats for table_stats in results.values() if table_stats]
+    sequential_seconds = sum(table_stats["table_seconds"] for table_stats in stats)
+    speedup = sequential_seconds / elapsed if elapsed > 0 else 0.0
+    print(
+        f"\nParallel load with {args.jobs} job(s) took {elapsed:.2f}s wall time; "
+        f"the same tables loaded one after another would take about {sequential_seconds:.2f}s ({speedup:.1f}x)."
+    )
+    return stats, sorted(errors) + list(skipped)
+
+def run(args, engine=None):
     seed_files = get_seed_files()
     if not seed_files:
         print("No seed files found in the folder:", SEEDS_ROOT)
         sys.exit(1)
     
+    if args.plan:
+        sys.exit(0 if run_plan(seed_files, get_join_seed_files(), args.batch_size, engine) else 1)
+    
     # Determine target table names from the seed files (e.g., 'address.json' -> 'address')
-    table_names = sorted({os.path.splitext(os.path.basename(f))[0] for f in seed_files})
+    seed_files_by_table = {os.path.splitext(os.path.basename(f))[0]: f for f in seed_files}
+    
+    # Parents are loaded before the tables referencing them, so that the
+    # ON DELETE CASCADE of an existing foreign key never wipes freshly loaded rows.
+    try:
+        dependencies = get_seed_dependencies(seed_files_by_table)
+        load_order = [table for layer in topological_layers(dependencies) for table in layer]
+    except ValueError as e:
+        print(f"Cannot determine a load order: {e}")
+        sys.exit(1)
     
+    # Parallel loads need at least one pooled connection per job.
+    engine = engine or get_engine(pool_size=args.jobs)
     print("The following tables will be reinitialized with seed data:")
     with engine.connect() as conn:
-        for seed_file in seed_files:
-            table_name = os.path.splitext(os.path.basename(seed_file))[0]
-            print(" -", table_name)
-            print_current_table_info(conn, table_name, seed_file)
+        existing_rows = fetch_row_estimates(conn, load_order)
+    for table_name in load_order:
+        print(" -", table_name)
+        print_current_table_info(table_name, seed_files_by_table[table_name], existing_rows)
     
-    # Prompt for manual confirmation to proceed
-    confirm = input("\nWARNING: This will DELETE all existing data in these tables (and create them if they don't exist). Type 'yes' to confirm: ")
+    # Prompt for manual confirmation to proceed, unless given up front with --yes
+    if args.yes:
+        confirm = "yes"
+    elif args.incremental:
+        confirm = input("\nWARNING: This will UPSERT changed seed records and DELETE records removed from the seeds in these tables (and create them if they don't exist). Type 'yes' to confirm: ")
+    else:
+        confirm = input("\nWARNING: This will DELETE all existing data in these tables (and create them if they don't exist). Type 'yes' to confirm: ")
     if confirm.lower() != "yes":
         print("Operation aborted.")
         sys.exit(0)
     
-    # Begin transaction to process all seed files
-    with engine.begin() as conn:
-        for seed_file in seed_files:
-            table_name = os.path.splitext(os.path.basename(seed_file))[0]
-            
-            # Check if the table exists; if not, create it using inferred schema.
-            if not table_exists(conn, table_name):
-                schema = infer_table_schema(seed_file)
-                if not schema:
-                    print(f"Could not infer schema for table '{table_name}' from {seed_file}. Skipping.")
-                    continue
-                create_table(conn, table_name, schema)
-            
-            print(f"\nProcessing seed file for table '{table_name}'...")
-            
-            # Delete existing data (if any)
-            try:
-                result = conn.execute(text(f"DELETE FROM {table_name}"))
-                deleted_count = result.rowcount
-                if deleted_count == 0:
-                    print(f"Info: Table '{table_name}' was already empty.")
-                else:
-                    print(f"Deleted {deleted_count} row(s) from table '{table_name}'.")
-            except SQLAlchemyError as e:
-                print(f"Error deleting data from table '{table_name}': {e}")
-                continue
-            
-            # Load seed data from JSON file
-            try:
-                with open(seed_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-            except Exception as e:
-                print(f"Error reading JSON from {seed_file}: {e}")
-                continue
-            
-            # Insert seed data into the table
-            # Insert seed data into the table
-            if isinstance(data, list):
-                for record in data:
-                    if not isinstance(record, dict):
-                        print(f"Skipping invalid record in {seed_file}: {record}")
-                        continue
-                    columns = record.keys()
-                    col_names = ", ".join(columns)
-                    placeholders = ", ".join(f":{col}" for col in columns)
-                    query = text(f"INSERT INTO {table_name} ({col_names}) VALUES ({placeholders})")
-                    
-                    # Debug prints
-                    print(f"Inserting into '{table_name}': {record}")
-                    print(f"Using query: INSERT INTO {table_name} ({col_names}) VALUES ({placeholders})")
-                    
-                    try:
-                        conn.execute(query, record)  # Pass the record dictionary directly
-                    except SQLAlchemyError as e:
-                        print(f"Error inserting record into table '{table_name}': {e}")
-                        print(f"Failed record: {record}")
-            elif isinstance(data, dict):
-                columns = data.keys()
-                col_names = ", ".join(columns)
-                placeholders = ", ".join(f":{col}" for col in columns)
-                query = text(f"INSERT INTO {table_name} ({col_names}) VALUES ({placeholders})")
-                
-                print(f"Inserting into '{table_name}': {data}")
-                print(f"Using query: INSERT INTO {table_name} ({col_names}) VALUES ({placeholders})")
-                
-                try:
-                    conn.execute(query, data)
-                except SQLAlchemyError as e:
-                    print(f"Error inserting data into table '{table_name}': {e}")
-                    print(f"Failed record: {data}")
-
-                print(f"Unsupported data format in {seed_file}. Skipping.")
+    if args.incremental:
+        # Created once up front rather than racing from parallel loaders.
+        with engine.begin() as conn:
+            ensure_manifest_tables(conn)
+    
+    if args.jobs > 1 or args.resume:
+        journal = CheckpointJournal(SEED_LOAD_JOURNAL_PATH)
+        if not args.resume:
+            journal.clear()
+        stats, failed = load_tables_in_parallel(engine, seed_files_by_table, dependencies, args, journal)
+        if not failed:
+            journal.clear()
+        else:
+            print(f"Committed tables are journaled in {SEED_LOAD_JOURNAL_PATH}; rerun with --resume to load only the others.")
+    else:
+        stats, failed = load_tables_sequentially(engine, seed_files_by_table, load_order, args)
     
+    print_load_summary(stats)
+    if failed:
+        # A non-zero exit keeps the steps that build on these tables from running.
+        print(f"\n❌ {len(failed)} table(s) were not loaded: {', '.join(failed)}.")
+        sys.exit(1)
+    refresh_farm_profiles(engine)
     print("\n✅ Seed data loaded successfully into the remote database.")
 
+def main(argv=None, engine=None):
+    args = parse_args(argv)
+    with instrumented(args, "upload_seed_tables"):
+        run(args, engine)
+
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    except ConfigurationError as e:
+        print(e)
+        sys.exit(1)
@@ -0,0 +1,201 @@
+import os
+import re
+import shutil
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from file_hashing import file_sha256
+from media_paths import MEDIA_ROOT, DOCUMENTARY_FOLDER, HEROVIDEO_FOLDER
+from image_derivatives import (
+    LOCAL_DERIVATIVES_ROOT,
+    REMOTE_DERIVATIVES_ROOT,
+    materialize_cached_file,
+    prune_stale_derivatives,
+)
+
+# Transcoded renditions and posters are cached by source content hash.
+VIDEO_CACHE_ROOT = os.path.join(".media_cache", "video")
+
+SOURCE_VIDEO_FOLDERS = (HEROVIDEO_FOLDER, DOCUMENTARY_FOLDER)
+SOURCE_VIDEO_EXTENSIONS = (".mp4", ".mov", ".m4v")
+
+# Web rendition settings: H.264 capped in width and bitrate, with the moov
+# atom moved to the front (faststart) so playback starts before the download ends.
+DEFAULT_MAX_WIDTH = 1920
+DEFAULT_MAX_BITRATE = "4M"
+DEFAULT_CRF = 23
+DEFAULT_AUDIO_BITRATE = "128k"
+# Time of the frame used as poster, in seconds.
+DEFAULT_POSTER_TIME = 1.0
+# ffmpeg already uses several threads per job, so only a few jobs run at once.
+DEFAULT_CONCURRENCY = max(1, (os.cpu_count() or 2) // 2)
+
+RENDITION_NAME_PATTERN = re.compile(r"\.(web|poster)\.[0-9a-f]{8}\.(mp4|jpg)$")
+
+def iter_source_videos(media_root=MEDIA_ROOT):
+    """
+    Yield the hero videos and documentaries under media_root.
+    """
+    for root, _, files in os.walk(media_root):
+        if os.path.basename(root) not in SOURCE_VIDEO_FOLDERS:
+            continue
+        for file in files:
+            if file.lower().endswith(SOURCE_VIDEO_EXTENSIONS):
+                yield os.path.join(root, file)
+
+def _bitrate_to_buffer(bitrate):
+    # Use a rate-control buffer of twice the maximum bitrate.
+    number, unit = re.match(r"^(\d+(?:\.\d+)?)([kKmM]?)$", bitrate).groups()
+    return f"{float(number) * 2:g}{unit}"
+
+def _run_ffmpeg(args):
+    subprocess.run(["ffmpeg", "-y", "-hide_banner", "-loglevel", "error", *args], check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+def transcode_web_rendition(source_path, output_path, max_width=DEFAULT_MAX_WIDTH,
+                            max_bitrate=DEFAULT_MAX_BITRATE, crf=DEFAULT_CRF):
+    """
+    Transcode a video into a web-optimized H.264/AAC mp4 with faststart.
+    """
+    _run_ffmpeg([
+        "-i", source_path,
+        "-vf", f"scale='min({max_width},iw)':-2",
+        "-c:v", "libx264", "-preset", "slow", "-crf", str(crf),
+        "-maxrate", max_bitrate, "-bufsize", _bitrate_to_buffer(max_bitrate),
+        "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-b:a", DEFAULT_AUDIO_BITRATE,
+        "-movflags", "+faststart",
+        "-f", "mp4",
+        output_path,
+    ])
+
+def extract_poster(source_path, output_path, poster_time=DEFAULT_POSTER_TIME):
+    """
+    Save one frame of the video as a JPEG poster. Videos shorter than
+    poster_time fall back to their first frame.
+    """
+    for seek in (poster_time, 0):
+        _run_ffmpeg(["-ss", str(seek), "-i", source_path, "-frames:v", "1", "-q:v", "3", "-f", "image2", "-update", "1", output_path])
+        if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+            return
+    raise RuntimeError(f"Could not extract a poster frame from {source_path}")
+
+def render_video(source_path, options, cache_root=VIDEO_CACHE_ROOT):
+    """
+    Produce the web rendition and poster of one video in the cache, unless
+    a previous run already did for the same content.
+    Returns (source_hash, {"web": path, "poster": path}, cached).
+    """
+    source_hash = file_sha256(source_path)
+    cache_dir = os.path.join(cache_root, source_hash)
+    outputs = {"web": os.path.join(cache_dir, "web.mp4"), "poster": os.path.join(cache_dir, "poster.jpg")}
+    if all(os.path.exists(path) for path in outputs.values()):
+        return source_hash, outputs, True
+
+    os.makedirs(cache_dir, exist_ok=True)
+    # Write to temporary names and rename, so an interrupted run never leaves
+    # a truncated file that a later run would mistake for a cached result.
+    if not os.path.exists(outputs["web"]):
+        tmp_file = outputs["web"] + ".tmp"
+        transcode_web_rendition(source_path, tmp_file, options["max_width"], options["max_bitrate"], options["crf"])
+        os.replace(tmp_file, outputs["web"])
+    if not os.path.exists(outputs["poster"]):
+        tmp_file = outputs["poster"] + ".tmp"
+        extract_poster(source_path, tmp_file, options["poster_time"])
+        os.replace(tmp_file, outputs["poster"])
+    return source_hash, outputs, False
+
+def rendition_rel_path(source_rel_path, source_hash, kind):
+    """
+    Name of a rendition relative to the derivatives root, e.g.
+    farms/farm_1/herovideo/1.mp4 -> farms/farm_1/herovideo/1.web.1a2b3c4d.mp4
+    """
+    stem = os.path.splitext(source_rel_path)[0]
+    extension = "mp4" if kind == "web" else "jpg"
+    return f"{stem}.{kind}.{source_hash[:8]}.{extension}"
+
+def build_video_renditions(media_root=MEDIA_ROOT, derivatives_root=LOCAL_DERIVATIVES_ROOT,
+                           max_width=DEFAULT_MAX_WIDTH, max_bitrate=DEFAULT_MAX_BITRATE, crf=DEFAULT_CRF,
+                           poster_time=DEFAULT_POSTER_TIME, concurrency=DEFAULT_CONCURRENCY,
+                           cache_root=VIDEO_CACHE_ROOT):
+    """
+    Transcode every hero video and documentary and extract their posters,
+    running at most `concurrency` ffmpeg jobs at once, and lay the results
+    out under derivatives_root next to the image derivatives.
+
+    Returns a dict mapping each source path (e.g. media/farms/farm_1/herovideo/1.mp4)
+    to the blob paths of its rendition and poster.
+    """
+    if shutil.which("ffmpeg") is None:
+        print("ffmpeg was not found on PATH; skipping video renditions.")
+        return {}
+
+    options = {"max_width": max_width, "max_bitrate": max_bitrate, "crf": crf, "poster_time": poster_time}
+    renditions = {}
+    expected_paths = set()
+    transcoded = cached = failed = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {
+            executor.submit(render_video, source_path, options, cache_root): source_path
+            for source_path in iter_source_videos(media_root)
+        }
+        for future in as_completed(futures):
+            source_path = futures[future]
+            try:
+                source_hash, outputs, was_cached = future.result()
+            except subprocess.CalledProcessError as e:
+                failed += 1
+                print(f"Error transcoding {source_path}: {e.stderr.decode(errors='replace').strip()}")
+                continue
+            except Exception as e:
+                failed += 1
+                print(f"Error transcoding {source_path}: {e}")
+                continue
+            if was_cached:
+                cached += 1
+            else:
+                transcoded += 1
+            source_rel_path = os.path.relpath(source_path, media_root)
+            blob_paths = {}
+            for kind, cache_file in outputs.items():
+                rel_path = rendition_rel_path(source_rel_path, source_hash, kind)
+                target_path = os.path.join(derivatives_root, rel_path)
+                materialize_cached_file(cache_file, target_path)
+                expected_paths.add(target_path)
+                blob_paths[kind] = f"{REMOTE_DERIVATIVES_ROOT}/{rel_path}".replace(os.sep, "/")
+            renditions[f"{MEDIA_ROOT}/{source_rel_path}".replace(os.sep, "/")] = blob_paths
+
+    removed = prune_stale_derivatives(expected_paths, derivatives_root, RENDITION_NAME_PATTERN)
+    print(
+        f"Video renditions: {transcoded} transcoded, {cached} unchanged (cached)"
+        + (f", {removed} stale file(s) removed" if removed else "")
+        + (f", {failed} failed." if failed else ".")
+    )
+    return renditions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Transcode hero videos and documentaries to web renditions and extract posters.")
+    parser.add_argument("--max-width", type=int, default=DEFAULT_MAX_WIDTH, help="Maximum rendition width in pixels.")
+    parser.add_argument("--max-bitrate", default=DEFAULT_MAX_BITRATE, help="Maximum video bitrate (e.g. 4M, 2500k).")
+    parser.add_argument("--crf", type=int, default=DEFAULT_CRF, help="x264 constant rate factor (lower is better quality).")
+    parser.add_argument("--poster-time", type=float, default=DEFAULT_POSTER_TIME, help="Time of the poster frame in seconds.")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Number of ffmpeg jobs run at once.")
+    return parser.parse_args(argv)
+
+def rendition_options_from_args(args):
+    return {
+        "max_width": args.max_width,
+        "max_bitrate": args.max_bitrate,
+        "crf": args.crf,
+        "poster_time": args.poster_time,
+        "concurrency": args.concurrency,
+    }
+
+def main(argv=None):
+    args = parse_args(argv)
+    build_video_renditions(**rendition_options_from_args(args))
+    print("✅ Video renditions ready.")
+
+if __name__ == "__main__":
+    main()
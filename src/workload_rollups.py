@@ -0,0 +1,209 @@
+import sys
+import json
+import argparse
+from collections import defaultdict
+from sqlalchemy import text
+from seed_reader import iter_seed_records
+from db_config import get_engine, ConfigurationError
+
+WORKLOADS_TABLE = "workloads"
+FARMERS_TABLE = "farmers"
+
+# Summary tables, one row per group: summed weekly_workload and the number
+# of workload rows it was summed from. They are recomputed at load time, so
+# readers no longer aggregate workloads on every request.
+FARMER_SEASON_TABLE = "workload_farmer_season"
+FARMER_CATEGORY_TABLE = "workload_farmer_category"
+FARM_TOTALS_TABLE = "workload_farm_totals"
+
+# Per-farmer rollup table -> its key: farmer_id and the workloads column grouped with it
+FARMER_ROLLUPS = {
+    FARMER_SEASON_TABLE: ("farmer_id", "season_id"),
+    FARMER_CATEGORY_TABLE: ("farmer_id", "work_category_id"),
+}
+
+def compute_rollups(workloads, farmers):
+    """
+    Compute the three rollups in memory from workload and farmer records,
+    with the same semantics as the SQL refresh (used offline and in tests).
+    Returns {table: {key tuple: (total_weekly_workload, workload_rows)}}.
+    """
+    farm_of = {farmer["id"]: farmer.get("farm_id") for farmer in farmers}
+    rollups = {table: defaultdict(lambda: [0, 0]) for table in (*FARMER_ROLLUPS, FARM_TOTALS_TABLE)}
+    for workload in workloads:
+        amount = workload.get("weekly_workload") or 0
+        groups = [(table, tuple(workload.get(col) for col in key)) for table, key in FARMER_ROLLUPS.items()]
+        # Like the SQL refresh, workloads missing a key column are left out.
+        groups = [(table, key) for table, key in groups if None not in key]
+        farm_id = farm_of.get(workload.get("farmer_id"))
+        if farm_id is not None:
+            groups.append((FARM_TOTALS_TABLE, (farm_id,)))
+        for table, key in groups:
+            entry = rollups[table][key]
+            entry[0] += amount
+            entry[1] += 1
+    return {table: {key: tuple(entry) for key, entry in groups.items()} for table, groups in rollups.items()}
+
+def ensure_rollup_tables(conn):
+    for table, (farmer_column, group_column) in FARMER_ROLLUPS.items():
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                {farmer_column} INTEGER NOT NULL,
+                {group_column} INTEGER NOT NULL,
+                total_weekly_workload BIGINT NOT NULL,
+                workload_rows INTEGER NOT NULL,
+                PRIMARY KEY ({farmer_column}, {group_column})
+            )
+        """))
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {FARM_TOTALS_TABLE} (
+            farm_id INTEGER PRIMARY KEY,
+            total_weekly_workload BIGINT NOT NULL,
+            workload_rows INTEGER NOT NULL
+        )
+    """))
+
+def _tables_exist(conn, *table_names):
+    return all(conn.dialect.has_table(conn, table_name) for table_name in table_names)
+
+def refresh_farm_totals(conn, farm_ids=None):
+    """
+    Recompute the farm totals (workloads joined to farms through farmers)
+    of the given farms, or of every farm when farm_ids is None.
+    """
+    if not _tables_exist(conn, WORKLOADS_TABLE, FARMERS_TABLE):
+        return
+    ensure_rollup_tables(conn)
+    if farm_ids is None:
+        conn.execute(text(f"DELETE FROM {FARM_TOTALS_TABLE}"))
+        where, params = "", {}
+    else:
+        farm_ids = [farm_id for farm_id in farm_ids if farm_id is not None]
+        if not farm_ids:
+            return
+        conn.execute(text(f"DELETE FROM {FARM_TOTALS_TABLE} WHERE farm_id = ANY(:farm_ids)"), {"farm_ids": farm_ids})
+        where, params = "AND f.farm_id = ANY(:farm_ids)", {"farm_ids": farm_ids}
+    conn.execute(text(f"""
+        INSERT INTO {FARM_TOTALS_TABLE} (farm_id, total_weekly_workload, workload_rows)
+        SELECT f.farm_id, COALESCE(SUM(w.weekly_workload), 0), COUNT(*)
+        FROM {WORKLOADS_TABLE} w
+        JOIN {FARMERS_TABLE} f ON f.id = w.farmer_id
+        WHERE f.farm_id IS NOT NULL {where}
+        GROUP BY f.farm_id
+    """), params)
+
+def refresh_workload_rollups(conn, farmer_ids=None):
+    """
+    Recompute the rollups of the given farmers (and the totals of their
+    farms) with set-based GROUP BY queries, or every rollup when
+    farmer_ids is None. Runs in the caller's transaction.
+    """
+    if not _tables_exist(conn, WORKLOADS_TABLE):
+        return
+    ensure_rollup_tables(conn)
+    if farmer_ids is not None:
+        farmer_ids = sorted({farmer_id for farmer_id in farmer_ids if farmer_id is not None})
+        if not farmer_ids:
+            return
+    where = "" if farmer_ids is None else "WHERE farmer_id = ANY(:farmer_ids)"
+    params = {"farmer_ids": farmer_ids}
+    for table, (farmer_column, group_column) in FARMER_ROLLUPS.items():
+        conn.execute(text(f"DELETE FROM {table} {where}"), params)
+        conn.execute(text(f"""
+            INSERT INTO {table} ({farmer_column}, {group_column}, total_weekly_workload, workload_rows)
+            SELECT {farmer_column}, {group_column}, COALESCE(SUM(weekly_workload), 0), COUNT(*)
+            FROM {WORKLOADS_TABLE}
+            {where + " AND" if where else "WHERE"} {farmer_column} IS NOT NULL AND {group_column} IS NOT NULL
+            GROUP BY {farmer_column}, {group_column}
+        """), params)
+
+    if farmer_ids is None:
+        refresh_farm_totals(conn)
+    elif _tables_exist(conn, FARMERS_TABLE):
+        farm_ids = conn.execute(
+            text(f"SELECT DISTINCT farm_id FROM {FARMERS_TABLE} WHERE id = ANY(:farmer_ids)"), params
+        ).scalars().all()
+        refresh_farm_totals(conn, farm_ids)
+    scope = "all farmers" if farmer_ids is None else f"{len(farmer_ids)} farmer(s)"
+    print(f"Refreshed workload rollups for {scope}.")
+
+def affected_farmers(conn, plan):
+    """
+    The farmers whose rollups a workloads SyncPlan changes: the new
+    farmer_id of every upserted record, plus the current farmer_id of every
+    row about to be updated or deleted. Call it before the plan is applied
+    (sync_table's before_apply hook), while the old rows are still there.
+    """
+    farmer_ids = {record.get("farmer_id") for record in plan.upserts}
+    ids = [json.loads(key)[0] for key in plan.deletes]
+    ids += [record.get("id") for record in plan.upserts]
+    if ids:
+        farmer_ids.update(conn.execute(
+            text(f"SELECT DISTINCT farmer_id FROM {WORKLOADS_TABLE} WHERE id = ANY(:ids)"),
+            {"ids": ids},
+        ).scalars())
+    farmer_ids.discard(None)
+    return farmer_ids
+
+def get_farmer_workload(conn, farmer_id):
+    """
+    The rollups of one farmer: {"by_season": {season_id: total},
+    "by_category": {work_category_id: total}}.
+    """
+    by_season = conn.execute(
+        text(f"SELECT season_id, total_weekly_workload FROM {FARMER_SEASON_TABLE} WHERE farmer_id = :farmer_id"),
+        {"farmer_id": farmer_id},
+    )
+    by_category = conn.execute(
+        text(f"SELECT work_category_id, total_weekly_workload FROM {FARMER_CATEGORY_TABLE} WHERE farmer_id = :farmer_id"),
+        {"farmer_id": farmer_id},
+    )
+    return {"by_season": dict(by_season.fetchall()), "by_category": dict(by_category.fetchall())}
+
+def get_farm_workload(conn, farm_id):
+    """
+    The total weekly workload of one farm, or None if it has none.
+    """
+    return conn.execute(
+        text(f"SELECT total_weekly_workload FROM {FARM_TOTALS_TABLE} WHERE farm_id = :farm_id"),
+        {"farm_id": farm_id},
+    ).scalar()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-aggregated workload rollups per farmer, season, category and farm.")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute every rollup from the workloads table.")
+    parser.add_argument("--farmer", type=int, help="Print the rollups of this farmer.")
+    parser.add_argument("--farm", type=int, help="Print the total weekly workload of this farm.")
+    parser.add_argument(
+        "--local",
+        action="store_true",
+        help="Compute the rollups from the seed files instead of the database and print the farm totals.",
+    )
+    return parser.parse_args(argv)
+
+def main(argv=None, engine=None):
+    args = parse_args(argv)
+    if args.local:
+        rollups = compute_rollups(
+            iter_seed_records("table_seeds/workloads/workloads.json"),
+            list(iter_seed_records("table_seeds/farmers/farmers.json")),
+        )
+        for (farm_id,), (total, rows) in sorted(rollups[FARM_TOTALS_TABLE].items()):
+            print(f" - farm {farm_id}: {total} weekly workload over {rows} workload row(s)")
+        return
+    engine = engine or get_engine()
+    if args.rebuild:
+        with engine.begin() as conn:
+            refresh_workload_rollups(conn)
+    with engine.connect() as conn:
+        if args.farmer is not None:
+            print(json.dumps(get_farmer_workload(conn, args.farmer), indent=2))
+        if args.farm is not None:
+            print(f"Farm {args.farm}: {get_farm_workload(conn, args.farm)}")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except ConfigurationError as e:
+        print(e)
+        sys.exit(1)
@@ -0,0 +1,10 @@
+from catalog import TableInfo
+from add_foreign_keys import plan_foreign_keys
+
+def test_plan_skips_existing_and_unknown_foreign_keys():
+    catalog = {
+        "farms": TableInfo(["id", "address_id", "owner_id"], {}, set()),
+        "addresses": TableInfo(["id", "city"], {}, set()),
+        "farmers": TableInfo(["id", "farm_id"], {"farm_id": "fk_farmers_farm_id"}, set()),
+    }
+    assert plan_foreign_keys(catalog) == [("farms", "address_id", "addresses")]
@@ -1,7 +1,5 @@
-import os
 import pytest
-from azure.storage.blob import BlobServiceClient
-from dotenv import load_dotenv
+from db_config import get_container_client
 
 # Expected media subfolders (relative to your remote storage root)
 EXPECTED_SUBFOLDERS = [
@@ -16,16 +14,7 @@ EXPECTED_SUBFOLDERS = [
 @pytest.fixture(scope="module")
 def container_client():
     # Load credentials from environment variables (set in GitHub Secrets in CI)
-    if os.path.exists('.env'):
-        load_dotenv()
-    account_name = os.getenv("STORAGE_ACCOUNT_NAME")
-    account_key = os.getenv("STORAGE_ACCOUNT_KEY")
-    container_name = os.getenv("STORAGE_CONTAINER_NAME")
-    
-    # Build the connection string
-    connect_str = f"DefaultEndpointsProtocol=https;AccountName={account_name};AccountKey={account_key};EndpointSuffix=core.windows.net"
-    blob_service_client = BlobServiceClient.from_connection_string(connect_str)
-    return blob_service_client.get_container_client(container_name)
+    return get_container_client()
 
 def list_blobs_in_prefix(container_client, prefix):
     """
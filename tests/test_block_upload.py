@@ -0,0 +1,22 @@
+import mmap
+from block_upload import MappedBlockReader, block_ids_for
+
+def test_mapped_block_reader_reads_and_rewinds_a_range(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(bytes(range(256)) * 4)
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        reader = MappedBlockReader(mapped, 100, 300)
+        assert len(reader) == 200
+        first = reader.read(50)
+        assert first == bytes(range(100, 150))
+        assert reader.read() == bytes(range(150, 256)) + bytes(range(0, 44))
+        assert reader.read(10) == b""
+        reader.seek(0)
+        assert reader.read(3) == bytes([100, 101, 102])
+
+def test_block_ids_are_stable_and_same_length():
+    md5 = bytes.fromhex("00112233445566778899aabbccddeeff")
+    ids = block_ids_for(md5, 25, 10)
+    assert ids == block_ids_for(md5, 25, 10)
+    assert len(ids) == 3
+    assert len({len(block_id) for block_id in ids}) == 1
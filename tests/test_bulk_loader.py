@@ -0,0 +1,19 @@
+from bulk_loader import encode_copy_rows, iter_batches
+
+def test_iter_batches_splits_any_iterable():
+    batches = list(iter_batches((i for i in range(7)), 3))
+    assert batches == [[0, 1, 2], [3, 4, 5], [6]]
+
+def test_encode_copy_rows_uses_text_format_escapes():
+    records = [
+        {"id": 1, "description": "tab\there\nnewline", "is_main": True, "house_number": ""},
+        {"id": 2, "description": None, "is_main": False, "house_number": "458"},
+    ]
+    buffer = encode_copy_rows(["id", "description", "is_main", "house_number"], records)
+    lines = buffer.getvalue().splitlines()
+    assert lines[0] == "1\ttab\\there\\nnewline\ttrue\t"
+    assert lines[1] == "2\t\\N\tfalse\t458"
+
+def test_encode_copy_rows_renders_lists_as_arrays():
+    buffer = encode_copy_rows(["ids"], [{"ids": [1, 2, 3]}, {"ids": ['a"b', None]}])
+    assert buffer.getvalue().splitlines() == ["{1,2,3}", '{"a\\\\"b",NULL}']
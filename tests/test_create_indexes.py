@@ -0,0 +1,21 @@
+from catalog import TableInfo
+from create_indexes import plan_indexes, index_name_for, MAX_IDENTIFIER_LENGTH
+
+def test_plan_indexes_from_naming_conventions():
+    catalog = {
+        "photos": TableInfo(["id", "photoable_type", "photoable_id", "description"], {}, set(), [("id",)]),
+        "farmers": TableInfo(["id", "farm_id", "name"], {}, set(), [("id",), ("farm_id",)]),
+        "product_subproducts": TableInfo(["product_id", "subproduct_id"], {}, set(), [("product_id", "subproduct_id")]),
+        "products": TableInfo(["id", "farm_id", "product_category_id"], {}, set(), [("id",)]),
+    }
+    assert plan_indexes(catalog) == [
+        ("photos", "idx_photos_photoable_type_photoable_id", ("photoable_type", "photoable_id")),
+        ("product_subproducts", "idx_product_subproducts_subproduct_id", ("subproduct_id",)),
+        ("products", "idx_products_farm_id", ("farm_id",)),
+        ("products", "idx_products_product_category_id", ("product_category_id",)),
+    ]
+
+def test_long_index_names_are_shortened_deterministically():
+    name = index_name_for("unofficial_label_instances", ("unofficial_label_id", "another_long_column_id"))
+    assert len(name) == MAX_IDENTIFIER_LENGTH
+    assert name == index_name_for("unofficial_label_instances", ("unofficial_label_id", "another_long_column_id"))
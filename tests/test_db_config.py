@@ -0,0 +1,54 @@
+import importlib
+import pytest
+import db_config
+
+DB_SETTINGS = {
+    "DB_HOST": "example.postgres.database.azure.com",
+    "DB_PORT": "5432",
+    "DB_NAME": "producteurice",
+    "DB_USER": "admin@server",
+    "DB_PASSWORD": "p@ss/word",
+}
+
+@pytest.fixture
+def db_env(monkeypatch):
+    for name, value in DB_SETTINGS.items():
+        monkeypatch.setenv(name, value)
+    db_config.dispose_engine()
+    yield
+    db_config.dispose_engine()
+
+def test_scripts_import_without_credentials(monkeypatch):
+    for name in db_config.DB_CREDENTIAL_VARS + db_config.STORAGE_CREDENTIAL_VARS:
+        monkeypatch.delenv(name, raising=False)
+    for module in ("upload_seed_tables", "upload_seed_join_tables", "add_foreign_keys",
+                   "show_db_tables_sample", "erase_all_tables_db", "upload_media_blob", "erase_all_files_blob"):
+        importlib.import_module(module)
+    with pytest.raises(db_config.ConfigurationError):
+        db_config.get_connection_string()
+
+def test_connection_string_escapes_credentials(db_env):
+    connection_string = db_config.get_connection_string()
+    assert connection_string == (
+        "postgresql+psycopg2://admin%40server:p%40ss%2Fword"
+        "@example.postgres.database.azure.com:5432/producteurice?sslmode=require"
+    )
+
+def test_engine_is_shared_and_grows_its_pool(db_env, monkeypatch):
+    monkeypatch.setenv("DB_STATEMENT_TIMEOUT_MS", "1000")
+    engine = db_config.get_engine()
+    assert db_config.get_engine() is engine
+    assert engine.pool.size() == db_config.DEFAULT_POOL_SIZE
+    assert db_config.get_engine(pool_size=2) is engine
+
+    larger = db_config.get_engine(pool_size=12)
+    assert larger is not engine
+    assert larger.pool.size() == 12
+    assert db_config._connect_args()["options"] == "-c statement_timeout=1000"
+
+def test_schema_engine_resolves_names_in_the_schema_first(db_env):
+    assert db_config.get_schema_engine("public") is db_config.get_engine()
+    shadow = db_config.get_schema_engine("reseed_shadow")
+    assert shadow is db_config.get_search_path_engine(["reseed_shadow", "public"])
+    assert shadow is not db_config.get_engine()
+    assert db_config._connect_args(("reseed_shadow", "public"))["options"].endswith("-c search_path=reseed_shadow,public")
@@ -0,0 +1,54 @@
+import erase_all_files_blob
+from erase_all_files_blob import delete_blobs
+
+class Blob:
+    def __init__(self, name):
+        self.name = name
+
+class Listing:
+    def __init__(self, names):
+        self.names = names
+
+    def by_page(self):
+        return [[Blob(name) for name in self.names[start:start + 3]] for start in range(0, len(self.names), 3)]
+
+class Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+class FakeContainer:
+    """
+    Deletes blobs in batches; refuses some names and raises on some batches.
+    """
+    def __init__(self, names, refused=(), raising=()):
+        self.names = names
+        self.refused = set(refused)
+        self.raising = set(raising)
+        self.deleted = set()
+
+    def list_blobs(self, name_starts_with=None):
+        return Listing([name for name in self.names if name.startswith(name_starts_with or "")])
+
+    def delete_blobs(self, *names, raise_on_any_failure=True):
+        if self.raising.intersection(names):
+            raise ConnectionError("connection reset")
+        responses = []
+        for name in names:
+            if name in self.refused:
+                responses.append(Response(403))
+            else:
+                self.deleted.add(name)
+                responses.append(Response(202))
+        return responses
+
+def test_refused_blobs_and_failed_batches_are_reported(monkeypatch):
+    names = [f"media/farms/farm_1/photo/{index}.jpg" for index in range(10)]
+    container = FakeContainer(names, refused=[names[1]], raising=[names[7]])
+    monkeypatch.setattr(erase_all_files_blob, "get_container_client", lambda: container)
+
+    deleted, failed, _ = delete_blobs(batch_size=4, workers=2)
+
+    # Batches: 0-3 (one refused), 4-7 (raises), 8-9.
+    assert deleted == 5
+    assert sorted(failed) == sorted([names[1]] + names[4:8])
+    assert container.deleted == set(names[0:1] + names[2:4] + names[8:10])
@@ -0,0 +1,31 @@
+from farm_profiles import ProfileCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_cache_evicts_least_recently_used_and_expired_entries():
+    clock = FakeClock()
+    cache = ProfileCache(maxsize=2, ttl=10, clock=clock)
+    cache.put(1, {"farm": 1})
+    cache.put(2, {"farm": 2})
+    assert cache.get(1) == (True, {"farm": 1})
+    cache.put(3, {"farm": 3})
+    assert cache.get(2) == (False, None)
+    assert cache.get(1)[0] and cache.get(3)[0]
+
+    clock.now = 11
+    assert cache.get(1) == (False, None)
+
+def test_cache_invalidation():
+    cache = ProfileCache()
+    cache.put(1, None)
+    cache.put(2, {"farm": 2})
+    assert cache.get(1) == (True, None)
+    cache.invalidate(2)
+    assert cache.get(2) == (False, None)
+    cache.invalidate()
+    assert cache.get(1) == (False, None)
@@ -0,0 +1,25 @@
+import os
+import sys
+import glob
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+
+from generate_seeds import generate_dataset
+from load_plan import build_load_plan
+from run_benchmarks import stage_volume
+
+def test_generated_dataset_is_consistent_and_deterministic(tmp_path):
+    summary = generate_dataset(str(tmp_path / "a"), 1, seed=3, media=False)
+    again = generate_dataset(str(tmp_path / "b"), 1, seed=3, media=False)
+    assert summary == again
+    assert summary["media_files"] == 0
+
+    table_seeds = glob.glob(str(tmp_path / "a" / "table_seeds" / "**" / "*.json"), recursive=True)
+    join_seeds = glob.glob(str(tmp_path / "a" / "join_table_seeds" / "*.json"))
+    ordered, errors = build_load_plan(table_seeds, join_seeds)
+    assert errors == []
+    assert {scan.table: scan.rows for scan in ordered} == summary["rows"]
+
+    rows, size = stage_volume("upload_seed_tables", summary)
+    assert rows == sum(summary["rows"].values()) - summary["rows"]["product_subproducts"]
+    assert size == summary["seed_bytes"]
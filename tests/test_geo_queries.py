@@ -0,0 +1,81 @@
+import math
+import random
+from geo_queries import FarmLocationIndex, naive_nearest, naive_within, haversine_m, _bounding_box, ensure_spatial_index, EARTH_RADIUS_M
+
+def random_farms(count, seed=7):
+    generator = random.Random(seed)
+    return [
+        {"farm_id": farm_id, "latitude": generator.uniform(-89, 89), "longitude": generator.uniform(-180, 180)}
+        for farm_id in range(count)
+    ]
+
+def test_kd_tree_matches_naive_scan():
+    farms = random_farms(2000)
+    index = FarmLocationIndex(farms)
+    generator = random.Random(3)
+    for _ in range(25):
+        lat, lon = generator.uniform(-90, 90), generator.uniform(-180, 180)
+        expected = naive_nearest(farms, lat, lon, k=7)
+        found = index.nearest(lat, lon, k=7)
+        assert [farm["farm_id"] for farm in found] == [farm["farm_id"] for farm in expected]
+        assert abs(found[-1]["distance_m"] - expected[-1]["distance_m"]) < 1e-3
+
+        radius = expected[-1]["distance_m"] * 1.5
+        assert [farm["farm_id"] for farm in index.within(lat, lon, radius)] == [
+            farm["farm_id"] for farm in naive_within(farms, lat, lon, radius)
+        ]
+
+def test_bounding_box_contains_radius():
+    lat, lon, radius = 45.57, 4.51, 25000
+    min_lat, min_lon, max_lat, max_lon = _bounding_box(lat, lon, radius)
+    assert haversine_m(lat, lon, max_lat, lon) >= radius - 1
+    assert haversine_m(lat, lon, lat, max_lon) >= radius - 1
+    assert min_lat < lat < max_lat and min_lon < lon < max_lon
+
+class RecordingConnection:
+    """
+    Stands in for a SQLAlchemy connection: records the SQL it is given.
+    """
+    class engine:
+        url = "postgresql://test"
+
+    def __init__(self):
+        self.statements = []
+
+    def begin_nested(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, statement, parameters=None):
+        self.statements.append(" ".join(str(statement).split()))
+
+def test_postgis_is_created_in_public_whatever_the_search_path():
+    conn = RecordingConnection()
+    assert ensure_spatial_index(conn) == "postgis"
+    assert conn.statements[0] == "CREATE EXTENSION IF NOT EXISTS postgis SCHEMA public"
+
+def destination(lat, lon, bearing, distance_m):
+    """
+    The point reached from (lat, lon) along a great circle.
+    """
+    phi, lam, theta = math.radians(lat), math.radians(lon), math.radians(bearing)
+    delta = distance_m / EARTH_RADIUS_M
+    phi2 = math.asin(math.sin(phi) * math.cos(delta) + math.cos(phi) * math.sin(delta) * math.cos(theta))
+    lam2 = lam + math.atan2(math.sin(theta) * math.sin(delta) * math.cos(phi), math.cos(delta) - math.sin(phi) * math.sin(phi2))
+    return math.degrees(phi2), math.degrees(lam2)
+
+def test_bounding_box_contains_the_eastmost_points_of_large_radii():
+    for lat, lon, radius in ((45.0, 4.5, 300000), (60.0, 10.0, 1000000), (-50.0, -70.0, 800000)):
+        min_lat, min_lon, max_lat, max_lon = _bounding_box(lat, lon, radius)
+        # Just inside the radius, on the bearing that reaches furthest east.
+        eastmost = max(
+            (destination(lat, lon, bearing / 10, radius * 0.9999) for bearing in range(0, 1800)),
+            key=lambda point: point[1],
+        )
+        assert haversine_m(lat, lon, *eastmost) <= radius
+        assert min_lat <= eastmost[0] <= max_lat and min_lon <= eastmost[1] <= max_lon
@@ -0,0 +1,34 @@
+import os
+from PIL import Image
+from image_derivatives import build_image_derivatives
+
+def test_build_image_derivatives_resizes_caches_and_prunes(tmp_path):
+    media_root = tmp_path / "media"
+    photo_dir = media_root / "farms" / "farm_1" / "photo"
+    photo_dir.mkdir(parents=True)
+    Image.new("RGB", (800, 600), "green").save(photo_dir / "4.jpg")
+    derivatives_root = tmp_path / "media_derivatives"
+    cache_root = tmp_path / "cache"
+    options = {
+        "media_root": str(media_root),
+        "derivatives_root": str(derivatives_root),
+        "widths": (320, 1280),
+        "cache_root": str(cache_root),
+        "workers": 1,
+    }
+
+    derivatives = build_image_derivatives(**options)
+    paths = derivatives["media/farms/farm_1/photo/4.jpg"]
+    assert len(paths) == 2
+    assert all(path.startswith("derivatives/farms/farm_1/photo/4_w") and path.endswith(".webp") for path in paths)
+    sizes = sorted(Image.open(os.path.join(derivatives_root, path.split("/", 1)[1])).size for path in paths)
+    # 1280 is wider than the source, so it is kept at the source size.
+    assert sizes == [(320, 240), (800, 600)]
+
+    # A rerun reuses the cache; a changed photo gets new names and the old ones are pruned.
+    assert build_image_derivatives(**options) == derivatives
+    Image.new("RGB", (400, 300), "blue").save(photo_dir / "4.jpg")
+    updated = build_image_derivatives(**options)["media/farms/farm_1/photo/4.jpg"]
+    assert set(updated).isdisjoint(paths)
+    remaining = [file for _, _, files in os.walk(derivatives_root) for file in files]
+    assert len(remaining) == 2
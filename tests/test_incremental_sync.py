@@ -0,0 +1,66 @@
+import incremental_sync
+from file_hashing import file_sha256
+from incremental_sync import plan_sync, sync_table, record_key, record_hash
+
+def stored_manifest(monkeypatch, records, key_columns=("id",)):
+    hashes = {record_key(record, key_columns): record_hash(record) for record in records}
+    monkeypatch.setattr(incremental_sync, "get_stored_record_hashes", lambda conn, table_name: dict(hashes))
+
+def test_plan_keeps_changed_and_new_records_and_deletes_vanished_ones(monkeypatch):
+    stored_manifest(monkeypatch, [
+        {"id": 1, "name": "Ferme du Lac"},
+        {"id": 2, "name": "Les Prés"},
+        {"id": 3, "name": "Le Moulin"},
+    ])
+    records = [
+        {"name": "Ferme du Lac", "id": 1},  # unchanged, keys in another order
+        {"id": 2, "name": "Les Prés Verts"},  # changed
+        {"id": 4, "name": "La Source"},  # new
+        "not a record",
+    ]
+    plan = plan_sync(None, "farms", records, ["id"])
+    assert plan.unchanged == 1
+    assert plan.upserts == [{"id": 2, "name": "Les Prés Verts"}, {"id": 4, "name": "La Source"}]
+    assert set(plan.hashes) == {record_key({"id": 2}, ["id"]), record_key({"id": 4}, ["id"])}
+    assert plan.hashes[record_key({"id": 4}, ["id"])] == record_hash({"id": 4, "name": "La Source"})
+    assert plan.deletes == [record_key({"id": 3}, ["id"])]
+
+def test_plan_of_a_composite_key_keeps_the_last_duplicate(monkeypatch):
+    stored_manifest(monkeypatch, [], key_columns=("product_id", "subproduct_id"))
+    records = [
+        {"product_id": 1, "subproduct_id": 2, "position": 1},
+        {"product_id": 1, "subproduct_id": 2, "position": 2},
+    ]
+    plan = plan_sync(None, "product_subproducts", records, ["product_id", "subproduct_id"])
+    assert plan.upserts == [{"product_id": 1, "subproduct_id": 2, "position": 2}]
+    assert plan.deletes == [] and plan.unchanged == 0
+
+def test_unchanged_seed_file_is_skipped_without_planning(monkeypatch, tmp_path):
+    seed_file = tmp_path / "farms.json"
+    seed_file.write_text('[{"id": 1}]', encoding="utf-8")
+    monkeypatch.setattr(incremental_sync, "ensure_manifest_tables", lambda conn: None)
+    monkeypatch.setattr(incremental_sync, "get_stored_file_hash", lambda conn, table_name: file_sha256(str(seed_file)))
+    def fail(*args, **kwargs):
+        raise AssertionError("an unchanged seed file must not be planned or applied")
+    monkeypatch.setattr(incremental_sync, "plan_sync", fail)
+    monkeypatch.setattr(incremental_sync, "apply_sync", fail)
+
+    stats = sync_table(None, "farms", str(seed_file), [{"id": 1}], ["id"], before_apply=fail)
+    assert stats["plan"] is None
+    assert stats["upserted"] == 0 and stats["deleted"] == 0 and stats["unchanged"] is None
+
+def test_changed_seed_file_applies_its_plan_and_stores_its_hash(monkeypatch, tmp_path):
+    seed_file = tmp_path / "farms.json"
+    seed_file.write_text('[{"id": 1, "name": "Ferme du Lac"}]', encoding="utf-8")
+    stored_manifest(monkeypatch, [{"id": 1, "name": "Ferme"}, {"id": 2, "name": "Les Prés"}])
+    monkeypatch.setattr(incremental_sync, "ensure_manifest_tables", lambda conn: None)
+    monkeypatch.setattr(incremental_sync, "get_stored_file_hash", lambda conn, table_name: "an older hash")
+    applied = []
+    stored = []
+    monkeypatch.setattr(incremental_sync, "apply_sync", lambda conn, plan, batch_size: applied.append(plan))
+    monkeypatch.setattr(incremental_sync, "store_file_hash", lambda conn, table_name, file_hash: stored.append(file_hash))
+
+    stats = sync_table(None, "farms", str(seed_file), [{"id": 1, "name": "Ferme du Lac"}], ["id"])
+    assert applied == [stats["plan"]]
+    assert stats["upserted"] == 1 and stats["deleted"] == 1 and stats["unchanged"] == 0
+    assert stored == [file_sha256(str(seed_file))]
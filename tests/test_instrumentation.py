@@ -0,0 +1,36 @@
+import json
+import pytest
+from instrumentation import Metrics, export_spans
+
+def test_spans_nest_record_errors_and_export_as_otlp(tmp_path):
+    registry = Metrics()
+    with registry.span("stage", stage="seed_tables") as stage:
+        with registry.span("load_table", table="farms"):
+            registry.increment("rows_loaded", 3)
+        with pytest.raises(SystemExit):
+            with registry.span("aborted"):
+                raise SystemExit(0)
+        with pytest.raises(ValueError):
+            with registry.span("load_table", table="farmers"):
+                raise ValueError("bad seed")
+    registry.increment("rows_loaded", 2)
+
+    spans = {(span.name, span.attributes.get("table")): span for span in registry.spans}
+    assert registry.counters == {"rows_loaded": 5}
+    assert spans[("load_table", "farms")].parent_id == stage.span_id
+    assert spans[("aborted", None)].error is None
+    assert spans[("load_table", "farmers")].error == "ValueError: bad seed"
+    assert stage.parent_id is None
+    assert registry.timings()["load_table"][1] == 2
+
+    path = tmp_path / "spans.jsonl"
+    export_spans(str(path), "otlp", registry)
+    traces, counters = [json.loads(line) for line in path.read_text().splitlines()]
+    exported = traces["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert {span["traceId"] for span in exported} == {registry.trace_id}
+    failed = next(span for span in exported if span["status"]["code"] == 2)
+    assert failed["parentSpanId"] == stage.span_id
+    assert {"key": "table", "value": {"stringValue": "farmers"}} in failed["attributes"]
+    metric = counters["resourceMetrics"][0]["scopeMetrics"][0]["metrics"][0]
+    assert metric["name"] == "rows_loaded"
+    assert metric["sum"]["dataPoints"][0]["asInt"] == "5"
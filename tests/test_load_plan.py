@@ -0,0 +1,36 @@
+import json
+from load_plan import build_load_plan, estimate_row_bytes
+
+def write(path, payload):
+    path.write_text(json.dumps(payload), encoding="utf-8")
+    return str(path)
+
+def test_plan_orders_tables_and_reports_broken_references(tmp_path):
+    barns = write(tmp_path / "barns.json", [{"id": 1, "name": "north"}, {"id": 2, "name": "south"}])
+    stalls = write(tmp_path / "stalls.json", [{"id": 1, "barn_id": 1}, {"id": 2, "barn_id": 3}, {"id": 2, "barn_id": 2}])
+    notes = write(tmp_path / "notes.json", [
+        {"id": 1, "noteable_type": "barn", "noteable_id": 2},
+        {"id": 2, "noteable_type": "stall", "noteable_id": 9},
+        {"id": 3, "noteable_type": "silo", "noteable_id": 1},
+    ])
+    links = write(tmp_path / "barn_links.json", {
+        "references": {"column_1_reference_table": "barns", "column_1_reference_key": "id",
+                       "column_2_reference_table": "barns", "column_2_reference_key": "id"},
+        "content": [{"from_id": 1, "to_id": 2}, {"from_id": 1, "to_id": 5}, {"from_id": 1, "to_id": 2}],
+    })
+
+    ordered, errors = build_load_plan([stalls, notes, barns], [links])
+
+    assert [scan.table for scan in ordered] == ["barns", "notes", "stalls", "barn_links"]
+    assert [scan.rows for scan in ordered] == [2, 3, 3, 3]
+    assert sorted(errors) == sorted([
+        "stalls: 1 duplicated id(s)",
+        "barn_links: 1 duplicated record(s)",
+        "stalls.barn_id: 1 value(s) missing from barns.id (3)",
+        "notes.noteable_type: 'silo' does not name a seeded table",
+        "notes.noteable_id: 1 'stall' value(s) missing from stalls.id (9)",
+        "barn_links.to_id: 1 value(s) missing from barns.id (5)",
+    ])
+
+def test_row_estimate_counts_overhead_and_values():
+    assert estimate_row_bytes({"id": 1, "name": "abc", "note": None}) == 28 + 4 + 4
@@ -0,0 +1,24 @@
+import pytest
+from product_hierarchy import find_cycle, compute_closure, diff_closure, HierarchyCycleError
+
+def test_closure_uses_shortest_depth():
+    # 3 -> 2 -> 1, and 3 -> 1 directly
+    closure = compute_closure([(2, 1), (3, 2), (3, 1), (6, 5)])
+    assert closure == {(2, 1): 1, (3, 2): 1, (3, 1): 1, (6, 5): 1}
+    closure = compute_closure([(2, 1), (3, 2), (4, 3)])
+    assert closure[(4, 1)] == 3 and closure[(4, 2)] == 2 and len(closure) == 6
+
+def test_cycles_are_detected():
+    assert find_cycle([(1, 2), (2, 3), (1, 3)]) is None
+    assert find_cycle([(1, 2), (2, 3), (3, 1)]) == [1, 2, 3, 1]
+    assert find_cycle([(4, 4)]) == [4, 4]
+    with pytest.raises(HierarchyCycleError):
+        compute_closure([(5, 6), (6, 7), (7, 6)])
+
+def test_diff_only_touches_changed_pairs():
+    current = compute_closure([(2, 1), (3, 2)])
+    desired = compute_closure([(2, 1), (4, 2), (3, 1)])
+    inserts, deletes, updates = diff_closure(current, desired)
+    assert sorted(inserts) == [(4, 1, 2), (4, 2, 1)]
+    assert deletes == [(3, 2)]
+    assert updates == [(3, 1, 1)]
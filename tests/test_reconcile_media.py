@@ -0,0 +1,40 @@
+from reconcile_media import reconcile, layout_mismatch, print_report, MediaReference
+
+def test_reconcile_reports_missing_orphaned_and_size_mismatched_media():
+    references = [
+        MediaReference("photos", 4, "media/farms/farm_1/photo/4"),
+        MediaReference("photos", 5, "media/farmers/farmer_2/photo/5"),
+        MediaReference("herovideos", 1, "media/farms/farm_1/herovideo/1"),
+        MediaReference("documentaries", 2, "media/farms/farm_3/documentary/2"),
+        MediaReference("documentaries", 3, None),
+    ]
+    blobs = {
+        "media/farms/farm_1/photo/4.jpg": 1200,
+        "media/farmers/farmer_2/photo/5.webp": 0,
+        "media/farms/farm_1/herovideo/1.mp4": 5000,
+        "media/farms/farm_1/photo/9.png": 800,
+        "media/icons/star.svg": 300,
+    }
+    local = {"media/farms/farm_1/herovideo/1.mp4": 5200, "media/farms/farm_1/photo/4.jpg": 1200}
+
+    report = reconcile(iter(references), blobs, local)
+
+    assert report["rows"] == 5 and report["media_blobs"] == 4
+    assert report["missing"] == [
+        {"table": "documentaries", "id": 2, "expected": "media/farms/farm_3/documentary/2"},
+        {"table": "documentaries", "id": 3, "expected": None},
+    ]
+    assert report["orphaned"] == ["media/farms/farm_1/photo/9.png"]
+    assert [(entry["blob"], entry["expected_size"]) for entry in report["size_mismatched"]] == [
+        ("media/farmers/farmer_2/photo/5.webp", None),
+        ("media/farms/farm_1/herovideo/1.mp4", 5200),
+    ]
+
+def test_a_container_without_the_path_convention_is_a_warning(capsys):
+    references = [MediaReference("photos", 4, "media/farms/farm_1/photo/4")]
+    blobs = {"media/farms/farm_1/photo/IMG_0001.jpg": 1200}
+    report = dict(reconcile(iter(references), blobs), tables=["photos"], objects=1, seconds=0.1)
+    assert report["matched"] == 0 and layout_mismatch(report)
+    print_report(report)
+    output = capsys.readouterr().out
+    assert "media path convention" in output and "IMG_0001" not in output
@@ -0,0 +1,78 @@
+import psycopg2
+import psycopg2.errors
+import pytest
+from sqlalchemy.exc import OperationalError as SAOperationalError
+from azure.core.exceptions import HttpResponseError, ServiceRequestError
+from resilience import is_transient, connection_lost, backoff_delay, retry, CheckpointJournal
+
+def pg_error(base, sqlstate):
+    # psycopg2 only sets pgcode on errors raised by the server.
+    return type("ServerError", (base,), {"pgcode": sqlstate})("server error")
+
+class Status:
+    def __init__(self, code):
+        self.status_code = code
+        self.reason = "status"
+
+def test_errors_are_classified_as_transient_or_permanent():
+    dropped = psycopg2.OperationalError("SSL connection has been closed unexpectedly")
+    assert connection_lost(dropped) and is_transient(dropped)
+    assert is_transient(SAOperationalError("INSERT", {}, dropped))
+    deadlock = pg_error(psycopg2.errors.DeadlockDetected, "40P01")
+    assert is_transient(deadlock) and not connection_lost(deadlock)
+    assert connection_lost(pg_error(psycopg2.errors.AdminShutdown, "57P01"))
+    assert not is_transient(pg_error(psycopg2.errors.QueryCanceled, "57014"))
+    assert is_transient(pg_error(psycopg2.errors.LockNotAvailable, "55P03"))
+    assert not is_transient(pg_error(psycopg2.errors.UniqueViolation, "23505"))
+    assert not is_transient(ValueError("bad seed"))
+    assert is_transient(ServiceRequestError("connection reset"))
+    assert is_transient(HttpResponseError(response=Status(503)))
+    assert not is_transient(HttpResponseError(response=Status(403)))
+
+def test_retry_backs_off_on_transient_errors_only():
+    delays = []
+    calls = []
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionResetError("reset")
+        return "done"
+    assert retry(flaky, "flaky", base_delay=1, max_delay=3, sleep=delays.append) == "done"
+    assert len(delays) == 2 and delays[0] <= 1 and delays[1] <= 2
+
+    calls.clear()
+    def broken():
+        calls.append(1)
+        raise ValueError("bad seed")
+    with pytest.raises(ValueError):
+        retry(broken, "broken", sleep=delays.append)
+    assert len(calls) == 1
+
+    calls.clear()
+    def down():
+        calls.append(1)
+        raise ConnectionResetError("reset")
+    with pytest.raises(ConnectionResetError):
+        retry(down, "down", attempts=3, sleep=delays.append)
+    assert len(calls) == 3
+    assert all(0 <= backoff_delay(attempt, 0.5, 30) <= min(30, 0.5 * 2 ** attempt) for attempt in range(10))
+
+def test_journal_survives_reopening_and_truncated_lines(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    journal = CheckpointJournal(str(path))
+    journal.record("farms", "abc", rows=3)
+    journal.record("farmers", "def", rows=5)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"key": "products", "finger')
+
+    reopened = CheckpointJournal(str(path))
+    assert reopened.is_done("farms", "abc")
+    assert not reopened.is_done("farmers", "changed")
+    assert not reopened.is_done("products", "ghi")
+    # The truncated line is dropped, so the next entry is not glued to it.
+    reopened.record("products", "ghi", rows=7)
+    resumed = CheckpointJournal(str(path))
+    assert resumed.is_done("products", "ghi") and resumed.is_done("farms", "abc")
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 3
+    reopened.clear()
+    assert not path.exists() and not CheckpointJournal(str(path)).entries
@@ -0,0 +1,40 @@
+import sys
+import pytest
+import run_pipeline
+from run_pipeline import parse_args, select_stages, stage_arguments
+
+def test_skipped_stages_are_bridged_and_media_overlaps():
+    dependencies = select_stages(parse_args(["--media", "--skip", "foreign_keys"]))
+    assert dependencies["join_tables"] == {"seed_tables"}
+    assert dependencies["media"] == set()
+    assert dependencies["indexes"] == dependencies["profiles"] == {"join_tables"}
+
+def test_sequential_chains_every_stage():
+    dependencies = select_stages(parse_args(["--sequential", "--media"]))
+    assert dependencies["seed_tables"] == {"media"}
+    assert dependencies["profiles"] == {"join_tables", "indexes"}
+
+def test_loaders_never_prompt():
+    arguments = stage_arguments(parse_args(["--incremental", "--jobs", "2"]))
+    assert "--yes" in arguments["seed_tables"] and "--yes" in arguments["join_tables"]
+    assert arguments["seed_tables"][-2:] == ["--jobs", "2"]
+
+def test_stages_after_a_failed_load_are_skipped(monkeypatch, capsys):
+    ran = []
+    def stage(name, exit_code=None):
+        def main(argv, engine=None):
+            ran.append(name)
+            if exit_code:
+                sys.exit(exit_code)
+        return main
+    for name, (_, parents) in list(run_pipeline.STAGES.items()):
+        monkeypatch.setitem(run_pipeline.STAGES, name, (stage(name, 1 if name == "seed_tables" else None), parents))
+    monkeypatch.setattr(run_pipeline, "get_engine", lambda pool_size=None: None)
+
+    with pytest.raises(SystemExit) as exit_info:
+        run_pipeline.run(parse_args(["--yes"]))
+    assert exit_info.value.code == 1
+    assert ran == ["seed_tables"]
+    output = capsys.readouterr().out
+    assert "❌ seed_tables" in output
+    assert all(f"-  {name:<14} skipped" in output for name in ("foreign_keys", "join_tables", "indexes", "profiles"))
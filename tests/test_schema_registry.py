@@ -0,0 +1,60 @@
+import os
+from datetime import date
+from decimal import Decimal
+import pytest
+from schema_registry import parse_dbml, TableSchema, SchemaValidationError, load_registry
+
+DBML = """
+Table farms {
+  id integer [primary key]
+  name varchar // the farm's name
+  own_land boolean
+  creation_year smallint
+  page_creation_date date
+  latitude decimal(9,6)
+  location POINT
+  updated_at timestamp
+}
+"""
+
+def farms_schema():
+    return TableSchema("farms", parse_dbml(DBML)["farms"])
+
+def test_columns_are_ordered_to_minimize_padding():
+    assert farms_schema().column_definitions() == {
+        "updated_at": "TIMESTAMP",
+        "id": "INTEGER PRIMARY KEY",
+        "page_creation_date": "DATE",
+        "creation_year": "SMALLINT",
+        "own_land": "BOOLEAN",
+        "name": "TEXT",
+        "latitude": "NUMERIC(9,6)",
+        "location": "geography(Point, 4326)",
+    }
+
+def test_records_are_coerced_column_by_column():
+    records = [
+        {"id": 1, "name": "La Grange", "own_land": "false", "creation_year": 2018,
+         "page_creation_date": "2025-03-18", "latitude": 45.572971, "location": [4.5, 45.5]},
+        {"id": "2", "own_land": True, "page_creation_date": ""},
+    ]
+    first, second = farms_schema().coerce_batch(records)
+    assert first["own_land"] is False
+    assert first["page_creation_date"] == date(2025, 3, 18)
+    assert first["latitude"] == Decimal("45.572971")
+    assert first["location"] == "SRID=4326;POINT(4.5 45.5)"
+    assert second == {"id": 2, "own_land": True, "page_creation_date": None}
+
+def test_invalid_records_are_reported():
+    records = [{"id": 1, "own_land": "maybe", "creation_year": 70000, "extra": 1}]
+    with pytest.raises(SchemaValidationError) as error:
+        farms_schema().coerce_batch(records)
+    message = str(error.value)
+    assert "undeclared column(s) extra" in message
+    assert "column 'own_land'" in message
+    assert "out of range for SMALLINT" in message
+
+def test_declared_schema_matches_the_seeds():
+    registry = load_registry(os.path.join(os.path.dirname(__file__), "..", "table_seeds", "schema.dbml"))
+    assert registry["farms"].by_name["own_land"].type.sql == "BOOLEAN"
+    assert registry["photos"].by_name["capture_date"].type.sql == "DATE"
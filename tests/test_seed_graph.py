@@ -0,0 +1,50 @@
+import threading
+import pytest
+from seed_graph import referenced_table, table_dependencies, topological_layers, run_in_dependency_order
+
+TABLES = {"farms", "farmers", "product_categories", "products", "workloads"}
+
+def test_referenced_table_follows_id_naming_convention():
+    assert referenced_table("farm_id", TABLES) == "farms"
+    assert referenced_table("product_category_id", TABLES) == "product_categories"
+    assert referenced_table("farm_id", {"farm", "farms"}) == "farm"
+    assert referenced_table("id", TABLES) is None
+    assert referenced_table("season_id", TABLES) is None
+    assert referenced_table("name", TABLES) is None
+
+def test_topological_layers_groups_independent_tables():
+    dependencies = table_dependencies({
+        "farms": ["id", "name"],
+        "farmers": ["id", "farm_id"],
+        "product_categories": ["id", "name"],
+        "products": ["id", "farm_id", "product_category_id"],
+        "workloads": ["id", "farmer_id"],
+    })
+    assert topological_layers(dependencies) == [
+        ["farms", "product_categories"],
+        ["farmers", "products"],
+        ["workloads"],
+    ]
+
+def test_topological_layers_detects_cycles():
+    with pytest.raises(ValueError):
+        topological_layers({"a": {"b"}, "b": {"a"}})
+
+def test_run_in_dependency_order_respects_edges_and_skips_dependents_of_failures():
+    finished = []
+    lock = threading.Lock()
+
+    def task(node):
+        if node == "broken":
+            raise RuntimeError("boom")
+        with lock:
+            finished.append(node)
+        return node.upper()
+
+    dependencies = {"a": set(), "b": {"a"}, "c": {"a"}, "d": {"b", "c"}, "broken": set(), "child": {"broken"}, "grandchild": {"child"}}
+    results, errors, skipped, _ = run_in_dependency_order(dependencies, task, jobs=3)
+    assert results == {"a": "A", "b": "B", "c": "C", "d": "D"}
+    assert set(errors) == {"broken"}
+    assert sorted(skipped) == ["child", "grandchild"]
+    assert finished.index("a") < finished.index("b") < finished.index("d")
+    assert finished.index("c") < finished.index("d")
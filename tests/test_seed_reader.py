@@ -0,0 +1,42 @@
+import json
+from seed_reader import iter_seed_records, read_join_seed, peek_first
+
+def write(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content, encoding="utf-8")
+    return str(path)
+
+def test_iter_seed_records_streams_array_across_small_chunks(tmp_path):
+    records = [{"id": i, "name": f"Ferme {i}", "latitude": 45.5 + i, "tags": [i, i + 1]} for i in range(50)]
+    seed_file = write(tmp_path, "farms.json", json.dumps(records, indent=2, ensure_ascii=False))
+    assert list(iter_seed_records(seed_file, chunk_size=7)) == records
+
+def test_iter_seed_records_does_not_truncate_numbers_at_chunk_edge(tmp_path):
+    seed_file = write(tmp_path, "numbers.json", "[123456789, 42]")
+    assert list(iter_seed_records(seed_file, chunk_size=4)) == [123456789, 42]
+
+def test_iter_seed_records_accepts_single_object_and_empty_array(tmp_path):
+    single = write(tmp_path, "single.json", '{"id": 1}')
+    empty = write(tmp_path, "empty.json", " [ ] ")
+    assert list(iter_seed_records(single)) == [{"id": 1}]
+    assert list(iter_seed_records(empty)) == []
+
+def test_iter_seed_records_reads_ndjson(tmp_path):
+    seed_file = write(tmp_path, "photos.jsonl", '{"id": 1}\n\n{"id": 2}\n')
+    assert list(iter_seed_records(seed_file)) == [{"id": 1}, {"id": 2}]
+
+def test_read_join_seed_in_either_member_order(tmp_path):
+    references = {"column_1_reference_table": "products", "column_1_reference_key": "id"}
+    content = [{"parent_product_id": 2, "subproduct_id": 1}, {"parent_product_id": 3, "subproduct_id": 2}]
+    documented = write(tmp_path, "a.json", json.dumps({"references": references, "content": content}))
+    reversed_order = write(tmp_path, "b.json", json.dumps({"content": content, "references": references}))
+    for seed_file in (documented, reversed_order):
+        refs, records = read_join_seed(seed_file, chunk_size=5)
+        assert refs == references
+        assert list(records) == content
+
+def test_peek_first_keeps_the_first_record():
+    first, records = peek_first(iter([1, 2, 3]))
+    assert first == 1
+    assert list(records) == [1, 2, 3]
+    assert peek_first([])[0] is None
@@ -0,0 +1,39 @@
+import sys
+import pytest
+import shadow_reseed
+from shadow_reseed import plan_swap, shadow_problems
+
+def test_swap_retires_replaced_relations_and_stale_manifests():
+    incoming = {"farms": "r", "farm_profiles": "m"}
+    live = {"farms": "r", "farm_profiles": "m", "seed_file_manifest": "r", "app_sessions": "r"}
+    assert plan_swap(incoming, live) == [
+        'ALTER MATERIALIZED VIEW "public"."farm_profiles" SET SCHEMA "reseed_previous"',
+        'ALTER TABLE "public"."farms" SET SCHEMA "reseed_previous"',
+        'ALTER TABLE "public"."seed_file_manifest" SET SCHEMA "reseed_previous"',
+        'ALTER MATERIALIZED VIEW "reseed_shadow"."farm_profiles" SET SCHEMA "public"',
+        'ALTER TABLE "reseed_shadow"."farms" SET SCHEMA "public"',
+    ]
+
+def test_incomplete_shadow_schemas_are_not_swapped_in():
+    seeded = {"farms": True, "farmers": True, "labels": False, "farm_products": True}
+    relations = {"farms": "r", "farmers": "r", "labels": "r"}
+    assert shadow_problems(seeded, relations, {"farms"}) == [
+        "table 'farm_products' is missing",
+        "table 'farmers' is empty although its seed file has records",
+    ]
+    assert shadow_problems(seeded, dict(relations, farm_products="r"), {"farms", "farmers", "farm_products"}) == []
+
+def test_failed_shadow_build_never_reaches_the_swap(monkeypatch, capsys):
+    def failed_load(argv, engine=None):
+        sys.exit(1)
+    def swap(*args, **kwargs):
+        raise AssertionError("a failed build must not be swapped in")
+    monkeypatch.setattr(shadow_reseed, "create_shadow_schema", lambda engine: None)
+    monkeypatch.setattr(shadow_reseed, "get_search_path_engine", lambda search_path, pool_size=None: None)
+    monkeypatch.setattr(shadow_reseed.upload_seed_tables, "main", failed_load)
+    monkeypatch.setattr(shadow_reseed, "swap_schemas", swap)
+
+    with pytest.raises(SystemExit) as exit_info:
+        shadow_reseed.main(["--yes"], engine=object())
+    assert exit_info.value.code == 1
+    assert "Shadow build failed at 'seed tables'" in capsys.readouterr().out
@@ -0,0 +1,7 @@
+from show_db_tables_sample import sample_percent
+
+def test_sampling_reads_a_fraction_of_large_analyzed_tables_only():
+    assert sample_percent(1_000_000, 5) == 0.01
+    assert sample_percent(50, 5) is None
+    assert sample_percent(None, 5) is None
+    assert sample_percent(0, 5) is None
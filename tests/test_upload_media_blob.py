@@ -0,0 +1,72 @@
+import os
+import hashlib
+import upload_media_blob
+from upload_media_blob import UploadManifest, sync_file
+
+def fake_uploads(monkeypatch):
+    uploads = []
+    monkeypatch.setattr(
+        upload_media_blob,
+        "upload_blob_file",
+        lambda local_file_path, blob_path, md5, content_settings=None, large_file_options=None: uploads.append((blob_path, md5)),
+    )
+    return uploads
+
+def test_unchanged_files_are_skipped_and_changed_ones_sent_again(tmp_path, monkeypatch):
+    uploads = fake_uploads(monkeypatch)
+    photo = tmp_path / "1.jpg"
+    photo.write_bytes(b"first photo")
+    blob_path = "media/farms/farm_1/photo/1.jpg"
+    manifest = UploadManifest(str(tmp_path / "manifest.jsonl"))
+
+    # The container already holds the same content: nothing is sent.
+    remote = {blob_path: (photo.stat().st_size, hashlib.md5(b"first photo").digest())}
+    assert sync_file(str(photo), blob_path, remote, manifest) == (False, len(b"first photo"))
+    assert uploads == []
+
+    # Without a remote MD5, a blob of the right size that this machine uploaded is trusted.
+    assert sync_file(str(photo), blob_path, {blob_path: (photo.stat().st_size, None)}, manifest)[0] is False
+    assert uploads == []
+
+    photo.write_bytes(b"second photo, longer")
+    os.utime(photo, ns=(photo.stat().st_atime_ns, photo.stat().st_mtime_ns + 1))
+    assert sync_file(str(photo), blob_path, remote, manifest) == (True, len(b"second photo, longer"))
+    assert uploads == [(blob_path, hashlib.md5(b"second photo, longer").digest())]
+    assert manifest.is_uploaded(blob_path, hashlib.md5(b"second photo, longer").digest())
+
+def test_reloaded_manifest_skips_hashing_and_is_compacted(tmp_path, monkeypatch):
+    uploads = fake_uploads(monkeypatch)
+    path = str(tmp_path / "manifest.jsonl")
+    files = {}
+    for name in ("1.jpg", "2.jpg"):
+        files[name] = tmp_path / name
+        files[name].write_bytes(name.encode())
+    manifest = UploadManifest(path)
+    for name, local_file in files.items():
+        sync_file(str(local_file), f"media/{name}", {}, manifest)
+    # A second run on the same journal appends the same files again.
+    for name, local_file in files.items():
+        UploadManifest(path).record(f"media/{name}", local_file.stat(), hashlib.md5(name.encode()).digest(), uploaded=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"blob_path": "media/3.jpg", "si')
+
+    reloaded = UploadManifest(path)
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 2 and set(reloaded.entries) == {"media/1.jpg", "media/2.jpg"}
+
+    # Unchanged files are recognized from the journal, without reading them.
+    def no_hashing(*args):
+        raise AssertionError("files recorded in the journal must not be hashed again")
+    monkeypatch.setattr(upload_media_blob, "file_digest", no_hashing)
+    remote = {f"media/{name}": (local_file.stat().st_size, None) for name, local_file in files.items()}
+    for name, local_file in files.items():
+        assert sync_file(str(local_file), f"media/{name}", remote, reloaded)[0] is False
+    assert len(uploads) == 2
+
+    reloaded.record("media/1.jpg", files["1.jpg"].stat(), hashlib.md5(b"1.jpg").digest(), uploaded=True)
+    with open(path, "r", encoding="utf-8") as f:
+        assert len(f.read().splitlines()) == 3
+    assert len(UploadManifest(path).entries) == 2
+    with open(path, "r", encoding="utf-8") as f:
+        assert len(f.read().splitlines()) == 2
@@ -0,0 +1,50 @@
+import json
+from contextlib import contextmanager
+import pytest
+import upload_seed_join_tables
+from upload_seed_join_tables import parse_args, run
+
+class FakeEngine:
+    @contextmanager
+    def connect(self):
+        yield None
+
+def test_a_failed_join_seed_file_fails_the_run(monkeypatch, capsys):
+    seed_files = ["join_table_seeds/farm_products.json", "join_table_seeds/product_subproducts.json"]
+    loaded = []
+    def process(engine, seed_file, **options):
+        if seed_file.endswith("farm_products.json"):
+            raise ValueError("malformed record")
+        loaded.append(seed_file)
+    monkeypatch.setattr(upload_seed_join_tables, "get_join_seed_files", lambda: seed_files)
+    monkeypatch.setattr(upload_seed_join_tables, "fetch_row_estimates", lambda conn, table_names: {})
+    monkeypatch.setattr(upload_seed_join_tables, "process_join_seed_file", process)
+    refreshed = []
+    monkeypatch.setattr(upload_seed_join_tables, "refresh_farm_profiles", refreshed.append)
+
+    with pytest.raises(SystemExit) as exit_info:
+        run(parse_args(["--yes"]), engine=FakeEngine())
+    assert exit_info.value.code == 1
+    # The other files are still loaded, but nothing is reported as a success.
+    assert loaded == seed_files[1:] and refreshed == []
+    assert "✅" not in capsys.readouterr().out
+
+def test_join_seed_files_are_processed_without_a_preview_connection(tmp_path, monkeypatch):
+    seed_file = tmp_path / "product_subproducts.json"
+    seed_file.write_text(json.dumps({
+        "references": {
+            "column_1_reference_table": "products",
+            "column_2_reference_table": "products",
+            "column_1_reference_key": "id",
+            "column_2_reference_key": "id",
+        },
+        "content": [{"parent_product_id": 2, "subproduct_id": 1}],
+    }), encoding="utf-8")
+    class NoPreviewEngine:
+        def connect(self):
+            raise AssertionError("the existing rows are previewed once by run()")
+    attempts = []
+    monkeypatch.setattr(upload_seed_join_tables, "retry", lambda operation, description: attempts.append(description))
+
+    upload_seed_join_tables.process_join_seed_file(NoPreviewEngine(), str(seed_file), assume_yes=True)
+    assert attempts == ["Loading join table 'product_subproducts'"]
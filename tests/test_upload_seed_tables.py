@@ -0,0 +1,83 @@
+from contextlib import contextmanager
+import psycopg2
+import psycopg2.errors
+import pytest
+import upload_seed_tables
+from upload_seed_tables import load_seed_table, load_tables_sequentially, load_tables_in_parallel, parse_args
+from resilience import CheckpointJournal
+from workload_rollups import WORKLOADS_TABLE
+
+def pg_error(base, sqlstate):
+    return type("ServerError", (base,), {"pgcode": sqlstate})("server error")
+
+class Savepoint:
+    def __init__(self):
+        self.state = "open"
+
+    def commit(self):
+        self.state = "committed"
+
+    def rollback(self):
+        self.state = "rolled back"
+
+class Result:
+    rowcount = 3
+
+class FakeConnection:
+    def __init__(self):
+        self.savepoints = []
+
+    def begin_nested(self):
+        self.savepoints.append(Savepoint())
+        return self.savepoints[-1]
+
+    def execute(self, statement, parameters=None):
+        return Result()
+
+class FakeEngine:
+    @contextmanager
+    def begin(self):
+        yield FakeConnection()
+
+@pytest.fixture
+def workloads_seed(tmp_path, monkeypatch):
+    seed_file = tmp_path / "workloads.json"
+    seed_file.write_text('[{"id": 1, "farmer_id": 1, "hours": 4}]', encoding="utf-8")
+    monkeypatch.setattr(upload_seed_tables, "table_exists", lambda conn, table_name: True)
+    monkeypatch.setattr(upload_seed_tables, "clear_manifest", lambda conn, table_name: None)
+    monkeypatch.setattr(upload_seed_tables, "bulk_load", lambda conn, table_name, records, mode, batch_size: {"table": table_name, "rows": 1})
+    return str(seed_file)
+
+def test_failed_rollup_refresh_rolls_the_full_reload_back(workloads_seed, monkeypatch):
+    def refresh(conn, farmer_ids=None):
+        raise pg_error(psycopg2.errors.CheckViolation, "23514")
+    monkeypatch.setattr(upload_seed_tables, "refresh_workload_rollups", refresh)
+    conn = FakeConnection()
+    assert load_seed_table(conn, WORKLOADS_TABLE, workloads_seed) is None
+    assert [savepoint.state for savepoint in conn.savepoints] == ["rolled back"]
+
+def test_transient_rollup_refresh_errors_are_left_to_the_retry(workloads_seed, monkeypatch):
+    def refresh(conn, farmer_ids=None):
+        raise pg_error(psycopg2.errors.DeadlockDetected, "40P01")
+    monkeypatch.setattr(upload_seed_tables, "refresh_workload_rollups", refresh)
+    with pytest.raises(psycopg2.errors.DeadlockDetected):
+        load_seed_table(FakeConnection(), WORKLOADS_TABLE, workloads_seed)
+
+def test_tables_left_unchanged_are_reported_as_failed(tmp_path, monkeypatch):
+    seed_files = {}
+    for table_name in ("farmers", "farms", "workloads"):
+        seed_files[table_name] = str(tmp_path / f"{table_name}.json")
+        (tmp_path / f"{table_name}.json").write_text("[]", encoding="utf-8")
+    def load(conn, table_name, seed_file, mode, batch_size, incremental):
+        return None if table_name == "farmers" else {"table": table_name, "rows": 1, "table_seconds": 0.0}
+    monkeypatch.setattr(upload_seed_tables, "load_seed_table", load)
+
+    stats, failed = load_tables_sequentially(FakeEngine(), seed_files, ["farmers", "farms", "workloads"], parse_args([]))
+    assert failed == ["farmers"] and [table_stats["table"] for table_stats in stats] == ["farms", "workloads"]
+
+    # In parallel, the tables referencing a failed table are not loaded at all.
+    journal = CheckpointJournal(str(tmp_path / "journal.jsonl"))
+    dependencies = {"farmers": set(), "farms": set(), "workloads": {"farmers"}}
+    stats, failed = load_tables_in_parallel(FakeEngine(), seed_files, dependencies, parse_args(["--jobs", "2"]), journal)
+    assert failed == ["farmers", "workloads"] and [table_stats["table"] for table_stats in stats] == ["farms"]
+    assert list(journal.entries) == ["farms"]
@@ -0,0 +1,57 @@
+import os
+import shutil
+import subprocess
+import pytest
+from PIL import Image
+import video_renditions
+from video_renditions import build_video_renditions, extract_poster
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+
+def make_clip(path, seconds, size="64x48"):
+    subprocess.run([
+        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc=duration={seconds}:size={size}:rate=10",
+        "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+        "-c:v", "libx264", "-pix_fmt", "yuv420p", "-c:a", "aac", "-shortest",
+        str(path),
+    ], check=True)
+
+def test_build_video_renditions_transcodes_caches_and_names_outputs(tmp_path, monkeypatch):
+    media_root = tmp_path / "media"
+    video_dir = media_root / "farms" / "farm_1" / "herovideo"
+    video_dir.mkdir(parents=True)
+    make_clip(video_dir / "1.mp4", 2)
+    options = {
+        "media_root": str(media_root),
+        "derivatives_root": str(tmp_path / "media_derivatives"),
+        "max_width": 32,
+        "poster_time": 1.0,
+        "concurrency": 1,
+        "cache_root": str(tmp_path / "cache"),
+    }
+
+    renditions = build_video_renditions(**options)
+    paths = renditions["media/farms/farm_1/herovideo/1.mp4"]
+    assert paths["web"].startswith("derivatives/farms/farm_1/herovideo/1.web.") and paths["web"].endswith(".mp4")
+    assert paths["poster"].startswith("derivatives/farms/farm_1/herovideo/1.poster.") and paths["poster"].endswith(".jpg")
+    web_file = os.path.join(options["derivatives_root"], paths["web"].split("/", 1)[1])
+    poster_file = os.path.join(options["derivatives_root"], paths["poster"].split("/", 1)[1])
+    with open(web_file, "rb") as f:
+        content = f.read()
+    # faststart: the index (moov) comes before the media data (mdat).
+    assert 0 <= content.find(b"moov") < content.find(b"mdat")
+    assert Image.open(poster_file).format == "JPEG"
+
+    # A rerun finds both outputs in the cache and runs no ffmpeg job.
+    def no_ffmpeg(args):
+        raise AssertionError("cached renditions must not be transcoded again")
+    monkeypatch.setattr(video_renditions, "_run_ffmpeg", no_ffmpeg)
+    assert build_video_renditions(**options) == renditions
+
+def test_poster_of_a_video_shorter_than_the_poster_time_is_its_first_frame(tmp_path):
+    source = tmp_path / "short.mp4"
+    make_clip(source, 0.5)
+    poster = tmp_path / "poster.jpg"
+    extract_poster(str(source), str(poster), poster_time=5.0)
+    assert Image.open(poster).size == (64, 48)
@@ -0,0 +1,21 @@
+from workload_rollups import compute_rollups, FARMER_SEASON_TABLE, FARMER_CATEGORY_TABLE, FARM_TOTALS_TABLE
+
+def test_rollups_group_by_farmer_season_category_and_farm():
+    farmers = [{"id": 1, "farm_id": 10}, {"id": 2, "farm_id": 10}, {"id": 3, "farm_id": None}]
+    workloads = [
+        {"id": 1, "farmer_id": 1, "season_id": 1, "work_category_id": 1, "weekly_workload": 10},
+        {"id": 2, "farmer_id": 1, "season_id": 1, "work_category_id": 2, "weekly_workload": 5},
+        {"id": 3, "farmer_id": 1, "season_id": 2, "work_category_id": 2, "weekly_workload": None},
+        {"id": 4, "farmer_id": 2, "season_id": 1, "work_category_id": 1, "weekly_workload": 7},
+        {"id": 5, "farmer_id": 3, "season_id": 1, "work_category_id": 1, "weekly_workload": 1},
+        {"id": 6, "farmer_id": 2, "season_id": None, "work_category_id": 1, "weekly_workload": 3},
+        {"id": 7, "farmer_id": None, "season_id": 1, "work_category_id": 1, "weekly_workload": 4},
+    ]
+    rollups = compute_rollups(workloads, farmers)
+    assert rollups[FARMER_SEASON_TABLE][(1, 1)] == (15, 2)
+    assert rollups[FARMER_SEASON_TABLE][(1, 2)] == (0, 1)
+    assert rollups[FARMER_CATEGORY_TABLE][(1, 2)] == (5, 2)
+    assert rollups[FARMER_CATEGORY_TABLE][(2, 1)] == (10, 2)
+    # Workloads missing a key column are left out, as the SQL refresh does.
+    assert all(None not in key for table in (FARMER_SEASON_TABLE, FARMER_CATEGORY_TABLE) for key in rollups[table])
+    assert rollups[FARM_TOTALS_TABLE] == {(10,): (25, 5)}